@@ -0,0 +1,106 @@
+import json
+import re
+from errors import ValidationError
+
+MANIFEST_DEPENDENCY_FIELDS = ('dependencies', 'devDependencies', 'optionalDependencies')
+
+
+def split_root_spec(text):
+    # "name", "name@range", "@scope/name@range" -> (name, range или None)
+    text = text.strip()
+    at = text.find('@', 1)
+    if at < 0:
+        return text, None
+    return text[:at], text[at + 1:] or None
+
+
+def output_suffix(package_name):
+    # Имя пакета -> часть имени файла: "@scope/name" -> "scope_name"
+    return re.sub(r'[^\w.-]+', '_', package_name.lstrip('@')) or 'package'
+
+
+def output_suffixes(roots, reserved=('combined',)):
+    # Части имен файлов для корней, без повторов: пакет, встреченный с разными
+    # диапазонами, получает диапазон в имени ("react-17", "react-18"), а имена,
+    # совпавшие после замены символов ("@scope/name" и "scope_name"), - номер
+    names = {}
+    for name, _ in roots:
+        suffix = output_suffix(name)
+        names[suffix] = names.get(suffix, 0) + 1
+
+    used = set(reserved)
+    suffixes = []
+    for name, spec in roots:
+        suffix = output_suffix(name)
+        if names[suffix] > 1 and spec:
+            spec_suffix = re.sub(r'[^\w.-]+', '_', spec).strip('_')
+            if spec_suffix:
+                suffix = f"{suffix}-{spec_suffix}"
+        unique = suffix
+        number = 2
+        while unique in used:
+            unique = f"{suffix}-{number}"
+            number += 1
+        used.add(unique)
+        suffixes.append(unique)
+    return suffixes
+
+
+# Манифест пакетного режима (--batch): список корневых пакетов.
+#   package.json            - dependencies, devDependencies, optionalDependencies
+#   JSON-объект             - {"имя": "диапазон", ...}
+#   JSON-массив             - ["имя", "имя@диапазон", {"name": ..., "version": ...}, ...]
+#   текстовый файл          - по пакету в строке ("имя" или "имя@диапазон"), # - комментарий
+def read_batch_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except OSError as e:
+        raise ValidationError(f"Не удалось прочитать манифест {path}: {e}")
+
+    if content.lstrip().startswith(('{', '[')):
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise ValidationError(f"Ошибка чтения JSON манифеста {path}: {e}")
+        roots = _roots_from_json(data)
+    else:
+        roots = []
+        for line in content.splitlines():
+            line = line.split('#', 1)[0].strip()
+            if line:
+                roots.append(split_root_spec(line))
+
+    # Повторы убираются, порядок манифеста сохраняется
+    roots = list(dict.fromkeys(roots))
+    if not roots:
+        raise ValidationError(f"В манифесте {path} нет пакетов")
+
+    return roots
+
+
+def _roots_from_json(data):
+    if isinstance(data, list):
+        roots = []
+        for item in data:
+            if isinstance(item, str):
+                roots.append(split_root_spec(item))
+            elif isinstance(item, dict) and isinstance(item.get('name'), str):
+                roots.append((item['name'], item.get('version') or None))
+            else:
+                raise ValidationError(f"Некорректная запись манифеста: {item!r}")
+        return roots
+
+    if not isinstance(data, dict):
+        raise ValidationError("Манифест должен быть JSON-объектом или массивом")
+
+    if any(field in data for field in MANIFEST_DEPENDENCY_FIELDS) or 'name' in data:
+        # package.json: корни - его прямые зависимости
+        roots = []
+        for field in MANIFEST_DEPENDENCY_FIELDS:
+            dependencies = data.get(field) or {}
+            if isinstance(dependencies, dict):
+                roots.extend((name, spec or None) for name, spec in dependencies.items())
+        return roots
+
+    return [(name, spec or None) for name, spec in data.items()]
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пакетного режима: отдельный обход на каждый корень (как при запуске
+процесса на сервис) против одного пакетного прогона с общим слоем загрузки
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collector import NPMDataCollector
+from graph_builder import DependencyGraphBuilder
+from stub_registry import StubRegistry, generate_registry
+from subgraph_memo import DEFAULT_MEMO_NODES, SubgraphMemo
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк пакетного режима')
+    parser.add_argument('--packages', type=int, default=2000, help='Размер синтетического реестра')
+    parser.add_argument('--fanout', type=int, default=4, help='Зависимостей у каждого пакета')
+    parser.add_argument('--roots', type=int, default=50, help='Число корневых пакетов')
+    parser.add_argument('--max-depth', type=int, default=4, help='Максимальная глубина обхода')
+    parser.add_argument('--latency', type=float, default=0.005, help='Задержка ответа сервера, с')
+    parser.add_argument('--jobs', type=int, default=8, help='Число параллельных загрузок')
+    parser.add_argument('--memo-nodes', type=int, default=DEFAULT_MEMO_NODES,
+                        help='Размер памяти поддеревьев, узлов')
+    args = parser.parse_args()
+
+    registry = generate_registry(args.packages, args.fanout)
+    roots = [(f"pkg-{i}", None) for i in random.Random(3).sample(range(args.packages // 2), args.roots)]
+
+    with StubRegistry(registry, args.latency) as stub:
+        stub.requests = 0
+        started = time.perf_counter()
+        separate = []
+        for root in roots:
+            collector = NPMDataCollector(stub.url)
+            builder = DependencyGraphBuilder(collector, args.jobs)
+            separate.append(builder.build_compact_graph(*root, max_depth=args.max_depth))
+            collector.close()
+        separate_time = time.perf_counter() - started
+        separate_requests = stub.requests
+
+        stub.requests = 0
+        started = time.perf_counter()
+        collector = NPMDataCollector(stub.url)
+        builder = DependencyGraphBuilder(collector, args.jobs)
+        combined, results = builder.build_batch(roots, max_depth=args.max_depth)
+        collector.close()
+        batch_time = time.perf_counter() - started
+        batch_requests = stub.requests
+
+        # Пакетный режим с памятью поддеревьев: общие поддеревья вставляются без обхода
+        stub.requests = 0
+        started = time.perf_counter()
+        collector = NPMDataCollector(stub.url)
+        memo = SubgraphMemo(args.memo_nodes)
+        memo_builder = DependencyGraphBuilder(collector, args.jobs, memo=memo)
+        memo_combined, memo_results = memo_builder.build_batch(roots, max_depth=args.max_depth)
+        collector.close()
+        memo_time = time.perf_counter() - started
+        memo_requests = stub.requests
+
+    for graph, result in zip(separate, results):
+        if graph.to_dict() != result.graph.to_dict():
+            print(f" Граф корня {result.package} в пакетном режиме отличается", file=sys.stderr)
+            sys.exit(1)
+    if memo_combined.to_dict() != combined.to_dict() or any(
+            result.graph.to_dict() != memo_result.graph.to_dict() for result, memo_result in zip(results, memo_results)):
+        print(f" Граф с памятью поддеревьев отличается от пакетного режима", file=sys.stderr)
+        sys.exit(1)
+
+    overlap = builder.batch_overlap(results)
+    print(f" Корней: {len(roots)}, пакетов по корням: {overlap['total_packages']}, "
+          f"уникальных: {overlap['unique_packages']}, в объединенном графе: {len(combined.fetched_nodes())}")
+    print(f" Отдельные обходы: {separate_requests:>6} запросов, {separate_time:6.2f} с")
+    print(f" Пакетный режим:   {batch_requests:>6} запросов, {batch_time:6.2f} с")
+    print(f" С памятью поддеревьев: {memo_requests:>6} запросов, {memo_time:6.2f} с")
+    stats = memo.stats()
+    print(f"    поддеревьев: {stats['subgraphs']}, узлов: {stats['nodes']}, попаданий: {stats['hits']}, "
+          f"вставлено узлов без обхода: {stats['spliced_nodes']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк обхода с ограниченной памятью (--memory-limit): обход в
+CompactGraph с выгрузками против обхода в GraphStore с индексами в памяти и с
+индексами в SQLite (лимит меньше графа). Время, пиковая память обхода и
+выгрузок (tracemalloc, без индекса файла репозитория) и размер хранилища на
+диске. Выгрузки всех вариантов должны совпасть байт в байт.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collector import NPMDataCollector
+from graph_builder import DependencyGraphBuilder
+from graph_exporters import EXPORTERS, STORE_EXPORTERS, export_graph, export_store
+from graph_store import GraphStore, parse_size
+from stub_registry import generate_test_repository
+
+ROOT = "pkg-0"
+
+
+def collector(path, memoize=True):
+    # Индекс файла репозитория строится до замера: он общий для всех вариантов
+    data_collector = NPMDataCollector(path, test_mode=True, memoize=memoize)
+    data_collector.local_repository.get_entry(ROOT)
+    return data_collector
+
+
+def in_memory(data_collector, max_depth, directory):
+    builder = DependencyGraphBuilder(data_collector)
+    with redirect_stdout(io.StringIO()):
+        graph = builder.build_compact_graph(ROOT, max_depth=max_depth)
+    files = [export_graph(graph, os.path.join(directory, f"memory.{name}"), name) for name in EXPORTERS]
+    return files, {"nodes": len(graph), "edges": graph.edge_count, "spilled": False, "disk": 0}
+
+
+def bounded(data_collector, max_depth, directory, label, memory_limit):
+    builder = DependencyGraphBuilder(data_collector)
+    store = GraphStore(memory_limit, directory)
+    try:
+        with redirect_stdout(io.StringIO()):
+            builder.build_graph_store(store, ROOT, max_depth=max_depth)
+        files = [export_store(store, os.path.join(directory, f"{label}.{name}"), name) for name in STORE_EXPORTERS]
+        info = {"nodes": store.node_count, "edges": store.edge_count, "spilled": store.spilled,
+                "disk": store.disk_usage()}
+    finally:
+        store.close()
+    return files, info
+
+
+def measure(path, memoize, run):
+    data_collector = collector(path, memoize)
+    started = time.perf_counter()
+    files, info = run(data_collector)
+    elapsed = time.perf_counter() - started
+
+    # Память меряется отдельным прогоном: tracemalloc сильно замедляет обход
+    data_collector = collector(path, memoize)
+    tracemalloc.start()
+    run(data_collector)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, files, info
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк обхода с ограниченной памятью')
+    parser.add_argument('--packages', type=int, default=100000, help='Пакетов в тестовом репозитории')
+    parser.add_argument('--fanout', type=int, default=6, help='Зависимостей у каждого пакета')
+    parser.add_argument('--max-depth', type=int, default=40, help='Максимальная глубина обхода')
+    parser.add_argument('--small-limit', default='256K', help='Лимит памяти, при котором индексы уходят в SQLite')
+    parser.add_argument('--large-limit', default='4G', help='Лимит памяти, при котором индексы остаются в памяти')
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "repository.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(generate_test_repository(args.packages, args.fanout), f)
+
+        variants = [
+            ("CompactGraph", True,
+             lambda data_collector: in_memory(data_collector, args.max_depth, directory)),
+            (f"GraphStore {args.large_limit}", False,
+             lambda data_collector: bounded(data_collector, args.max_depth, directory, "large",
+                                            parse_size(args.large_limit))),
+            (f"GraphStore {args.small_limit}", False,
+             lambda data_collector: bounded(data_collector, args.max_depth, directory, "small",
+                                            parse_size(args.small_limit)))
+        ]
+
+        print(f"{'вариант':<24} {'узлов':>7} {'ребер':>8} {'время, с':>9} {'пик, МБ':>8} {'диск, МБ':>9} SQLite")
+        expected = None
+        for label, memoize, run in variants:
+            elapsed, peak, files, info = measure(path, memoize, run)
+            print(f"{label:<24} {info['nodes']:>7} {info['edges']:>8} {elapsed:>9.2f} {peak / 1024 / 1024:>8.1f} "
+                  f"{info['disk'] / 1024 / 1024:>9.1f} {'да' if info['spilled'] else 'нет'}")
+
+            outputs = []
+            for file in files:
+                with open(file, 'rb') as f:
+                    outputs.append(f.read())
+            if expected is None:
+                expected = outputs
+            elif outputs != expected:
+                print(f" Выгрузки варианта '{label}' отличаются от обхода в памяти", file=sys.stderr)
+                failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк представления графа: словарь словарей со строковыми ключами
+против CompactGraph (интернированные узлы, смежность в массивах CSR)
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compact_graph import CompactGraph
+
+
+def generate_dict_graph(nodes, fanout, seed=42):
+    rng = random.Random(seed)
+    graph = {}
+    for i in range(nodes):
+        deps = rng.sample(range(nodes), fanout)
+        graph[f"pkg-{i}@1.0.0"] = {f"pkg-{dep}": "^1.0.0" for dep in deps}
+    return graph
+
+
+def traverse_dict(graph):
+    # Прежний способ: ключ зависимости собирается из имени и версии, поиск по строкам
+    root = next(iter(graph))
+    seen = {root}
+    queue = deque([root])
+    while queue:
+        for dep in graph[queue.popleft()]:
+            key = f"{dep}@1.0.0"
+            if key not in seen and key in graph:
+                seen.add(key)
+                queue.append(key)
+    return len(seen)
+
+
+def traverse_compact(graph):
+    seen = bytearray(len(graph))
+    seen[0] = 1
+    queue = deque([0])
+    count = 1
+    offsets, targets = graph.offsets, graph.targets
+    while queue:
+        node = queue.popleft()
+        for dep in targets[offsets[node]:offsets[node + 1]]:
+            if not seen[dep]:
+                seen[dep] = 1
+                count += 1
+                queue.append(dep)
+    return count
+
+
+def measure_memory(factory):
+    gc.collect()
+    tracemalloc.start()
+    value = factory()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def timed(function, *args, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк компактного представления графа')
+    parser.add_argument('--nodes', type=int, default=50000, help='Число узлов')
+    parser.add_argument('--fanout', type=int, default=5, help='Зависимостей у каждого узла')
+    args = parser.parse_args()
+
+    graph, dict_size = measure_memory(lambda: generate_dict_graph(args.nodes, args.fanout))
+    compact, compact_size = measure_memory(lambda: CompactGraph.from_dict(graph))
+
+    # CompactGraph делит строки ключей со словарем; считаем и их, чтобы сравнение было честным
+    key_size = sum(sys.getsizeof(key) for key in compact.keys)
+
+    dict_count, dict_time = timed(traverse_dict, graph)
+    compact_count, compact_time = timed(traverse_compact, compact)
+    assert dict_count == compact_count
+
+    print(f" Узлов: {len(compact)}, ребер: {compact.edge_count}")
+    print(f" Память, словарь:     {dict_size / 1024 / 1024:8.1f} МБ")
+    print(f" Память, CompactGraph: {(compact_size + key_size) / 1024 / 1024:7.1f} МБ")
+    print(f" Обход BFS, словарь:     {dict_time * 1000:8.1f} мс")
+    print(f" Обход BFS, CompactGraph: {compact_time * 1000:7.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк параллельного обхода: время построения графа в зависимости от --jobs
+на локальном stub-реестре с искусственной задержкой
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collector import NPMDataCollector
+from graph_builder import DependencyGraphBuilder
+from stub_registry import StubRegistry, generate_registry
+
+
+def run(registry_url, jobs, max_depth):
+    collector = NPMDataCollector(registry_url)
+    builder = DependencyGraphBuilder(collector, jobs)
+
+    started = time.perf_counter()
+    graph = builder.build_dependency_graph("pkg-0", max_depth=max_depth)
+    return graph, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк параллельной загрузки пакетов')
+    parser.add_argument('--packages', type=int, default=300, help='Размер синтетического реестра')
+    parser.add_argument('--fanout', type=int, default=4, help='Зависимостей у каждого пакета')
+    parser.add_argument('--latency', type=float, default=0.05, help='Задержка ответа сервера, с')
+    parser.add_argument('--max-depth', type=int, default=4, help='Максимальная глубина обхода')
+    parser.add_argument('--jobs', default='1,2,4,8,16,32', help='Список значений --jobs через запятую')
+    args = parser.parse_args()
+
+    registry = generate_registry(args.packages, args.fanout)
+
+    with StubRegistry(registry, args.latency) as stub:
+        reference = None
+        baseline = None
+
+        print(f"{'jobs':>6} {'узлов':>7} {'запросов':>9} {'время, с':>9} {'ускорение':>10}")
+        for jobs in (int(j) for j in args.jobs.split(',')):
+            stub.requests = 0
+            graph, elapsed = run(stub.url, jobs, args.max_depth)
+
+            if reference is None:
+                reference, baseline = graph, elapsed
+            elif graph != reference:
+                print(f" Граф при jobs={jobs} отличается от последовательного", file=sys.stderr)
+                sys.exit(1)
+
+            print(f"{jobs:>6} {len(graph):>7} {stub.requests:>9} {elapsed:>9.3f} {baseline / elapsed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
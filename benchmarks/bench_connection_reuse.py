@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Проверка и бенчмарк пула соединений: сколько соединений открывает обход на
+локальном stub-реестре с переиспользованием keep-alive и без него, и что
+ответы 429/503 повторяются с соблюдением Retry-After
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collector import NPMDataCollector
+from graph_builder import DependencyGraphBuilder
+from stub_registry import StubRegistry, generate_registry
+
+ROOT = "@bench/root"
+
+
+def build_registry(packages, fanout):
+    # Корень - пакет со scope: проверяет кодирование "@scope%2fname" в URL
+    registry = generate_registry(packages, fanout)
+    registry[ROOT] = {
+        "name": ROOT,
+        "dist-tags": {"latest": "1.0.0"},
+        "versions": {"1.0.0": {"name": ROOT, "version": "1.0.0", "dependencies": {"pkg-0": "^1.0.0"}}}
+    }
+    return registry
+
+
+def crawl(stub, jobs, max_depth, reuse=True):
+    collector = NPMDataCollector(stub.url)
+    if not reuse:
+        collector.http.max_idle = 0
+    builder = DependencyGraphBuilder(collector, jobs)
+
+    stub.requests = stub.connections = 0
+    started = time.perf_counter()
+    graph = builder.build_dependency_graph(ROOT, max_depth=max_depth)
+    elapsed = time.perf_counter() - started
+    collector.close()
+
+    errors = [key for key, deps in graph.items() if "ERROR" in deps]
+    if errors:
+        print(f" Ошибки загрузки: {errors[:5]}", file=sys.stderr)
+        sys.exit(1)
+
+    return graph, elapsed, collector.http
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк пула keep-alive соединений')
+    parser.add_argument('--packages', type=int, default=300, help='Размер синтетического реестра')
+    parser.add_argument('--fanout', type=int, default=4, help='Зависимостей у каждого пакета')
+    parser.add_argument('--max-depth', type=int, default=5, help='Максимальная глубина обхода')
+    parser.add_argument('--jobs', type=int, default=8, help='Число параллельных загрузок')
+    parser.add_argument('--connect-latency', type=float, default=0.02,
+                        help='Задержка открытия соединения на сервере (рукопожатие), с')
+    args = parser.parse_args()
+
+    registry = build_registry(args.packages, args.fanout)
+
+    with StubRegistry(registry, connect_latency=args.connect_latency) as stub:
+        print(f"{'режим':<18} {'узлов':>6} {'запросов':>9} {'соединений':>11} {'время, с':>9}")
+
+        reference, elapsed, _ = crawl(stub, args.jobs, args.max_depth, reuse=False)
+        print(f"{'без keep-alive':<18} {len(reference):>6} {stub.requests:>9} {stub.connections:>11} {elapsed:>9.3f}")
+
+        graph, elapsed, pool = crawl(stub, args.jobs, args.max_depth)
+        print(f"{'пул keep-alive':<18} {len(graph):>6} {stub.requests:>9} {stub.connections:>11} {elapsed:>9.3f}")
+
+        if graph != reference:
+            print(" Графы с пулом и без него различаются", file=sys.stderr)
+            sys.exit(1)
+        if stub.connections > args.jobs or pool.connections_opened != stub.connections:
+            print(f" Ожидалось не больше {args.jobs} соединений, открыто {stub.connections}", file=sys.stderr)
+            sys.exit(1)
+
+    # Временные отказы: по два ответа 503/429 на несколько пакетов, Retry-After: 0
+    failing = [name for name in list(reference) if name != f"{ROOT}@1.0.0"][:10]
+    failures = {name.rsplit('@', 1)[0]: [503, 429] for name in failing}
+
+    with StubRegistry(registry, failures=failures, retry_after=0) as stub:
+        graph, elapsed, pool = crawl(stub, args.jobs, args.max_depth)
+        print(f"{'с отказами 429/503':<18} {len(graph):>6} {stub.requests:>9} {stub.connections:>11} {elapsed:>9.3f}"
+              f"  повторов: {pool.retried}")
+
+        if graph != reference or pool.retried != 2 * len(failures):
+            print(" Повторы после 429/503 отработали неверно", file=sys.stderr)
+            sys.exit(1)
+
+    print(" OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк потоковых выгрузок графа (JSON Lines, GraphML, DOT, двоичный список
+ребер): время, размер файла и пиковая память сверх самого графа
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compact_graph import CompactGraph
+from graph_exporters import EXPORTERS, export_graph, read_edge_list
+
+
+def generate_graph(nodes, fanout, seed=42):
+    rng = random.Random(seed)
+    graph = {}
+    for i in range(nodes):
+        graph[f"pkg-{i}@1.0.{i % 7}"] = {f"pkg-{dep}": f"^1.0.{dep % 7}" for dep in rng.sample(range(nodes), fanout)}
+    return CompactGraph.from_dict(graph)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк потоковых выгрузок графа')
+    parser.add_argument('--nodes', type=int, default=100000, help='Число узлов')
+    parser.add_argument('--fanout', type=int, default=5, help='Зависимостей у каждого узла')
+    args = parser.parse_args()
+
+    graph = generate_graph(args.nodes, args.fanout)
+    print(f" Узлов: {len(graph)}, ребер: {graph.edge_count}")
+    print(f"{'формат':<10} {'время, с':>9} {'размер, МБ':>11} {'пик памяти, КБ':>15}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for export_format in EXPORTERS:
+            path = os.path.join(directory, f"graph.{export_format}")
+
+            started = time.perf_counter()
+            export_graph(graph, path, export_format)
+            elapsed = time.perf_counter() - started
+
+            # Память меряется отдельным прогоном: tracemalloc сильно замедляет запись
+            tracemalloc.start()
+            export_graph(graph, path, export_format)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            print(f"{export_format:<10} {elapsed:>9.2f} {os.path.getsize(path) / 1024 / 1024:>11.1f} "
+                  f"{peak / 1024:>15.0f}")
+
+            if export_format == 'edges':
+                with open(path, 'rb') as f:
+                    keys, pairs = read_edge_list(f)
+                if keys != graph.keys or len(pairs) != 2 * graph.edge_count:
+                    print(" Двоичный список ребер прочитан неверно", file=sys.stderr)
+                    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк аналитики графа (компоненты сильной связности, сжатый граф,
+глубины, степени узлов) на сгенерированных графах до 1M ребер
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph_analytics import GraphAnalysis
+
+
+def random_graph(nodes, fanout, seed=42):
+    # Случайный граф с обратными ребрами: много циклов разного размера
+    rng = random.Random(seed)
+    offsets = array('I', [0])
+    targets = array('I')
+    for _ in range(nodes):
+        targets.extend(rng.randrange(nodes) for _ in range(fanout))
+        offsets.append(len(targets))
+    return offsets, targets
+
+
+def layered_dag(nodes, fanout, seed=42):
+    # Ацикличный граф: зависимости только на узлы с большим номером
+    rng = random.Random(seed)
+    offsets = array('I', [0])
+    targets = array('I')
+    for node in range(nodes):
+        if node + 1 < nodes:
+            targets.extend(rng.randrange(node + 1, nodes) for _ in range(fanout))
+        offsets.append(len(targets))
+    return offsets, targets
+
+
+def chain(nodes):
+    # Длинная цепочка с замыканием в конце: рекурсивный DFS здесь падает
+    offsets = array('I', range(nodes + 1))
+    targets = array('I', range(1, nodes))
+    targets.append(0)
+    return offsets, targets
+
+
+def recursive_has_cycle(offsets, targets):
+    # Прежняя проверка циклов (рекурсивный DFS) для сравнения
+    visited, recursion_stack = set(), set()
+
+    def visit(node):
+        visited.add(node)
+        recursion_stack.add(node)
+        for neighbor in targets[offsets[node]:offsets[node + 1]]:
+            if neighbor not in visited:
+                if visit(neighbor):
+                    return True
+            elif neighbor in recursion_stack:
+                return True
+        recursion_stack.remove(node)
+        return False
+
+    return any(visit(node) for node in range(len(offsets) - 1) if node not in visited)
+
+
+def run(name, offsets, targets):
+    started = time.perf_counter()
+    analysis = GraphAnalysis(offsets, targets)
+    elapsed = time.perf_counter() - started
+
+    try:
+        recursive = 'да' if recursive_has_cycle(offsets, targets) else 'нет'
+    except RecursionError:
+        recursive = 'RecursionError'
+
+    print(f" {name:<28} узлов {analysis.node_count:>8}, ребер {analysis.edge_count:>8}: "
+          f"{elapsed * 1000:8.1f} мс, компонент {len(analysis.components):>8}, "
+          f"циклов {len(analysis.cycles):>6}, глубина {analysis.max_depth}/{analysis.max_longest_depth}, "
+          f"рекурсивный DFS: {recursive}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк аналитики графа зависимостей')
+    parser.add_argument('--max-edges', type=int, default=1000000, help='Наибольшее число ребер')
+    parser.add_argument('--fanout', type=int, default=5, help='Зависимостей у каждого узла')
+    args = parser.parse_args()
+
+    edges = 10000
+    while edges <= args.max_edges:
+        nodes = edges // args.fanout
+        run(f"случайный ({edges} ребер)", *random_graph(nodes, args.fanout))
+        run(f"DAG ({edges} ребер)", *layered_dag(nodes, args.fanout))
+        edges *= 10
+
+    run(f"цепочка ({args.max_edges // 10} узлов)", *chain(args.max_edges // 10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк инкрементального обновления графа (--since): полный обход против
+обновления по снимку, когда в реестре изменилась малая доля пакетов
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collector import NPMDataCollector
+from graph_builder import DependencyGraphBuilder
+from graph_snapshot import (SnapshotCollector, check_freshness, diff_snapshots, load_snapshot, save_snapshot,
+                            snapshot_from_graph)
+from stub_registry import StubRegistry, generate_registry
+
+
+def publish(registry, names, seed=7):
+    # Новая минорная версия с другим набором зависимостей становится latest
+    rng = random.Random(seed)
+    all_names = list(registry)
+    for name in names:
+        document = registry[name]
+        latest = document["dist-tags"]["latest"]
+        major, minor, patch = (int(part) for part in latest.split('.'))
+        version = f"{major}.{minor + 1}.{patch}"
+        data = dict(document["versions"][latest], version=version)
+        data["dependencies"] = dict(data.get("dependencies", {}))
+        data["dependencies"][rng.choice(all_names)] = "^1.0.0"
+        document["versions"] = dict(document["versions"], **{version: data})
+        document["dist-tags"] = {"latest": version}
+
+
+def crawl(stub, jobs, max_depth, snapshot=None):
+    collector = NPMDataCollector(stub.url)
+    crawl_collector = collector
+    stub.requests = stub.bytes_sent = 0
+
+    started = time.perf_counter()
+    if snapshot:
+        unchanged = check_freshness(collector, snapshot, jobs)
+        crawl_collector = SnapshotCollector(collector, snapshot, unchanged)
+    graph = DependencyGraphBuilder(crawl_collector, jobs).build_compact_graph("pkg-0", max_depth=max_depth)
+    elapsed = time.perf_counter() - started
+    collector.close()
+
+    new_snapshot = snapshot_from_graph(graph, crawl_collector, "pkg-0", registry=stub.url, max_depth=max_depth)
+    return new_snapshot, elapsed, crawl_collector
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк инкрементального обновления графа')
+    parser.add_argument('--packages', type=int, default=3000, help='Размер синтетического реестра')
+    parser.add_argument('--fanout', type=int, default=4, help='Зависимостей у каждого пакета')
+    parser.add_argument('--max-depth', type=int, default=8, help='Максимальная глубина обхода')
+    parser.add_argument('--changed', type=float, default=0.01, help='Доля пакетов с новой версией')
+    parser.add_argument('--latency', type=float, default=0.005, help='Задержка ответа сервера, с')
+    parser.add_argument('--jobs', type=int, default=8, help='Число параллельных загрузок')
+    args = parser.parse_args()
+
+    registry = generate_registry(args.packages, args.fanout)
+
+    with StubRegistry(registry, args.latency) as stub, tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'snapshot.json')
+        snapshot, elapsed, _ = crawl(stub, args.jobs, args.max_depth)
+        save_snapshot(path, snapshot)
+        print(f" Исходный обход: {len(snapshot['nodes'])} узлов, {stub.requests} запросов, "
+              f"{stub.bytes_sent / 1024:.0f} КБ, {elapsed:.2f} с")
+
+        names = sorted(name.rsplit('@', 1)[0] for name in snapshot['nodes'])
+        changed = random.Random(1).sample(names, max(1, int(len(names) * args.changed)))
+        publish(registry, changed)
+
+        full, full_time, _ = crawl(stub, args.jobs, args.max_depth)
+        print(f" Полный обход:   {len(full['nodes'])} узлов, {stub.requests} запросов, "
+              f"{stub.bytes_sent / 1024:.0f} КБ, {full_time:.2f} с")
+
+        incremental, incremental_time, collector = crawl(stub, args.jobs, args.max_depth, load_snapshot(path))
+        print(f" По снимку:      {len(incremental['nodes'])} узлов, {stub.requests} запросов, "
+              f"{stub.bytes_sent / 1024:.0f} КБ, {incremental_time:.2f} с "
+              f"(из снимка {collector.reused}, загружено {collector.fetched})")
+
+        if incremental['nodes'] != full['nodes']:
+            print(" Граф по снимку отличается от полного обхода", file=sys.stderr)
+            sys.exit(1)
+
+        changes = diff_snapshots(snapshot, incremental)
+        print(f" Изменено пакетов: {len(changed)}; ребер добавлено {len(changes['added_edges'])}, "
+              f"удалено {len(changes['removed_edges'])}, обновлено {len(changes['upgraded_edges'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк послойной раскладки и потоковой записи SVG на синтетических
+графах зависимостей (по умолчанию 5k узлов, 20k ребер)
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compact_graph import CompactGraph
+from layered_layout import LayeredLayout
+from simple_visualizer import SimpleGraphVisualizer
+
+
+def generate_graph(nodes, edges, levels=12, back_edges=0.01, seed=42):
+    # Граф, похожий на дерево npm: уровни глубины, зависимости в основном на
+    # 1-3 уровня ниже и немного обратных ребер (циклы)
+    rng = random.Random(seed)
+    level_of = [min(levels - 1, int(levels * (i / nodes) ** 0.5)) for i in range(nodes)]
+    by_level = [[] for _ in range(levels)]
+    for node, level in enumerate(level_of):
+        by_level[level].append(node)
+
+    graph = {f"pkg-{node}@1.0.0": {} for node in range(nodes)}
+    keys = list(graph)
+    fanout = max(1, edges // nodes)
+
+    for node in range(nodes):
+        deps = graph[keys[node]]
+        for _ in range(fanout):
+            if rng.random() < back_edges:
+                target_level = rng.randrange(0, level_of[node] + 1)
+            else:
+                target_level = min(levels - 1, level_of[node] + rng.choice((1, 1, 1, 2, 3)))
+            target = rng.choice(by_level[target_level])
+            if target != node:
+                deps[f"pkg-{target}"] = "^1.0.0"
+
+    return CompactGraph.from_dict(graph)
+
+
+def count_crossings(layout):
+    # Пересечения ребер между соседними слоями (по порядку вершин внутри слоя)
+    position = {}
+    for vertices in layout.layers:
+        for index, vertex in enumerate(vertices):
+            position[vertex] = index
+
+    crossings = 0
+    for vertices in layout.layers:
+        pairs = sorted((position[vertex], position[below]) for vertex in vertices
+                       for below in layout._down[vertex])
+        # Инверсии во второй координате = пересечения (сортировка слиянием)
+        crossings += _inversions([below for _, below in pairs])
+    return crossings
+
+
+def _inversions(values):
+    if len(values) < 2:
+        return 0
+    middle = len(values) // 2
+    left, right = values[:middle], values[middle:]
+    count = _inversions(left) + _inversions(right)
+    i = j = 0
+    merged = []
+    while i < len(left) and j < len(right):
+        if left[i] <= right[j]:
+            merged.append(left[i])
+            i += 1
+        else:
+            merged.append(right[j])
+            count += len(left) - i
+            j += 1
+    merged.extend(left[i:])
+    merged.extend(right[j:])
+    values[:] = merged
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк послойной раскладки SVG')
+    parser.add_argument('--nodes', type=int, default=5000, help='Число узлов')
+    parser.add_argument('--edges', type=int, default=20000, help='Примерное число ребер')
+    parser.add_argument('--sweeps', type=int, default=4, help='Проходов упорядочивания по барицентрам')
+    args = parser.parse_args()
+
+    graph = generate_graph(args.nodes, args.edges)
+    graph.analysis()
+
+    unordered = LayeredLayout(graph, sweeps=0).compute()
+
+    started = time.perf_counter()
+    layout = LayeredLayout(graph, sweeps=args.sweeps).compute()
+    layout_time = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'graph.svg')
+        started = time.perf_counter()
+        SimpleGraphVisualizer().generate_svg(graph, path)
+        total_time = time.perf_counter() - started
+        size = os.path.getsize(path)
+
+    print(f" Узлов: {len(graph)}, ребер: {graph.edge_count}, слоев: {len(layout.layers)}, "
+          f"фиктивных узлов: {layout.dummy_count}")
+    print(f" Пересечений ребер: {count_crossings(unordered)} без упорядочивания, "
+          f"{count_crossings(layout)} после {args.sweeps} проходов")
+    print(f" Раскладка: {layout_time:.2f} с")
+    print(f" Раскладка и запись SVG: {total_time:.2f} с ({size / 1024 / 1024:.1f} МБ)")
+
+
+if __name__ == "__main__":
+    main()
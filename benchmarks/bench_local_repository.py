@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк тестового режима: индекс файла репозитория против json.load на каждый пакет
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collector import NPMDataCollector
+from graph_builder import DependencyGraphBuilder
+from stub_registry import generate_test_repository
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк индекса тестового репозитория')
+    parser.add_argument('--packages', type=int, default=100000, help='Пакетов в синтетическом снимке')
+    parser.add_argument('--fanout', type=int, default=4, help='Зависимостей у каждого пакета')
+    parser.add_argument('--max-depth', type=int, default=6, help='Максимальная глубина обхода')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'snapshot.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(generate_test_repository(args.packages, args.fanout), f)
+
+        print(f" Снимок: {args.packages} пакетов, {os.path.getsize(path) / 1024 / 1024:.1f} МБ")
+
+        # Старый путь: полный json.load на каждый запрошенный пакет
+        started = time.perf_counter()
+        with open(path, 'r', encoding='utf-8') as f:
+            json.load(f)
+        full_load = time.perf_counter() - started
+
+        collector = NPMDataCollector(path, test_mode=True)
+
+        started = time.perf_counter()
+        indexed = len(collector.local_repository)
+        index_time = time.perf_counter() - started
+
+        builder = DependencyGraphBuilder(collector)
+        started = time.perf_counter()
+        graph = builder.build_dependency_graph("pkg-0", max_depth=args.max_depth)
+        crawl_time = time.perf_counter() - started
+
+        print(f" json.load всего файла:      {full_load:8.3f} с")
+        print(f" Построение индекса:         {index_time:8.3f} с ({indexed} записей)")
+        print(f" Обход ({len(graph)} узлов):      {crawl_time:8.3f} с, "
+              f"{crawl_time / len(graph) * 1e6:.1f} мкс на пакет")
+        print(f" Оценка старого пути:        {full_load * len(graph):8.3f} с "
+              f"({len(graph)} x json.load)")
+
+
+if __name__ == "__main__":
+    main()
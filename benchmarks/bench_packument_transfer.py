@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк загрузки метаданных: полный документ + json.loads против
+сокращенного формата, gzip и потокового разбора в NPMDataCollector
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import urllib.request
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collector import NPMDataCollector
+from stub_registry import StubRegistry, generate_registry
+
+
+def fetch_full(registry_url):
+    # Прежний способ: весь документ в память, затем json.loads
+    def fetch(name):
+        with urllib.request.urlopen(f"{registry_url}/{name}", timeout=15) as response:
+            data = json.loads(response.read().decode('utf-8'))
+        return data['versions'][data['dist-tags']['latest']].get('dependencies', {})
+
+    return fetch
+
+
+def fetch_streaming(registry_url):
+    collector = NPMDataCollector(registry_url)
+    return collector.get_package_dependencies
+
+
+def measure(stub, make_fetch, names):
+    stub.requests = stub.bytes_sent = 0
+    fetch = make_fetch(stub.url)
+    started = time.perf_counter()
+    for name in names:
+        fetch(name)
+    elapsed = time.perf_counter() - started
+    sent = stub.bytes_sent
+
+    # Пик памяти на один пакет: сверх того, что было занято до его загрузки
+    fetch = make_fetch(stub.url)
+    peak = 0
+    tracemalloc.start()
+    for name in names:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fetch(name)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    return elapsed, sent, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк объема загрузки метаданных пакетов')
+    parser.add_argument('--packages', type=int, default=50, help='Число пакетов')
+    parser.add_argument('--versions', type=int, default=300, help='Версий у каждого пакета')
+    parser.add_argument('--readme-size', type=int, default=200000, help='Размер readme, байт')
+    args = parser.parse_args()
+
+    registry = generate_registry(args.packages, versions=args.versions, readme_size=args.readme_size)
+    names = list(registry)
+
+    with StubRegistry(registry) as stub:
+        rows = [
+            ("полный документ", measure(stub, fetch_full, names)),
+            ("сокращенный+gzip+поток", measure(stub, fetch_streaming, names)),
+        ]
+
+    print(f"{'способ':<24} {'время, с':>9} {'КБ/пакет':>10} {'пик на пакет, КБ':>17}")
+    for title, (elapsed, sent, peak) in rows:
+        print(f"{title:<24} {elapsed:>9.3f} {sent / len(names) / 1024:>10.1f} {peak / 1024:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк разбора большого файла тестового репозитория: обход построителем
+против параллельной загрузки всего файла в 1..N процессах с выделением
+подграфа от корня. Графы сверяются с результатом обхода.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collector import NPMDataCollector
+from graph_builder import DependencyGraphBuilder
+from graph_shapes import SHAPES, generate_shape
+from parallel_repository import load_repository_graph, reachable_subgraph
+
+UNLIMITED_DEPTH = 1 << 30
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк параллельного разбора файла репозитория')
+    parser.add_argument('--packages', type=int, default=200000, help='Пакетов в синтетическом файле')
+    parser.add_argument('--fanout', type=int, default=5, help='Зависимостей у каждого пакета')
+    parser.add_argument('--shape', choices=SHAPES, default='wide', help='Форма графа')
+    parser.add_argument('--workers', default='1,2,4,8', help='Числа процессов через запятую')
+    parser.add_argument('--max-depth', type=int, default=UNLIMITED_DEPTH, help='Максимальная глубина обхода')
+    args = parser.parse_args()
+
+    workers = [int(value) for value in args.workers.split(',') if value.strip()]
+    root = f"{args.shape}-0"
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'repository.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(generate_shape(args.shape, args.packages, args.fanout), f)
+        print(f"Файл: {args.packages} пакетов, {os.path.getsize(path) / 1e6:.1f} МБ, "
+              f"процессоров: {os.cpu_count()}")
+
+        with redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            collector = NPMDataCollector(path, test_mode=True)
+            expected = DependencyGraphBuilder(collector).build_compact_graph(root, max_depth=args.max_depth)
+            DependencyGraphBuilder(collector).get_graph_statistics(expected)
+            crawl_time = time.perf_counter() - started
+        expected = expected.to_dict()
+        print(f"  обход построителем:        {crawl_time:8.3f} с")
+
+        for count in workers:
+            started = time.perf_counter()
+            repository = load_repository_graph(path, count)
+            load_time = time.perf_counter() - started
+            graph = reachable_subgraph(repository, root, args.max_depth)
+            DependencyGraphBuilder(None).get_graph_statistics(graph)
+            total = time.perf_counter() - started
+
+            status = "совпадает" if graph.to_dict() == expected else "ОТЛИЧАЕТСЯ"
+            print(f"  {count:>2} процессов: разбор {load_time:8.3f} с, всего {total:8.3f} с "
+                  f"(x{crawl_time / total:.2f}), граф {status}")
+            if status != "совпадает":
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
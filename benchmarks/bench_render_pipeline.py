@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк вывода нескольких форматов: каждый формат отдельным вызовом (свой
+проход по графу на формат, как до --formats) против однопроходного
+RenderPipeline последовательно и в пуле потоков. Файлы сверяются побайтно.
+"""
+
+import argparse
+import filecmp
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collector import NPMDataCollector
+from graph_builder import DependencyGraphBuilder
+from graph_exporters import export_graph
+from graph_shapes import SHAPES, generate_shape
+from render_pipeline import RenderPipeline, VISUAL_FORMATS, output_files, parse_formats
+from simple_visualizer import SimpleGraphVisualizer
+
+UNLIMITED_DEPTH = 1 << 30
+
+
+def write_separately(graph, outputs, title):
+    visualizer = SimpleGraphVisualizer()
+    writers = {'svg': visualizer.generate_svg, 'puml': visualizer.save_plantuml_code,
+               'txt': visualizer.save_text_diagram}
+    for output_format, path in outputs:
+        if output_format in VISUAL_FORMATS:
+            writers[output_format](graph, path, title)
+        else:
+            export_graph(graph, path, output_format)
+
+
+def measure(repeat, function):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк однопроходного вывода нескольких форматов')
+    parser.add_argument('--packages', type=int, default=5000, help='Пакетов в синтетическом графе')
+    parser.add_argument('--fanout', type=int, default=4, help='Зависимостей у каждого пакета')
+    parser.add_argument('--shape', choices=SHAPES, default='wide', help='Форма графа')
+    parser.add_argument('--formats', default='svg,puml,txt,jsonl,graphml,dot,edges', help='Форматы через запятую')
+    parser.add_argument('--workers', default='1,2,4', help='Числа потоков пула через запятую')
+    parser.add_argument('--repeat', type=int, default=3, help='Прогонов каждого варианта (берется лучший)')
+    args = parser.parse_args()
+
+    formats = parse_formats(args.formats)
+    workers = [int(value) for value in args.workers.split(',') if value.strip()]
+    title = f"Граф {args.shape}"
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'repository.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(generate_shape(args.shape, args.packages, args.fanout), f)
+        with redirect_stdout(io.StringIO()):
+            collector = NPMDataCollector(path, test_mode=True)
+            graph = DependencyGraphBuilder(collector).build_compact_graph(f"{args.shape}-0",
+                                                                          max_depth=UNLIMITED_DEPTH)
+        graph.analysis()
+        print(f"Граф: {len(graph)} узлов, {graph.edge_count} ребер, форматы: {', '.join(formats)}, "
+              f"процессоров: {os.cpu_count()}")
+
+        expected = output_files(os.path.join(directory, 'separate'), formats)
+        separate = measure(args.repeat, lambda: write_separately(graph, expected, title))
+        print(f"  по формату отдельно:   {separate:8.3f} с")
+
+        failed = False
+        for count in workers:
+            outputs = output_files(os.path.join(directory, f'pipeline-{count}'), formats)
+            pipeline = RenderPipeline(workers=count)
+            elapsed = measure(args.repeat, lambda: pipeline.run(graph, outputs, title))
+            same = all(filecmp.cmp(a, b, shallow=False) for (_, a), (_, b) in zip(expected, outputs))
+            failed = failed or not same
+            print(f"  конвейер, {count:>2} потоков: {elapsed:8.3f} с (x{separate / elapsed:.2f}), "
+                  f"файлы {'совпадают' if same else 'ОТЛИЧАЮТСЯ'}")
+
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк холодного старта CLI: время процесса и время импортов по
+python -X importtime для типовых запусков. Проверяет, что режимам не
+загружаются чужие тяжелые модули (сеть, SQLite, сервер, процессы, XML),
+и с --baseline сравнивает с сохраненным прогоном: при замедлении сверх порога
+скрипт завершается с кодом 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, 'main.py')
+TEST_GRAPH = os.path.join(ROOT, 'test_graph.json')
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_baseline.json')
+
+# Модули, которые тестовому режиму и справке загружать незачем
+HEAVY_MODULES = ('ssl', 'http.client', 'urllib.request', 'sqlite3', 'multiprocessing', 'http.server',
+                 'xml.sax.saxutils')
+
+
+def scenarios(directory):
+    output = os.path.join(directory, 'graph')
+    return {
+        'help': (['--help'], HEAVY_MODULES),
+        'test-jsonl': (['--package', 'A', '--repo-url', TEST_GRAPH, '--test-mode',
+                        '--output', f'{output}.jsonl', '--json'], HEAVY_MODULES),
+        'test-svg': (['--package', 'A', '--repo-url', TEST_GRAPH, '--test-mode',
+                      '--output', f'{output}.svg', '--quiet'], HEAVY_MODULES),
+        'invalid': (['--package', 'A', '--repo-url', os.path.join(directory, 'missing.json'), '--test-mode',
+                     '--json'], HEAVY_MODULES)
+    }
+
+
+def parse_importtime(stderr):
+    # Строки "import time: self | cumulative | модуль"; верхний уровень - без отступа
+    modules = {}
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+        if not name.startswith('  '):
+            total += int(cumulative)
+    return total / 1e6, modules
+
+
+def run(arguments):
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', MAIN] + arguments, cwd=ROOT,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - started
+    imports, modules = parse_importtime(process.stderr)
+    return elapsed, imports, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк холодного старта CLI')
+    parser.add_argument('--repeat', type=int, default=10, help='Запусков каждого сценария (берется лучший)')
+    parser.add_argument('--top', type=int, default=5, help='Сколько самых дорогих импортов показать')
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    parser.add_argument('--baseline', nargs='?', const=BASELINE_FILE,
+                        help='Сравнить с сохраненным прогоном (по умолчанию benchmarks/startup_baseline.json)')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Допустимое замедление, доля')
+    parser.add_argument('--min-delta', type=float, default=0.015,
+                        help='Замедления меньше этого, с, не считаются регрессией')
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (arguments, forbidden) in scenarios(directory).items():
+            best = None
+            for _ in range(args.repeat):
+                elapsed, imports, modules = run(arguments)
+                if best is None or elapsed < best[0]:
+                    best = (elapsed, imports, modules)
+            elapsed, imports, modules = best
+
+            results[f"{name}/process"] = elapsed
+            results[f"{name}/imports"] = imports
+            print(f" {name}: процесс {elapsed * 1000:7.1f} мс, импорты {imports * 1000:6.1f} мс, "
+                  f"модулей {len(modules)}")
+
+            top_level = sorted(((cumulative, module) for module, cumulative in modules.items()
+                                if '.' not in module), reverse=True)[:args.top]
+            for cumulative, module in top_level:
+                print(f"    {module:<24} {cumulative / 1000:6.1f} мс")
+
+            loaded = [module for module in forbidden if module in modules]
+            if loaded:
+                failures.append(f"{name}: загружены {', '.join(loaded)}")
+
+    for failure in failures:
+        print(f" Лишние импорты в {failure}", file=sys.stderr)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "results": results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f" Результаты сохранены: {args.output}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)["results"]
+        for stage, elapsed in results.items():
+            previous = baseline.get(stage)
+            if previous is not None and elapsed > previous * (1 + args.threshold) and \
+                    elapsed - previous > args.min_delta:
+                regressions.append(stage)
+                print(f" Регрессия {stage}: {previous * 1000:.1f} мс -> {elapsed * 1000:.1f} мс "
+                      f"(+{(elapsed / previous - 1) * 100:.0f}%)", file=sys.stderr)
+        if not regressions:
+            print(f" Регрессий нет (порог {args.threshold * 100:.0f}%)")
+
+    if failures or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк раскладки SVG на больших графах (по умолчанию 10k узлов): послойная
+раскладка поэлементно и массивами NumPy, вывод ребер SVG по одному ребру
+(прежний код) и пачкой из edge_points(), раскладка stress. Порядок вершин в
+слоях должен совпасть, координаты - с точностью до округления.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collector import NPMDataCollector
+from graph_builder import DependencyGraphBuilder
+from graph_shapes import SHAPES, generate_shape
+from layered_layout import NODE_HEIGHT, LayeredLayout, numpy_module
+from simple_visualizer import EDGE_CLASSES, WRITE_CHUNK
+from stress_layout import StressLayout
+
+UNLIMITED_DEPTH = 1 << 30
+
+
+def write_edges_per_route(f, layout):
+    # Ребра SVG так, как их писал _write_svg до edge_points(): точки, обрезка и
+    # форматирование в цикле по каждому ребру
+    x, y = layout.x, layout.y
+    half_height = NODE_HEIGHT / 2
+    for chain, reversed_edge in layout.routes:
+        points = [(x[vertex], y[vertex]) for vertex in chain]
+        direction = 1 if points[-1][1] >= points[0][1] else -1
+        points[0] = (points[0][0], points[0][1] + direction * half_height)
+        points[-1] = (points[-1][0], points[-1][1] - direction * half_height)
+        css = 'edge edge-back' if reversed_edge else 'edge'
+        coordinates = ' '.join(f'{px:.1f},{py:.1f}' for px, py in points)
+        f.write(f'<polyline points="{coordinates}" class="{css}"/>\n')
+
+
+def write_edges_batched(f, layout):
+    # То же, что SimpleGraphVisualizer._write_svg
+    starts, px, py = layout.edge_points()
+    points = [f'{point_x:.1f},{point_y:.1f}' for point_x, point_y in zip(px, py)]
+    back = layout.back
+    for first in range(0, len(back), WRITE_CHUNK):
+        f.write(''.join([f'<polyline points="{" ".join(points[starts[route]:starts[route + 1]])}" '
+                         f'class="{EDGE_CLASSES[back[route]]}"/>\n'
+                         for route in range(first, min(first + WRITE_CHUNK, len(back)))]))
+
+
+def measure(repeat, function):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def max_difference(first, second):
+    return max((abs(a - b) for a, b in zip(first, second)), default=0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк векторизованной раскладки SVG')
+    parser.add_argument('--packages', type=int, default=10000, help='Пакетов в синтетическом графе')
+    parser.add_argument('--fanout', type=int, default=4, help='Зависимостей у каждого пакета')
+    parser.add_argument('--shapes', default=','.join(SHAPES), help='Формы графов через запятую')
+    parser.add_argument('--repeat', type=int, default=3, help='Прогонов каждого варианта (берется лучший)')
+    parser.add_argument('--stress-python', action='store_true',
+                        help='Считать stress и без NumPy (на 10k узлов - десятки секунд)')
+    args = parser.parse_args()
+
+    numpy = numpy_module()
+    print(f"NumPy: {numpy.__version__ if numpy else 'нет (только поэлементные варианты)'}")
+    failed = False
+
+    with tempfile.TemporaryDirectory() as directory:
+        for shape in args.shapes.split(','):
+            path = os.path.join(directory, f'{shape}.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(generate_shape(shape, args.packages, args.fanout), f)
+            with redirect_stdout(io.StringIO()):
+                graph = DependencyGraphBuilder(NPMDataCollector(path, test_mode=True)).build_compact_graph(
+                    f"{shape}-0", max_depth=UNLIMITED_DEPTH)
+            graph.analysis()
+
+            python_time, python_layout = measure(args.repeat,
+                                                 lambda: LayeredLayout(graph, vectorized=False).compute())
+            print(f"\n{shape}: {len(graph)} узлов, {graph.edge_count} ребер, слоев {len(python_layout.layers)}, "
+                  f"фиктивных узлов {python_layout.dummy_count}")
+            print(f"  послойная, поэлементно:  {python_time:8.3f} с")
+
+            per_route, _ = measure(args.repeat, lambda: write_edges_per_route(io.StringIO(), python_layout))
+            batched, _ = measure(args.repeat, lambda: write_edges_batched(io.StringIO(), python_layout))
+            print(f"  ребра SVG по одному:     {per_route:8.3f} с")
+            print(f"  ребра SVG пачкой:        {batched:8.3f} с (x{per_route / batched:.2f})")
+
+            if numpy:
+                vector_time, vector_layout = measure(args.repeat, lambda: LayeredLayout(graph).compute())
+                same_order = vector_layout.layers == python_layout.layers
+                difference = max_difference(python_layout.x, vector_layout.x)
+                print(f"  послойная, NumPy:        {vector_time:8.3f} с (x{python_time / vector_time:.2f}), "
+                      f"порядок {'совпадает' if same_order else 'ОТЛИЧАЕТСЯ'}, расхождение x {difference:.1e}")
+                vector_batched, _ = measure(args.repeat, lambda: write_edges_batched(io.StringIO(), vector_layout))
+                print(f"  ребра SVG пачкой, NumPy: {vector_batched:8.3f} с (x{per_route / vector_batched:.2f})")
+                failed = failed or not same_order or difference > 1e-6
+
+                stress_time, stress = measure(1, lambda: StressLayout(graph).compute())
+                print(f"  stress, NumPy:           {stress_time:8.3f} с ({stress.iterations_done} итераций)")
+
+            if args.stress_python or not numpy:
+                stress_time, python_stress = measure(1, lambda: StressLayout(graph, vectorized=False).compute())
+                print(f"  stress, поэлементно:     {stress_time:8.3f} с ({python_stress.iterations_done} итераций)")
+                if numpy:
+                    difference = max_difference(python_stress.x, stress.x)
+                    print(f"  расхождение stress:      {difference:.1e}")
+                    failed = failed or difference > 1e-6
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
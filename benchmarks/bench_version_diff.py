@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сравнения версий корня (--diff-version): два независимых обхода и
+сравнение снимков (diff_snapshots) против двух обходов через общий коллектор с
+памятью поддеревьев и сравнения по хэшам поддеревьев (GraphDiff). Изменения
+обоих способов должны совпасть.
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collector import NPMDataCollector
+from graph_builder import DependencyGraphBuilder
+from graph_diff import GraphDiff
+from graph_snapshot import diff_snapshots, snapshot_from_graph
+from stub_registry import StubRegistry, generate_registry
+from subgraph_memo import SubgraphMemo
+
+ROOT = "pkg-0"
+
+
+def release(registry, upgraded, seed=7):
+    # Новая версия корня 1.1.0: несколько прямых зависимостей переходят на новую
+    # мажорную версию с другим набором зависимостей, одна зависимость добавляется
+    rng = random.Random(seed)
+    names = list(registry)
+    root = registry[ROOT]
+    data = dict(root["versions"]["1.0.0"], version="1.1.0")
+    dependencies = dict(data["dependencies"])
+
+    for name in list(dependencies)[:upgraded]:
+        document = registry[name]
+        new_data = dict(document["versions"]["1.0.0"], version="2.0.0")
+        new_dependencies = dict(new_data.get("dependencies", {}))
+        if new_dependencies:
+            new_dependencies.pop(next(iter(new_dependencies)))
+        new_dependencies[rng.choice(names[1:])] = "^1.0.0"
+        new_data["dependencies"] = new_dependencies
+        document["versions"] = dict(document["versions"], **{"2.0.0": new_data})
+        dependencies[name] = "^2.0.0"
+
+    dependencies[rng.choice(names[1:])] = "^1.0.0"
+    data["dependencies"] = dependencies
+    root["versions"] = dict(root["versions"], **{"1.1.0": data})
+
+
+def separate_crawls(stub, jobs, max_depth):
+    # Как без --diff-version: два запуска, каждый со своим коллектором
+    graphs = []
+    for version in ("1.0.0", "1.1.0"):
+        collector = NPMDataCollector(stub.url)
+        graph = DependencyGraphBuilder(collector, jobs).build_compact_graph(ROOT, version, max_depth=max_depth)
+        graphs.append((graph, collector))
+        collector.close()
+    return graphs
+
+
+def shared_crawls(stub, jobs, max_depth):
+    collector = NPMDataCollector(stub.url)
+    memo = SubgraphMemo()
+    builder = DependencyGraphBuilder(collector, jobs, memo=memo)
+    graphs = [builder.build_compact_graph(ROOT, version, max_depth=max_depth) for version in ("1.0.0", "1.1.0")]
+    collector.close()
+    return graphs, memo
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк сравнения версий корневого пакета')
+    parser.add_argument('--packages', type=int, default=3000, help='Размер синтетического реестра')
+    parser.add_argument('--fanout', type=int, default=4, help='Зависимостей у каждого пакета')
+    parser.add_argument('--max-depth', type=int, default=8, help='Максимальная глубина обхода')
+    parser.add_argument('--upgraded', type=int, default=1, help='Сколько прямых зависимостей корня обновить')
+    parser.add_argument('--latency', type=float, default=0.005, help='Задержка ответа сервера, с')
+    parser.add_argument('--jobs', type=int, default=8, help='Число параллельных загрузок')
+    parser.add_argument('--repeat', type=int, default=5, help='Прогонов сравнения (берется лучший)')
+    args = parser.parse_args()
+
+    registry = generate_registry(args.packages, args.fanout)
+    release(registry, args.upgraded)
+
+    with StubRegistry(registry, args.latency) as stub:
+        with redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            separate = separate_crawls(stub, args.jobs, args.max_depth)
+            separate_time = time.perf_counter() - started
+        separate_requests = stub.requests
+        print(f" Два обхода:     {separate_requests} запросов, {separate_time:.2f} с")
+
+        stub.requests = 0
+        with redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            (old, new), memo = shared_crawls(stub, args.jobs, args.max_depth)
+            shared_time = time.perf_counter() - started
+        stats = memo.stats()
+        print(f" Общий обход:    {stub.requests} запросов, {shared_time:.2f} с "
+              f"(поддеревьев вставлено {stats['hits']}, узлов {stats['spliced_nodes']})")
+
+    snapshots = [snapshot_from_graph(graph, collector, ROOT) for graph, collector in separate]
+    best_snapshots = best_diff = None
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        expected = diff_snapshots(*snapshots)
+        elapsed = time.perf_counter() - started
+        best_snapshots = elapsed if best_snapshots is None else min(best_snapshots, elapsed)
+
+        started = time.perf_counter()
+        diff = GraphDiff(old, new)
+        elapsed = time.perf_counter() - started
+        best_diff = elapsed if best_diff is None else min(best_diff, elapsed)
+
+    summary = diff.summary()
+    print(f"\n Графы: {len(old)} и {len(new)} узлов, совпавших поддеревьями {summary['identical_nodes']}, "
+          f"измененных имен {summary['changed_names']}")
+    print(f" diff_snapshots: {best_snapshots * 1000:8.1f} мс (без построения снимков)")
+    print(f" GraphDiff:      {best_diff * 1000:8.1f} мс (с хэшами поддеревьев)")
+    print(f" Пакетов: +{summary['added_packages']} -{summary['removed_packages']} "
+          f"~{summary['upgraded_packages']}; ребер: +{summary['added_edges']} -{summary['removed_edges']} "
+          f"~{summary['upgraded_edges']}")
+
+    if diff.changes != expected:
+        print(" Изменения GraphDiff отличаются от diff_snapshots", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Генераторы синтетических графов зависимостей разной формы для бенчмарков.
+Каждый генератор возвращает репозиторий в формате тестового режима
+{имя: {"version": "1.0.0", "dependencies": {имя: "^1.0.0"}}}; корень - "<форма>-0".
+"""
+
+import random
+
+SHAPES = ('wide', 'chain', 'diamond', 'cyclic')
+
+
+def generate_shape(shape, packages, fanout=4, seed=42):
+    rng = random.Random(seed)
+    names = [f"{shape}-{i}" for i in range(packages)]
+    edges = GENERATORS[shape](packages, fanout, rng)
+
+    repository = {}
+    for node, name in enumerate(names):
+        repository[name] = {
+            "version": "1.0.0",
+            "dependencies": {names[target]: "^1.0.0" for target in edges[node] if target != node}
+        }
+    return repository
+
+
+def _wide(packages, fanout, rng):
+    # Корень зависит от всех пакетов, каждый пакет - от fanout-1 листьев из последних 10%
+    leaves_start = max(1, packages - max(1, packages // 10))
+    edges = [list(range(1, packages))]
+    for node in range(1, packages):
+        if node >= leaves_start:
+            edges.append([])
+        else:
+            edges.append([rng.randrange(leaves_start, packages) for _ in range(fanout - 1)])
+    return edges
+
+
+def _chain(packages, fanout, rng):
+    # Длинная цепочка i -> i+1 с короткими обходными ребрами вперед
+    edges = []
+    for node in range(packages):
+        targets = [node + 1] if node + 1 < packages else []
+        for _ in range(fanout - 1):
+            target = node + rng.randint(2, 10)
+            if target < packages:
+                targets.append(target)
+        edges.append(targets)
+    return edges
+
+
+def _diamond(packages, fanout, rng):
+    # Слои ширины 2*fanout: каждый узел зависит от fanout узлов следующего слоя,
+    # поэтому общие зависимости (ромбы) на каждом уровне
+    width = 2 * fanout
+    edges = []
+    for node in range(packages):
+        layer_start = (node // width + 1) * width
+        if layer_start >= packages:
+            edges.append([])
+            continue
+        layer_end = min(packages, layer_start + width)
+        # Гарантированное ребро делает достижимым каждый узел следующего слоя
+        targets = {layer_start + (node % width) % (layer_end - layer_start)}
+        while len(targets) < min(fanout, layer_end - layer_start):
+            targets.add(rng.randrange(layer_start, layer_end))
+        edges.append(sorted(targets))
+    return edges
+
+
+def _cyclic(packages, fanout, rng):
+    # Случайный граф: цепочка для достижимости, ребра вперед и 5% ребер назад (циклы)
+    edges = []
+    for node in range(packages):
+        targets = [node + 1] if node + 1 < packages else [0]
+        for _ in range(fanout - 1):
+            if rng.random() < 0.05 and node:
+                targets.append(rng.randrange(0, node))
+            else:
+                targets.append(rng.randrange(node, packages))
+        edges.append(targets)
+    return edges
+
+
+def registry_from_repository(repository):
+    # Репозиторий тестового режима -> документы пакетов для stub-реестра
+    registry = {}
+    for name, entry in repository.items():
+        version = entry.get("version", "1.0.0")
+        registry[name] = {
+            "name": name,
+            "dist-tags": {"latest": version},
+            "versions": {version: {"name": name, "version": version, "dependencies": entry["dependencies"]}}
+        }
+    return registry
+
+
+GENERATORS = {
+    'wide': _wide,
+    'chain': _chain,
+    'diamond': _diamond,
+    'cyclic': _cyclic
+}
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Набор бенчмарков по этапам: загрузка метаданных, обход графа, статистика и каждый
+формат вывода на синтетических графах разной формы (широкий, длинные цепочки,
+ромбы, циклы). Источники - файл тестового режима и stub HTTP-реестр.
+
+Результаты пишутся в JSON; с --baseline сравниваются с сохраненным прогоном,
+и при замедлении этапа сверх порога скрипт завершается с кодом 1.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collector import NPMDataCollector
+from graph_builder import DependencyGraphBuilder
+from graph_exporters import EXPORTERS, export_graph
+from render_pipeline import OUTPUT_FORMATS, RenderPipeline, output_files
+from simple_visualizer import SimpleGraphVisualizer
+from graph_shapes import SHAPES, generate_shape, registry_from_repository
+from stub_registry import StubRegistry
+
+# Масштаб -> (пакетов, зависимостей у пакета); large - около миллиона ребер
+SCALES = {
+    'small': (2000, 4),
+    'medium': (20000, 5),
+    'large': (200000, 5)
+}
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+UNLIMITED_DEPTH = 1 << 30
+
+
+def measure(repeat, function):
+    # Лучшее время из repeat прогонов и результат последнего; вывод построителя глушится
+    best = None
+    for _ in range(repeat):
+        with redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_test_mode(shape, repository_path, args, results):
+    root = f"{shape}-0"
+
+    results[f"{shape}/file/index"], _ = measure(args.repeat, lambda: len(
+        NPMDataCollector(repository_path, test_mode=True).local_repository))
+
+    # Индекс файла строится заранее, чтобы обход мерился без него
+    collector = NPMDataCollector(repository_path, test_mode=True)
+    len(collector.local_repository)
+    builder = DependencyGraphBuilder(collector, args.jobs)
+    results[f"{shape}/file/crawl"], graph = measure(args.repeat, lambda: builder.build_compact_graph(
+        root, max_depth=UNLIMITED_DEPTH))
+    results[f"{shape}/file/statistics"], _ = measure(args.repeat, lambda: builder.get_graph_statistics(
+        _fresh(graph)))
+    return graph
+
+
+def bench_http(shape, repository, args, results):
+    root = f"{shape}-0"
+    names = list(repository)
+
+    with StubRegistry(registry_from_repository(repository), args.latency) as stub:
+        def fetch():
+            # Загрузка и разрешение версий всех пакетов в NPMDataCollector
+            collector = NPMDataCollector(stub.url)
+            with ThreadPoolExecutor(args.jobs) as executor:
+                list(executor.map(collector.resolve_version, names))
+            return collector
+
+        results[f"{shape}/http/fetch"], collector = measure(args.repeat, fetch)
+
+        # Обход на прогретом сборщике: только работа построителя графа
+        builder = DependencyGraphBuilder(collector, args.jobs)
+        results[f"{shape}/http/crawl"], graph = measure(args.repeat, lambda: builder.build_compact_graph(
+            root, max_depth=UNLIMITED_DEPTH))
+        collector.close()
+
+    return graph
+
+
+def bench_outputs(shape, graph, args, results, directory):
+    visualizer = SimpleGraphVisualizer()
+    title = f"Граф {shape}"
+    outputs = {
+        'plantuml': lambda path: visualizer.save_plantuml_code(graph, path, title),
+        'text': lambda path: visualizer.save_text_diagram(graph, path, title),
+        'svg': lambda path: visualizer.generate_svg(graph, path, title)
+    }
+    for export_format in EXPORTERS:
+        outputs[export_format] = lambda path, export_format=export_format: export_graph(graph, path, export_format)
+
+    for name, write in outputs.items():
+        if name == 'svg' and len(graph) > args.svg_max_nodes:
+            continue
+        path = os.path.join(directory, f"{shape}.{name}")
+        results[f"{shape}/output/{name}"], _ = measure(args.repeat, lambda: write(path))
+
+    # Все форматы одним проходом (--formats)
+    formats = [name for name in OUTPUT_FORMATS if name != 'svg' or len(graph) <= args.svg_max_nodes]
+    outputs = output_files(os.path.join(directory, f"{shape}-pipeline"), formats)
+    results[f"{shape}/output/pipeline"], _ = measure(args.repeat, lambda: RenderPipeline().run(graph, outputs, title))
+
+
+def _fresh(graph):
+    # Статистика считается заново, а не берется из кэша анализа графа
+    graph._analysis = None
+    return graph
+
+
+def compare(results, baseline, threshold, min_delta):
+    regressions = []
+    for stage, elapsed in results.items():
+        previous = baseline.get(stage)
+        if previous is None:
+            continue
+        if elapsed > previous * (1 + threshold) and elapsed - previous > min_delta:
+            regressions.append((stage, previous, elapsed))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Набор бенчмарков по этапам с проверкой регрессий')
+    parser.add_argument('--scale', choices=SCALES, default='small', help='Размер синтетических графов')
+    parser.add_argument('--shapes', default=','.join(SHAPES), help='Формы графов через запятую')
+    parser.add_argument('--sources', default='file,http', help='Источники данных: file, http')
+    parser.add_argument('--http-max-packages', type=int, default=20000,
+                        help='Больше пакетов через stub HTTP-реестр не гонять')
+    parser.add_argument('--svg-max-nodes', type=int, default=5000, help='Больше узлов SVG не строить')
+    parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа stub-реестра, с')
+    parser.add_argument('--jobs', type=int, default=8, help='Число параллельных загрузок')
+    parser.add_argument('--repeat', type=int, default=3, help='Прогонов каждого этапа (берется лучший)')
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    parser.add_argument('--baseline', nargs='?', const=BASELINE_FILE,
+                        help='Сравнить с сохраненным прогоном (по умолчанию benchmarks/baseline.json)')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Допустимое замедление этапа, доля')
+    parser.add_argument('--min-delta', type=float, default=0.01,
+                        help='Замедления меньше этого, с, не считаются регрессией')
+    args = parser.parse_args()
+
+    shapes = [shape.strip() for shape in args.shapes.split(',') if shape.strip()]
+    unknown = set(shapes) - set(SHAPES)
+    if unknown:
+        parser.error(f"неизвестные формы: {', '.join(sorted(unknown))}")
+    sources = {source.strip() for source in args.sources.split(',')}
+
+    packages, fanout = SCALES[args.scale]
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for shape in shapes:
+            repository = generate_shape(shape, packages, fanout)
+            repository_path = os.path.join(directory, f"{shape}.json")
+            with open(repository_path, 'w', encoding='utf-8') as f:
+                json.dump(repository, f)
+
+            graph = None
+            if 'file' in sources:
+                graph = bench_test_mode(shape, repository_path, args, results)
+            if 'http' in sources and packages <= args.http_max_packages:
+                http_graph = bench_http(shape, repository, args, results)
+                if graph is not None and http_graph.to_dict() != graph.to_dict():
+                    print(f" Граф {shape} из HTTP-реестра отличается от тестового режима", file=sys.stderr)
+                    sys.exit(1)
+                if graph is None:
+                    graph = http_graph
+            if graph is None:
+                continue
+
+            print(f" {shape}: {len(graph)} узлов, {graph.edge_count} ребер")
+            bench_outputs(shape, graph, args, results, directory)
+
+    width = max(len(stage) for stage in results) if results else 0
+    for stage, elapsed in results.items():
+        print(f"   {stage:<{width}} {elapsed:9.4f} с")
+
+    report = {
+        "scale": args.scale,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "results": results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f" Результаты сохранены: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != args.scale:
+            print(f" Базовый прогон снят для масштаба {baseline.get('scale')}, а не {args.scale}", file=sys.stderr)
+            sys.exit(2)
+
+        regressions = compare(results, baseline["results"], args.threshold, args.min_delta)
+        for stage, previous, elapsed in regressions:
+            print(f" Регрессия {stage}: {previous:.4f} с -> {elapsed:.4f} с "
+                  f"(+{(elapsed / previous - 1) * 100:.0f}%)", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f" Регрессий нет (порог {args.threshold * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
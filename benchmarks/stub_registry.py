@@ -0,0 +1,184 @@
+"""
+Локальный stub npm-реестра для бенчмарков: синтетические пакеты и HTTP-сервер
+с искусственной задержкой ответа
+"""
+
+import gzip
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+
+def generate_registry(packages=200, fanout=4, seed=42, versions=1, readme_size=0):
+    rng = random.Random(seed)
+    names = [f"pkg-{i}" for i in range(packages)]
+    registry = {}
+
+    for i, name in enumerate(names):
+        candidates = names[i + 1:]
+        deps = rng.sample(candidates, min(fanout, len(candidates)))
+        version_names = [f"1.{minor}.0" for minor in range(versions)]
+        registry[name] = {
+            "name": name,
+            "dist-tags": {"latest": version_names[-1]},
+            "readme": "x" * readme_size,
+            "versions": {
+                version: {
+                    "name": name,
+                    "version": version,
+                    "description": f"Synthetic package {name}",
+                    "dist": {"tarball": f"https://example.invalid/{name}-{version}.tgz",
+                             "shasum": "0" * 40},
+                    "dependencies": {dep: "^1.0.0" for dep in deps}
+                }
+                for version in version_names
+            }
+        }
+
+    return registry
+
+
+def abbreviate(document):
+    # Сокращенный формат (application/vnd.npm.install-v1+json)
+    return {
+        "name": document["name"],
+        "dist-tags": document["dist-tags"],
+        "modified": "2024-01-01T00:00:00.000Z",
+        "versions": {
+            version: {key: value for key, value in data.items() if key != "description"}
+            for version, data in document["versions"].items()
+        }
+    }
+
+
+def generate_test_repository(packages=100000, fanout=4, seed=42):
+    # Формат файла тестового режима (--test-mode): {имя: {"dependencies": {...}}}
+    rng = random.Random(seed)
+    repository = {}
+
+    for i in range(packages):
+        upper = packages - i - 1
+        deps = {f"pkg-{i + 1 + rng.randrange(upper)}": "^1.0.0" for _ in range(min(fanout, upper))}
+        repository[f"pkg-{i}"] = {"version": "1.0.0", "dependencies": deps}
+
+    return repository
+
+
+class StubRegistry:
+    def __init__(self, registry, latency=0.0, connect_latency=0.0, failures=None, retry_after=None):
+        self.registry = registry
+        self.latency = latency
+        # Задержка при открытии соединения (имитация TCP+TLS-рукопожатия)
+        self.connect_latency = connect_latency
+        # {имя пакета: [статус, ...]} - ответы, которые вернутся перед нормальным
+        self.failures = {name: list(statuses) for name, statuses in (failures or {}).items()}
+        self.retry_after = retry_after
+        self.requests = 0
+        self.connections = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Заголовки и тело уходят отдельными записями; без TCP_NODELAY на
+                # keep-alive соединении ответ ждал бы отложенного ACK клиента
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with stub._lock:
+                    stub.connections += 1
+                if stub.connect_latency:
+                    time.sleep(stub.connect_latency)
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                name = unquote(self.path.lstrip('/'))
+
+                with stub._lock:
+                    pending = stub.failures.get(name)
+                    status = pending.pop(0) if pending else None
+                if status is not None:
+                    headers = {"Retry-After": str(stub.retry_after)} if stub.retry_after is not None else {}
+                    self._reply(status, {"error": "Injected failure"}, headers)
+                    return
+                document = stub.registry.get(name)
+                if document is None:
+                    self._reply(404, {"error": "Not found"})
+                    return
+
+                if 'application/vnd.npm.install-v1+json' in self.headers.get('Accept', ''):
+                    document = abbreviate(document)
+
+                body = json.dumps(document).encode('utf-8')
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                headers = {"ETag": etag}
+                if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body)
+                    headers["Content-Encoding"] = "gzip"
+
+                with stub._lock:
+                    stub.bytes_sent += len(body)
+                self._reply(200, body, headers)
+
+            def _reply(self, status, body, headers=None):
+                if isinstance(body, dict):
+                    body = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for header, value in (headers or {}).items():
+                    self.send_header(header, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = 128
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -1,11 +1,14 @@
 import argparse
-from config import Config
+from config import DEFAULT_SERVE_ADDRESS, DEFAULT_SERVE_MAX_NODES, DEFAULT_SERVE_MAX_PACKAGES, Config
 from errors import ConfigError
+from subgraph_memo import DEFAULT_MEMO_NODES
 
 
 class CommandLineInterface:
     def __init__(self):
         self.parser = self._setup_parser()
+        # Разобранные параметры доступны и при ошибке проверки (итог --json)
+        self.config = None
 
     def _setup_parser(self):
         parser = argparse.ArgumentParser(
@@ -24,20 +27,160 @@ class CommandLineInterface:
   # Обратные зависимости
   python main.py --package chalk --repo-url https://registry.npmjs.org --reverse-deps --root-package express --output reverse.txt
 
+  # Обратные зависимости сразу для нескольких пакетов (граф строится один раз)
+  python main.py --repo-url https://registry.npmjs.org --reverse-deps chalk,debug,ms --root-package express --output reverse.txt
+
   # С фильтрацией
   python main.py --package webpack --repo-url https://registry.npmjs.org --filter "loader" --output filtered.puml
+
+  # Параллельная загрузка
+  python main.py --package webpack --repo-url https://registry.npmjs.org --output webpack.svg --jobs 16
+
+  # Граф установленных пакетов по lock-файлу
+  python main.py --lockfile package-lock.json --output installed.svg --max-depth 10
+
+  # Выгрузка графа для других инструментов (формат по расширению)
+  python main.py --package react --repo-url https://registry.npmjs.org --output react.graphml --max-depth 5
+
+  # Несколько форматов за один проход: react.svg, react.puml, react.jsonl
+  python main.py --package react --repo-url https://registry.npmjs.org --output react.svg --formats svg,puml,json
+
+  # Пакетный режим: все зависимости package.json за один запуск
+  python main.py --batch package.json --repo-url https://registry.npmjs.org --output deps/service.svg --jobs 16
+
+  # Что изменится в транзитивных зависимостях при переходе express 4.18.2 -> 4.19.2
+  python main.py --package express --version 4.18.2 --diff-version 4.19.2 --repo-url https://registry.npmjs.org \\
+      --output express-diff.svg --formats svg,puml,json --max-depth 10 --jobs 16
+
+  # Ночное обновление: сохранить снимок, затем загружать только изменившееся
+  python main.py --package webpack --repo-url https://registry.npmjs.org --output webpack.svg --snapshot webpack.json
+  python main.py --repo-url https://registry.npmjs.org --output webpack.svg --since webpack.json
+
+  # Без devDependencies транзитивных пакетов и без @types, eslint-пакеты не раскрывать
+  python main.py --package next --repo-url https://registry.npmjs.org --output next.svg --max-depth 6 \\
+      --dependency-types prod,peer --root-dependency-types prod,dev --exclude-scope @types --depth-override 'eslint*=0'
+
+  # Долгий обход с журналом: после сбоя или Ctrl-C продолжить с места остановки
+  python main.py --package next --repo-url https://registry.npmjs.org --output next.svg --max-depth 6 --checkpoint
+  python main.py --package next --repo-url https://registry.npmjs.org --output next.svg --max-depth 6 --resume
+
+  # Профиль прогона: где уходит время (соединения, ожидание сервера, разбор, раскладка)
+  python main.py --package webpack --repo-url https://registry.npmjs.org --output webpack.svg --jobs 16 --profile
+
+  # Снимок всего реестра в тестовом режиме: файл разбирается в 16 процессах
+  python main.py --package react --repo-url registry-snapshot.json --test-mode --output react.jsonl --max-depth 20 --workers 16
+
+  # Обход всей экосистемы в 1 ГБ памяти: граф и индексы уходят на диск
+  python main.py --package react --repo-url registry-snapshot.json --test-mode --output react.edges --max-depth 50 \\
+      --formats edges,jsonl --memory-limit 1G --spill-dir /var/tmp
+
+  # Локальный сервер: графы и кэш остаются в памяти между запросами
+  python main.py --repo-url https://registry.npmjs.org --serve 127.0.0.1:8765 --jobs 16
+  curl 'http://127.0.0.1:8765/stats?package=react&depth=5'
+
+  # Из скриптов сборки: без вывода хода работы, итог одной JSON-строкой
+  python main.py --lockfile package-lock.json --output installed.jsonl --json
+
+  # Повторный запуск только из кэша
+  python main.py --package webpack --repo-url https://registry.npmjs.org --output webpack.svg --offline --cache-stats
             """
         )
 
-        parser.add_argument('--package', required=True, help='Имя пакета')
-        parser.add_argument('--repo-url', required=True, help='URL репозитория или путь к файлу')
+        parser.add_argument('--package', help='Имя пакета')
+        parser.add_argument('--repo-url', help='URL репозитория или путь к файлу')
+        parser.add_argument('--lockfile',
+                            help='Построить граф по package-lock.json / npm-shrinkwrap.json / yarn.lock / '
+                                 'pnpm-lock.yaml без обращения к реестру')
+        parser.add_argument('--batch', metavar='МАНИФЕСТ',
+                            help='Пакетный режим: корневые пакеты из манифеста (package.json, JSON или '
+                                 'текстовый список), общий слой загрузки и файлы по каждому корню')
+        parser.add_argument('--serve', nargs='?', const=DEFAULT_SERVE_ADDRESS, metavar='[ХОСТ:]ПОРТ',
+                            help='Локальный HTTP/JSON сервер с графами в памяти '
+                                 f'(по умолчанию {DEFAULT_SERVE_ADDRESS})')
+        parser.add_argument('--serve-max-nodes', type=int, default=DEFAULT_SERVE_MAX_NODES,
+                            help='Сколько узлов построенных графов сервер держит в памяти; '
+                                 'граф и поддеревья старше --cache-ttl строятся заново')
+        parser.add_argument('--serve-max-packages', type=int, default=DEFAULT_SERVE_MAX_PACKAGES,
+                            help='Сколько пакетов (метаданные и разрешения версий) сервер держит в памяти; '
+                                 'запись старше --cache-ttl загружается заново')
+        parser.add_argument('--memo-nodes', type=int, default=DEFAULT_MEMO_NODES,
+                            help='Память поддеревьев для --batch и --serve, узлов (0 - отключить)')
+        parser.add_argument('--diff-version', metavar='ВЕРСИЯ',
+                            help='Сравнить граф --version (по умолчанию последней) с графом этой версии '
+                                 'пакета: добавленные, удаленные и обновленные пакеты и ребра, вывод с '
+                                 'разметкой и <output>.diff.json')
+        parser.add_argument('--snapshot', help='Сохранить снимок графа (JSON) для инкрементального обновления')
+        parser.add_argument('--since',
+                            help='Обновить граф по снимку: загружаются только изменившиеся пакеты, '
+                                 'снимок перезаписывается (или пишется в --snapshot)')
+        parser.add_argument('--checkpoint', nargs='?', const='', metavar='ЖУРНАЛ',
+                            help='Записывать журнал обхода для --resume (по умолчанию <output>.journal.jsonl)')
+        parser.add_argument('--resume', nargs='?', const='', metavar='ЖУРНАЛ',
+                            help='Продолжить прерванный обход по журналу: сохраненные пакеты не загружаются, '
+                                 'временные ошибки повторяются')
         parser.add_argument('--test-mode', action='store_true', help='Тестовый режим')
         parser.add_argument('--version', help='Версия пакета')
-        parser.add_argument('--output', default='dependencies.svg', help='Выходной файл')
+        parser.add_argument('--output', default='dependencies.svg',
+                            help='Выходной файл: .svg/.puml/.txt - визуализация, .jsonl/.graphml/.dot/.edges - '
+                                 'выгрузка графа для других инструментов')
+        parser.add_argument('--formats', metavar='ФОРМАТЫ',
+                            help='Форматы через запятую: svg, puml, txt, json(l), graphml, dot, edges; '
+                                 'файлы называются по --output с расширением формата (по умолчанию - '
+                                 'один формат по расширению --output)')
+        parser.add_argument('--layout', choices=('layered', 'stress'), default='layered',
+                            help='Раскладка SVG: layered - по слоям зависимостей, stress - без слоев, по '
+                                 'расстояниям в графе (с NumPy считается массивами)')
+        parser.add_argument('--render-workers', type=int, default=1,
+                            help='Сколько форматов --formats записывать одновременно (потоки; по умолчанию '
+                                 'форматы пишутся по очереди)')
         parser.add_argument('--filter', help='Фильтр пакетов')
-        parser.add_argument('--reverse-deps', action='store_true', help='Обратные зависимости')
+        parser.add_argument('--include', action='append', default=[], metavar='ШАБЛОН',
+                            help='Обходить только пакеты по шаблону (glob или re:выражение), можно несколько раз')
+        parser.add_argument('--exclude', action='append', default=[], metavar='ШАБЛОН',
+                            help='Не обходить пакеты по шаблону (glob или re:выражение), можно несколько раз')
+        parser.add_argument('--exclude-scope', action='append', default=[], metavar='SCOPE',
+                            help='Не обходить пакеты из scope (например, @types)')
+        parser.add_argument('--dependency-types', metavar='ТИПЫ',
+                            help='Типы зависимостей транзитивных пакетов через запятую: prod, dev, peer '
+                                 '(по умолчанию все)')
+        parser.add_argument('--root-dependency-types', metavar='ТИПЫ',
+                            help='Типы зависимостей корневого пакета (по умолчанию как --dependency-types)')
+        parser.add_argument('--depth-override', action='append', default=[], metavar='ШАБЛОН=N',
+                            help='Раскрывать не больше N уровней зависимостей под пакетами по шаблону')
+        parser.add_argument('--prune', metavar='ФАЙЛ', help='Правила отсечения обхода из JSON-файла')
+        parser.add_argument('--reverse-deps', nargs='?', const='', metavar='ПАКЕТЫ',
+                            help='Обратные зависимости: для --package или для списка пакетов через запятую')
+        parser.add_argument('--max-paths', type=int, default=10,
+                            help='Сколько путей от корня показывать для каждого пакета')
         parser.add_argument('--root-package', help='Корневой пакет для обратных зависимостей')
         parser.add_argument('--max-depth', type=int, default=3, help='Максимальная глубина обхода')
+        parser.add_argument('--jobs', type=int, default=1, help='Число параллельных загрузок пакетов')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Тестовый режим: разбирать файл репозитория в N процессах (для снимков '
+                                 'на миллионы пакетов)')
+        parser.add_argument('--memory-limit', metavar='РАЗМЕР',
+                            help='Тестовый режим: обход с ограниченной памятью (512M, 2G; число - мегабайты). '
+                                 'Граф пишется в файлы на диске, индексы сверх лимита - в SQLite, выгрузки '
+                                 'jsonl/graphml/dot/edges и статистика читают их потоком')
+        parser.add_argument('--spill-dir', metavar='КАТАЛОГ',
+                            help='Где создать хранилище обхода для --memory-limit (по умолчанию временный каталог)')
+        parser.add_argument('--retries', type=int, default=3,
+                            help='Повторов запроса к реестру при 429/5xx и сетевых ошибках')
+        parser.add_argument('--cache-dir', help='Каталог кэша метаданных (по умолчанию ~/.cache/dependency-visualizer)')
+        parser.add_argument('--cache-ttl', type=int, default=3600,
+                            help='Сколько секунд запись кэша считается свежей без перепроверки')
+        parser.add_argument('--no-cache', action='store_true', help='Не использовать кэш метаданных')
+        parser.add_argument('--offline', action='store_true', help='Работать только из кэша, без сети')
+        parser.add_argument('--cache-stats', action='store_true', help='Показать статистику кэша')
+        parser.add_argument('--transfer-stats', action='store_true',
+                            help='Показать объем загруженных данных и пиковую память')
+        parser.add_argument('-q', '--quiet', action='store_true',
+                            help='Не выводить ход работы; ошибки по-прежнему идут в stderr')
+        parser.add_argument('--json', action='store_true',
+                            help='Итог прогона одной JSON-строкой в stdout для скриптов (включает --quiet)')
+        parser.add_argument('--profile', nargs='?', const='', metavar='TRACE',
+                            help='Профилировать прогон: сводка по этапам (p50/p95/p99), самые медленные пакеты, '
+                                 'критический путь и трасса Chrome (по умолчанию <output>.trace.json)')
 
         return parser
 
@@ -45,16 +188,56 @@ class CommandLineInterface:
         try:
             args = self.parser.parse_args()
 
-            config = Config()
+            config = self.config = Config()
             config.package_name = args.package
             config.repository_url = args.repo_url
             config.test_repo_mode = args.test_mode
             config.package_version = args.version
             config.output_filename = args.output
+            config.formats = args.formats
+            config.layout = args.layout
+            config.render_workers = args.render_workers
             config.filter_substring = args.filter
-            config.reverse_dependencies = args.reverse_deps
+            config.reverse_dependencies = args.reverse_deps is not None
+            if args.reverse_deps:
+                config.reverse_targets = [name.strip() for name in args.reverse_deps.split(',') if name.strip()]
+            config.max_paths = args.max_paths
             config.root_package = args.root_package
             config.max_depth = args.max_depth
+            config.jobs = args.jobs
+            config.workers = args.workers
+            config.memory_limit = args.memory_limit
+            config.spill_dir = args.spill_dir
+            config.serve_address = args.serve
+            config.serve_max_nodes = args.serve_max_nodes
+            config.serve_max_packages = args.serve_max_packages
+            config.memo_nodes = args.memo_nodes
+            config.retries = args.retries
+            config.cache_dir = args.cache_dir
+            config.cache_ttl = args.cache_ttl
+            config.use_cache = not args.no_cache
+            config.offline = args.offline
+            config.cache_stats = args.cache_stats
+            config.transfer_stats = args.transfer_stats
+            config.lockfile = args.lockfile
+            config.since = args.since
+            config.batch_manifest = args.batch
+            config.diff_version = args.diff_version
+            config.snapshot_path = args.snapshot or args.since
+            config.profile = args.profile is not None
+            config.prune_file = args.prune
+            config.include = args.include
+            config.exclude = args.exclude
+            config.exclude_scopes = args.exclude_scope
+            config.dependency_types = args.dependency_types
+            config.root_dependency_types = args.root_dependency_types
+            config.depth_overrides = args.depth_override
+            config.resume = args.resume is not None
+            config.checkpoint = config.resume or args.checkpoint is not None
+            config.checkpoint_path = args.resume or args.checkpoint or None
+            config.profile_trace = args.profile or None
+            config.json_output = args.json
+            config.quiet = args.quiet or args.json
 
             config.validate()
             return config
@@ -0,0 +1,289 @@
+import sys
+from array import array
+from graph_analytics import GraphAnalysis
+
+
+def format_package_key(package_name, version=None):
+    return f"{package_name}@{version}" if version else package_name
+
+
+def split_package_key(package_key):
+    # "name@1.2.3" -> ("name", "1.2.3"); у пакетов со scope ("@babel/core@7.0.0") первый '@' - часть имени
+    at = package_key.rfind('@')
+    if at <= 0:
+        return package_key, None
+    return package_key[:at], package_key[at + 1:]
+
+
+def package_display_name(package_key):
+    return split_package_key(package_key)[0]
+
+
+# Компактное представление графа зависимостей: узлы - целые числа, ключи пакетов
+# интернированы, смежность хранится в массивах CSR (offsets/targets), у каждого
+# ребра - индекс строки диапазона версий. Ошибки загрузки лежат в отдельной
+# таблице, а не псевдо-ребром "ERROR". Узел 0 - корень обхода.
+class CompactGraph:
+    __slots__ = ('keys', 'offsets', 'targets', 'edge_specs', 'specs', 'errors', 'expanded',
+                 '_names', '_index', '_reverse', '_analysis')
+
+    def __init__(self, keys, offsets, targets, edge_specs, specs, errors, expanded):
+        self.keys = keys
+        self.offsets = offsets
+        self.targets = targets
+        self.edge_specs = edge_specs
+        self.specs = specs
+        self.errors = errors
+        self.expanded = expanded
+        self._names = None
+        self._index = None
+        self._reverse = None
+        self._analysis = None
+
+    @property
+    def names(self):
+        # Имена пакетов без версий; считаются один раз при первом обращении
+        if self._names is None:
+            self._names = [sys.intern(package_display_name(key)) for key in self.keys]
+        return self._names
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {key: node for node, key in enumerate(self.keys)}
+        return self._index
+
+    @classmethod
+    def from_dict(cls, graph, resolutions=None):
+        # graph: {ключ узла: {имя зависимости: диапазон}} или {ключ: {"ERROR": сообщение}}
+        # (прежний словарный формат, как у to_dict). resolutions: {(имя, диапазон):
+        # ключ узла} - как обходчик разрешил требования; без него цель ребра ищется
+        # по точному ключу, затем по имени пакета.
+        builder = CompactGraphBuilder()
+        for key, dependencies in graph.items():
+            if "ERROR" in dependencies:
+                builder.add_error(key, dependencies["ERROR"])
+            else:
+                builder.add(key, dependencies)
+        return builder.build(resolutions)
+
+    def to_dict(self):
+        graph = {}
+        names = self.names
+        for node, key in enumerate(self.keys):
+            if node in self.errors:
+                graph[key] = {"ERROR": self.errors[node]}
+            elif self.expanded[node]:
+                start, end = self.offsets[node], self.offsets[node + 1]
+                graph[key] = {
+                    names[target]: self.specs[spec]
+                    for target, spec in zip(self.targets[start:end], self.edge_specs[start:end])
+                }
+        return graph
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def node_id(self, key):
+        return self.index.get(key)
+
+    def successors(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def edges(self, node):
+        start, end = self.offsets[node], self.offsets[node + 1]
+        specs = self.specs
+        for position in range(start, end):
+            yield self.targets[position], specs[self.edge_specs[position]]
+
+    def analysis(self):
+        # Компоненты, глубины и степени узлов считаются один раз на граф
+        if self._analysis is None:
+            self._analysis = GraphAnalysis(self.offsets, self.targets)
+        return self._analysis
+
+    def predecessors(self, node):
+        offsets, sources = self.reverse_adjacency()
+        return sources[offsets[node]:offsets[node + 1]]
+
+    def fetched_nodes(self):
+        # Узлы, для которых загружались данные (с зависимостями или с ошибкой)
+        return [node for node in range(len(self.keys)) if self.expanded[node] or node in self.errors]
+
+    def reverse_adjacency(self):
+        if self._reverse is None:
+            count = len(self.keys)
+            offsets = array('I', [0]) * (count + 1)
+            for target in self.targets:
+                offsets[target + 1] += 1
+            for node in range(count):
+                offsets[node + 1] += offsets[node]
+
+            sources = array('I', [0]) * len(self.targets)
+            fill = array('I', offsets)
+            for source in range(count):
+                for position in range(self.offsets[source], self.offsets[source + 1]):
+                    target = self.targets[position]
+                    sources[fill[target]] = source
+                    fill[target] += 1
+
+            self._reverse = (offsets, sources)
+        return self._reverse
+
+
+# Построение CompactGraph по ходу обхода: узлы добавляются в порядке загрузки,
+# зависимости хранятся массивами номеров имени и диапазона, а не словарем на
+# узел, ошибки загрузки - в отдельной таблице. Цели ребер разрешаются в build(),
+# когда известны все разрешения требований; нумерация узлов - загруженные в
+# порядке добавления, затем листья в порядке первого ребра.
+class CompactGraphBuilder:
+    def __init__(self):
+        self.keys = []
+        self.index = {}
+        self.errors = {}
+        self._offsets = array('I', [0])
+        self._dependency_names = array('I')
+        self._dependency_specs = array('I')
+        self._names = []
+        self._name_index = {}
+        self._specs = []
+        self._spec_index = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def add(self, key, dependencies):
+        self._append_key(key)
+        names, specs = self._dependency_names, self._dependency_specs
+        for name, spec in dependencies.items():
+            names.append(self._intern(self._names, self._name_index, name))
+            specs.append(self._intern(self._specs, self._spec_index, spec))
+        self._offsets.append(len(names))
+
+    def add_error(self, key, message):
+        self.errors[self._append_key(key)] = message
+        self._offsets.append(len(self._dependency_names))
+
+    def merge(self, other):
+        # Узлы другого построителя, которых здесь еще нет; возвращает их число
+        added = 0
+        for node, key in enumerate(other.keys):
+            if key in self.index:
+                continue
+            added += 1
+            if node in other.errors:
+                self.add_error(key, other.errors[node])
+            else:
+                self.add(key, other._node_dependencies(node))
+        return added
+
+    def dependencies(self, key):
+        # {имя: диапазон} загруженного узла; у узла с ошибкой - пустой словарь
+        return self._node_dependencies(self.index[key])
+
+    def error(self, key):
+        return self.errors.get(self.index[key])
+
+    def items(self):
+        # (ключ, зависимости, ошибка) в порядке добавления
+        for node, key in enumerate(self.keys):
+            yield key, self._node_dependencies(node), self.errors.get(node)
+
+    def to_dict(self):
+        # Прежний словарный формат (build_dependency_graph)
+        return {key: {"ERROR": error} if error is not None else dependencies
+                for key, dependencies, error in self.items()}
+
+    def build(self, resolutions=None):
+        keys = list(self.keys)
+        index = self.index
+        leaves = {}
+
+        def intern_key(key):
+            node = index.get(key)
+            if node is None:
+                node = leaves.get(key)
+            if node is None:
+                # Зависимость за пределами глубины обхода - лист без данных
+                node = leaves[key] = len(keys)
+                keys.append(sys.intern(key))
+            return node
+
+        def lookup(key):
+            node = index.get(key)
+            return node if node is not None else leaves.get(key)
+
+        by_name = {}
+        for node, key in enumerate(self.keys):
+            by_name.setdefault(package_display_name(key), node)
+
+        def resolve(dep_name, spec):
+            if resolutions:
+                key = resolutions.get((dep_name, spec))
+                if key is not None:
+                    return intern_key(key)
+
+            node = lookup(format_package_key(dep_name, spec))
+            if node is None:
+                node = lookup(dep_name)
+            if node is None:
+                node = by_name.get(dep_name)
+            if node is None:
+                node = intern_key(dep_name)
+            return node
+
+        # Диапазоны в графе - строки; одинаковые после str() сливаются
+        specs = []
+        spec_index = {}
+        spec_ids = array('I', (self._intern(specs, spec_index, spec if isinstance(spec, str) else str(spec))
+                               for spec in self._specs))
+
+        names, raw_specs = self._names, self._specs
+        dependency_names, dependency_specs = self._dependency_names, self._dependency_specs
+        targets = array('I')
+        edge_specs = array('I')
+        for position in range(len(dependency_names)):
+            spec = dependency_specs[position]
+            targets.append(resolve(names[dependency_names[position]], raw_specs[spec]))
+            edge_specs.append(spec_ids[spec])
+
+        fetched = len(self.keys)
+        leaf_count = len(keys) - fetched
+        offsets = array('I', self._offsets)
+        offsets.extend([len(targets)] * leaf_count)
+        expanded = bytearray(b'\x01') * fetched
+        for node in self.errors:
+            expanded[node] = 0
+        expanded.extend(bytes(leaf_count))
+
+        return CompactGraph(keys, offsets, targets, edge_specs, specs, dict(self.errors), expanded)
+
+    def _append_key(self, key):
+        node = self.index[key] = len(self.keys)
+        self.keys.append(sys.intern(key))
+        return node
+
+    def _node_dependencies(self, node):
+        start, end = self._offsets[node], self._offsets[node + 1]
+        names, specs = self._names, self._specs
+        return {names[name]: specs[spec]
+                for name, spec in zip(self._dependency_names[start:end], self._dependency_specs[start:end])}
+
+    @staticmethod
+    def _intern(values, index, value):
+        position = index.get(value)
+        if position is None:
+            position = index[value] = len(values)
+            values.append(value)
+        return position
+
+
+def as_compact_graph(graph):
+    return graph if isinstance(graph, CompactGraph) else CompactGraph.from_dict(graph)
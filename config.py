@@ -1,7 +1,18 @@
 import os
-from urllib.parse import urlparse
 from errors import ValidationError
 
+DEFAULT_SERVE_ADDRESS = '127.0.0.1:8765'
+DEFAULT_SERVE_MAX_NODES = 1000000
+DEFAULT_SERVE_MAX_PACKAGES = 50000
+
+
+def parse_address(address):
+    # "8765", ":8765" или "0.0.0.0:8765" -> (хост, порт)
+    host, _, port = address.rpartition(':')
+    if not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValidationError(f"Некорректный адрес сервера: {address} (ожидается [ХОСТ:]ПОРТ)")
+    return host or '127.0.0.1', int(port)
+
 
 class Config:
     def __init__(self):
@@ -10,43 +21,262 @@ class Config:
         self.test_repo_mode = False
         self.package_version = None
         self.output_filename = "dependencies.svg"
+        self.export_format = None
+        self.formats = None
+        self.output_formats = []
+        self.layout = 'layered'
+        self.render_workers = 1
         self.filter_substring = None
         self.reverse_dependencies = False
+        self.reverse_targets = []
+        self.max_paths = 10
         self.root_package = None
         self.max_depth = 3
+        self.jobs = 1
+        self.workers = 1
+        self.serve_address = None
+        self.serve_max_nodes = DEFAULT_SERVE_MAX_NODES
+        self.serve_max_packages = DEFAULT_SERVE_MAX_PACKAGES
+        self.memo_nodes = 200000
+        self.retries = 3
+        self.use_cache = True
+        self.cache_dir = None
+        self.cache_ttl = 3600
+        self.offline = False
+        self.cache_stats = False
+        self.transfer_stats = False
+        self.lockfile = None
+        self.since = None
+        self.batch_manifest = None
+        self.diff_version = None
+        self.snapshot_path = None
+        self.memory_limit = None
+        self.memory_limit_bytes = None
+        self.spill_dir = None
+        self.profile = False
+        self.profile_trace = None
+        self.checkpoint = False
+        self.checkpoint_path = None
+        self.resume = False
+        self.prune_file = None
+        self.include = []
+        self.exclude = []
+        self.exclude_scopes = []
+        self.dependency_types = None
+        self.root_dependency_types = None
+        self.depth_overrides = []
+        self.pruning = None
+        self.quiet = False
+        self.json_output = False
+        # Сообщения разбора параметров: печатаются в начале прогона, с учетом --quiet
+        self.notices = []
 
     def validate(self):
-        errors = []
+        # Модули форматов вывода не нужны для --help и ошибок разбора аргументов
+        from graph_exporters import EXPORT_FORMATS
+        from render_pipeline import LEGACY_FORMATS, VISUAL_EXTENSIONS, parse_formats
 
-        if not self.package_name:
-            errors.append("Укажите имя пакета (--package)")
+        errors = []
 
-        if not self.repository_url:
-            errors.append("Укажите репозиторий (--repo-url)")
-        elif self.test_repo_mode:
-            if not os.path.exists(self.repository_url):
-                errors.append(f"Файл не найден: {self.repository_url}")
+        if self.lockfile:
+            # Имя пакета и репозиторий берутся из lock-файла
+            if not os.path.exists(self.lockfile):
+                errors.append(f"Lock-файл не найден: {self.lockfile}")
         else:
-            parsed = urlparse(self.repository_url)
-            if not (parsed.scheme in ['http', 'https'] or os.path.exists(self.repository_url)):
-                errors.append(f"Некорректный URL: {self.repository_url}")
+            if not (self.package_name or self.reverse_targets or self.since or self.batch_manifest
+                    or self.serve_address):
+                errors.append("Укажите имя пакета (--package)")
+
+            if not self.repository_url:
+                errors.append("Укажите репозиторий (--repo-url)")
+            elif self.test_repo_mode:
+                if not os.path.exists(self.repository_url):
+                    errors.append(f"Файл не найден: {self.repository_url}")
+            else:
+                from urllib.parse import urlparse
+                parsed = urlparse(self.repository_url)
+                if not (parsed.scheme in ['http', 'https'] or os.path.exists(self.repository_url)):
+                    errors.append(f"Некорректный URL: {self.repository_url}")
 
         if self.output_filename:
-            allowed = ('.svg', '.puml', '.txt', '.png', '.jpg', '.jpeg')
+            # Машиночитаемые форматы (JSON Lines, GraphML, DOT, двоичный список ребер)
+            # выбираются по расширению выходного файла
+            extension = os.path.splitext(self.output_filename)[1].lower()
+            self.export_format = EXPORT_FORMATS.get(extension)
+
+            allowed = ('.svg', '.puml', '.txt', '.png', '.jpg', '.jpeg') + tuple(EXPORT_FORMATS)
             has_allowed_extension = any(self.output_filename.lower().endswith(ext) for ext in allowed)
 
             if not has_allowed_extension:
                 if '.' not in self.output_filename:
                     self.output_filename += '.svg'
-                    print(f" Расширение не указано, используется: {self.output_filename}")
+                    self.notices.append(f" Расширение не указано, используется: {self.output_filename}")
                 else:
                     errors.append(f"Разрешены расширения: {', '.join(allowed)}")
 
-        if self.reverse_dependencies and not self.root_package:
+            # Без --formats пишется один формат по расширению --output; для .png/.jpg,
+            # у которых нет своего писателя, - прежний набор PlantUML, текст и SVG
+            extension = os.path.splitext(self.output_filename)[1].lower()
+            default = self.export_format or VISUAL_EXTENSIONS.get(extension)
+            self.output_formats = [default] if default else list(LEGACY_FORMATS)
+
+        if self.formats:
+            try:
+                self.output_formats = parse_formats(self.formats)
+            except ValueError as e:
+                errors.append(f"--formats: {e}")
+
+        if self.batch_manifest:
+            if not os.path.exists(self.batch_manifest):
+                errors.append(f"Манифест не найден: {self.batch_manifest}")
+            if self.reverse_dependencies or self.since:
+                errors.append("--batch нельзя совмещать с --reverse-deps и --since")
+
+        if self.since:
+            if not os.path.exists(self.since):
+                errors.append(f"Снимок не найден: {self.since}")
+            if self.lockfile or self.reverse_dependencies:
+                errors.append("--since работает только при построении графа из реестра")
+
+        if self.diff_version:
+            # Обе версии корня берутся из реестра: в тестовом репозитории и в
+            # lock-файле у пакета одна версия
+            if not self.package_name:
+                errors.append("--diff-version сравнивает версии пакета --package")
+            if self.lockfile or self.test_repo_mode:
+                errors.append("--diff-version работает только с реестром (без --test-mode и --lockfile)")
+            if self.batch_manifest or self.reverse_dependencies or self.since or self.checkpoint:
+                errors.append("--diff-version нельзя совмещать с --batch, --reverse-deps, --since и --checkpoint")
+
+        if self.checkpoint and (self.batch_manifest or self.lockfile or self.since):
+            errors.append("--checkpoint и --resume нельзя совмещать с --batch, --lockfile и --since")
+
+        if self.resume and self.checkpoint_path and not os.path.exists(self.checkpoint_path):
+            errors.append(f"Журнал обхода не найден: {self.checkpoint_path}")
+
+        if self.serve_address:
+            if (self.lockfile or self.batch_manifest or self.reverse_dependencies or self.since
+                    or self.checkpoint or self.workers > 1 or self.diff_version):
+                errors.append("--serve нельзя совмещать с --lockfile, --batch, --reverse-deps, --since, "
+                              "--checkpoint, --workers и --diff-version")
+            try:
+                parse_address(self.serve_address)
+            except ValidationError as e:
+                errors.append(str(e))
+
+        if self.serve_max_nodes < 1:
+            errors.append("Ограничение памяти сервера (--serve-max-nodes) должно быть положительным")
+
+        if self.serve_max_packages < 1:
+            errors.append("Ограничение памяти пакетов сервера (--serve-max-packages) должно быть положительным")
+
+        if self.memo_nodes < 0:
+            errors.append("Память поддеревьев (--memo-nodes) не может быть отрицательной")
+
+        if self.workers > 1:
+            if not self.test_repo_mode or self.lockfile:
+                errors.append("--workers работает только в тестовом режиме (--test-mode)")
+            if (self.batch_manifest or self.reverse_dependencies or self.since or self.checkpoint
+                    or self.filter_substring or self.prune_file or self.include or self.exclude
+                    or self.exclude_scopes or self.dependency_types or self.root_dependency_types
+                    or self.depth_overrides):
+                errors.append("--workers нельзя совмещать с --batch, --reverse-deps, --since, --checkpoint, "
+                              "--filter и правилами отсечения")
+
+        if self.reverse_dependencies and not self.root_package and not self.lockfile:
             errors.append("Для обратных зависимостей укажите --root-package")
 
+        if self.reverse_dependencies and not self.reverse_targets:
+            if self.package_name:
+                self.reverse_targets = [self.package_name]
+            else:
+                errors.append("Укажите пакеты для обратных зависимостей (--reverse-deps a,b,c или --package)")
+
+        self._build_pruning(errors)
+
+        if self.memory_limit:
+            self._validate_memory_limit(errors)
+        elif self.spill_dir:
+            errors.append("--spill-dir задается вместе с --memory-limit")
+
+        if self.max_paths < 0:
+            errors.append("Число путей (--max-paths) не может быть отрицательным")
+
         if hasattr(self, 'max_depth') and self.max_depth <= 0:
             errors.append("Глубина обхода должна быть положительным числом")
 
+        if self.jobs < 1:
+            errors.append("Число потоков (--jobs) должно быть положительным")
+
+        if self.workers < 1:
+            errors.append("Число процессов (--workers) должно быть положительным")
+
+        if self.render_workers < 1:
+            errors.append("Число потоков записи (--render-workers) должно быть положительным")
+
+        if self.retries < 0:
+            errors.append("Число повторов (--retries) не может быть отрицательным")
+
+        if self.offline and not self.use_cache and not self.test_repo_mode:
+            errors.append("Режим --offline требует кэша (уберите --no-cache)")
+
+        if self.cache_ttl < 0:
+            errors.append("Время жизни кэша (--cache-ttl) не может быть отрицательным")
+
         if errors:
             raise ValidationError("\n".join(errors))
+
+    def _validate_memory_limit(self, errors):
+        # Обход с ограниченной памятью пишет граф в хранилище на диске и выгружает
+        # его потоком: только тестовый режим, один корень и потоковые форматы
+        from graph_exporters import STORE_EXPORTERS
+        from graph_store import parse_size
+        try:
+            self.memory_limit_bytes = parse_size(self.memory_limit)
+        except ValueError:
+            errors.append(f"Некорректный размер --memory-limit: {self.memory_limit} (например 512M или 2G)")
+
+        if not self.test_repo_mode or self.lockfile:
+            errors.append("--memory-limit работает только в тестовом режиме (--test-mode)")
+        if (self.batch_manifest or self.serve_address or self.reverse_dependencies or self.since
+                or self.snapshot_path or self.checkpoint or self.workers > 1 or self.diff_version):
+            errors.append("--memory-limit нельзя совмещать с --batch, --serve, --reverse-deps, --since, "
+                          "--snapshot, --checkpoint, --workers и --diff-version")
+        if self.pruning is not None and self.pruning.depth_overrides:
+            errors.append("--memory-limit нельзя совмещать с переопределениями глубины (--depth-override)")
+        unsupported = [name for name in self.output_formats if name not in STORE_EXPORTERS]
+        if unsupported:
+            errors.append(f"С --memory-limit доступны только форматы {', '.join(STORE_EXPORTERS)} "
+                          f"(укажите --formats или --output с их расширением)")
+        if self.spill_dir and not os.path.isdir(self.spill_dir):
+            errors.append(f"Каталог для хранилища обхода не найден: {self.spill_dir}")
+
+    def _build_pruning(self, errors):
+        # Правила отсечения собираются из файла --prune и параметров командной строки
+        depth_overrides = {}
+        for item in self.depth_overrides:
+            pattern, _, depth = item.rpartition('=')
+            if not pattern or not depth.isdigit():
+                errors.append(f"Переопределение глубины задается как ШАБЛОН=ЧИСЛО: {item}")
+                continue
+            depth_overrides[pattern] = int(depth)
+
+        options = {
+            "include": self.include,
+            "exclude": self.exclude,
+            "exclude_scopes": self.exclude_scopes,
+            "dependency_types": self.dependency_types,
+            "root_dependency_types": self.root_dependency_types,
+            "depth_overrides": depth_overrides
+        }
+        if not self.prune_file and not any(options.values()):
+            return
+
+        from pruning_spec import PruningSpec
+        try:
+            if self.prune_file:
+                self.pruning = PruningSpec.from_file(self.prune_file, **options)
+            else:
+                self.pruning = PruningSpec(**options)
+        except ValidationError as e:
+            errors.append(str(e))
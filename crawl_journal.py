@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+from errors import NetworkError, PackageDataError, PackageNotFoundError, ValidationError
+
+JOURNAL_FORMAT = 1
+
+# Ошибки, которые при повторе могут пройти (сеть, 429/5xx после всех повторов пула)
+TRANSIENT_ERRORS = (NetworkError,)
+PERMANENT_ERRORS = {
+    'PackageNotFoundError': PackageNotFoundError,
+    'PackageDataError': PackageDataError
+}
+
+
+def is_transient(error):
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+# Журнал обхода (--checkpoint): JSON Lines только на дозапись. Первая строка -
+# параметры обхода, дальше результат каждого обработанного пакета и отметки
+# завершенных уровней. Обход детерминирован, поэтому фронтир, посещенные узлы и
+# частичный граф при --resume восстанавливаются повторным проходом по журналу без
+# сети; заново загружаются только пакеты без записи и временные ошибки.
+#
+# {"type": "start", "format": 1, "root", "version", "filter", "registry", "prune"}
+# {"type": "package", "package", "spec", "resolved", "dependencies"}
+# {"type": "error", "package", "spec", "resolved", "error", "kind", "transient"}
+# {"type": "level", "depth", "packages"}
+# {"type": "done", "packages"}
+class CrawlJournal:
+    def __init__(self, path, params, resume=False, flush_interval=2.0):
+        self.path = path
+        self.params = params
+        self.flush_interval = flush_interval
+
+        self.replayed = 0
+        self.recorded = 0
+        self.transient_failures = 0
+
+        self._results = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+        if resume and os.path.exists(path):
+            self._load()
+            mode = 'a'
+        else:
+            mode = 'w'
+
+        try:
+            self._file = open(path, mode, encoding='utf-8')
+        except OSError as e:
+            raise PackageDataError(f"Не удалось открыть журнал обхода {path}: {e}")
+
+        if mode == 'w':
+            self._write({"type": "start", "format": JOURNAL_FORMAT, **params})
+            self.checkpoint()
+
+    @property
+    def resumable(self):
+        # Сколько пакетов обхода журнал вернет без сети
+        return sum(1 for result in self._results.values() if result is not None)
+
+    def replay(self, requirement):
+        # Сохраненный результат пакета (resolved, dependencies, error) или None
+        result = self._results.get(requirement)
+        if result is not None:
+            with self._lock:
+                self.replayed += 1
+        return result
+
+    def record(self, requirement, resolved, dependencies, error):
+        package, spec = requirement
+        if error is None:
+            entry = {"type": "package", "package": package, "spec": spec, "resolved": resolved,
+                     "dependencies": dependencies}
+        else:
+            transient = is_transient(error)
+            entry = {"type": "error", "package": package, "spec": spec, "resolved": resolved,
+                     "error": str(error), "kind": type(error).__name__, "transient": transient}
+
+        with self._lock:
+            self.recorded += 1
+            if error is not None and entry["transient"]:
+                self.transient_failures += 1
+            self._write(entry)
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def level(self, depth, packages):
+        # Конец уровня обхода - контрольная точка: журнал сбрасывается на диск
+        with self._lock:
+            self._write({"type": "level", "depth": depth, "packages": packages})
+            self._flush()
+
+    def finish(self, packages):
+        with self._lock:
+            self._write({"type": "done", "packages": packages})
+            self._flush()
+
+    def checkpoint(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._flush()
+                self._file.close()
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')))
+        self._file.write('\n')
+
+    def _flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.read().split('\n')
+        except OSError as e:
+            raise PackageDataError(f"Ошибка чтения журнала обхода {self.path}: {e}")
+
+        header = None
+        for number, line in enumerate(lines):
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Последняя строка могла оборваться при аварийном завершении
+                if number >= len(lines) - 2:
+                    break
+                raise PackageDataError(f"Поврежден журнал обхода {self.path}, строка {number + 1}")
+
+            kind = entry.get("type")
+            if header is None:
+                if kind != "start" or entry.get("format") != JOURNAL_FORMAT:
+                    raise PackageDataError(f"Неподдерживаемый формат журнала обхода: {self.path}")
+                header = entry
+                self._check_params(header)
+            elif kind == "package":
+                self._results[(entry["package"], entry["spec"])] = (entry["resolved"], entry["dependencies"], None)
+            elif kind == "error":
+                requirement = (entry["package"], entry["spec"])
+                if entry.get("transient"):
+                    # Временная ошибка не воспроизводится: пакет загрузится заново
+                    self._results.pop(requirement, None)
+                else:
+                    error = PERMANENT_ERRORS.get(entry.get("kind"), PackageDataError)(entry["error"])
+                    self._results[requirement] = (entry["resolved"], None, error)
+
+        if header is None:
+            raise PackageDataError(f"Журнал обхода пуст: {self.path}")
+
+        # Оборванный хвост отрезается, чтобы новые записи шли с новой строки
+        with open(self.path, 'rb+') as f:
+            content = f.read()
+            end = content.rfind(b'\n') + 1
+            f.truncate(end)
+
+    def _check_params(self, header):
+        for field in ("root", "version", "filter", "registry", "prune"):
+            if header.get(field) != self.params.get(field):
+                raise ValidationError(f"Журнал {self.path} записан для другого обхода: "
+                                      f"{field} = {header.get(field)!r}, а не {self.params.get(field)!r}")
@@ -1,62 +1,428 @@
 import json
-import urllib.request
-import urllib.error
-from errors import NetworkError, PackageDataError, PackageNotFoundError
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+from errors import DependencyVisualizerError, NetworkError, PackageDataError, PackageNotFoundError
+from local_repository import LocalRepository
+from packument_parser import DEPENDENCY_TYPES, PackumentStreamParser
+from profiler import NULL_PROFILER
+import npm_semver
+
+DEFAULT_REGISTRY = "https://registry.npmjs.org"
+# Сокращенный формат метаданных: только поля, нужные для установки (без readme, time и т.п.)
+ABBREVIATED_METADATA = "application/vnd.npm.install-v1+json; q=1.0, application/json; q=0.8, */*"
+CHUNK_SIZE = 64 * 1024
+
+
+def peak_rss():
+    # Пиковое потребление памяти процессом в байтах (None, если модуль resource недоступен)
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def _network_errors():
+    # Исключения сети; вычисляется, только когда исключение уже произошло
+    import http.client
+    return OSError, http.client.HTTPException
+
+
+# Память коллектора об одном пакете: Future метаданных (загруженных или "в
+# полете") и разрешенные диапазоны версий
+class _PackageEntry:
+    __slots__ = ('future', 'stored', 'resolved')
+
+    def __init__(self):
+        self.future = None
+        self.stored = time.monotonic()
+        self.resolved = {}
 
 
 class NPMDataCollector:
-    def __init__(self, repository_url, test_mode=False):
+    def __init__(self, repository_url, test_mode=False, cache=None, offline=False, retries=3, profiler=None,
+                 memoize=True, max_packages=None, memo_ttl=None):
         self.repository_url = repository_url
         self.test_mode = test_mode
+        self.cache = cache
+        self.offline = offline
+        self.registry_url = self._registry_base(repository_url)
+        self.local_repository = LocalRepository(repository_url) if test_mode else None
+        self.profiler = profiler or NULL_PROFILER
+        self.retries = retries
+        self._http = None
+
+        # Метаданные уже загруженных пакетов и запросы "в полете" (один Future на
+        # пакет, чтобы параллельные потоки не качали его дважды) и разрешения
+        # версий - по записи _PackageEntry на пакет. Для долгоживущего процесса
+        # (--serve) память ограничена: LRU на max_packages пакетов, а запись
+        # старше memo_ttl секунд забывается, и пакет снова проверяется по кэшу и
+        # реестру. Без ограничений запись живет до конца прогона
+        self.max_packages = max_packages
+        self.memo_ttl = memo_ttl
+        self._packages = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Объем загруженных данных по пакетам: байт по сети и после распаковки
+        self.transfer_stats = {}
+
+        # Признаки свежести загруженных пакетов (ETag, Last-Modified, modified
+        # из реестра; в тестовом режиме - хэш записи) для снимков графа
+        self.validators = {}
+        # Без memoize (обход с --memory-limit) разрешения версий и признаки свежести
+        # не копятся в памяти: каждое требование загружается один раз, а снимков нет
+        self.memoize = memoize
+
+    @staticmethod
+    def _registry_base(repository_url):
+        # urllib.parse нужен только для адреса реестра, не для файла тестового режима
+        if repository_url and '://' in repository_url:
+            from urllib.parse import urlparse
+            if urlparse(repository_url).scheme in ('http', 'https'):
+                return repository_url.rstrip('/')
+        return DEFAULT_REGISTRY
+
+    def package_url(self, package_name):
+        # Пакет со scope запрашивается как "@scope%2fname"
+        from urllib.parse import quote
+        return f"{self.registry_url}/{quote(package_name, safe='@')}"
+
+    @property
+    def http(self):
+        # Пул соединений (и http.client, ssl) загружается при первом сетевом
+        # запросе: тестовому режиму и работе из кэша он не нужен
+        if self._http is None:
+            from http_pool import ConnectionPool
+            with self._lock:
+                if self._http is None:
+                    self._http = ConnectionPool(retries=self.retries, profiler=self.profiler)
+        return self._http
+
+    def close(self):
+        if self._http is not None:
+            self._http.close()
+
+    def clear(self):
+        # Забыть загруженные метаданные и разрешения версий (POST /reset в --serve)
+        with self._lock:
+            self._packages.clear()
+            self.validators.clear()
+            self.transfer_stats.clear()
+
+    def _entry(self, package_name, create=False):
+        # Запись о пакете (под self._lock); устаревшая по memo_ttl запись забывается,
+        # запрос "в полете" не устаревает
+        packages = self._packages
+        entry = packages.get(package_name)
+        if entry is not None:
+            if (self.memo_ttl is not None and (entry.future is None or entry.future.done())
+                    and time.monotonic() - entry.stored > self.memo_ttl):
+                del packages[package_name]
+                entry = None
+            elif self.max_packages is not None:
+                packages.move_to_end(package_name)
+
+        if entry is None and create:
+            entry = packages[package_name] = _PackageEntry()
+            if self.max_packages is not None:
+                while len(packages) > self.max_packages:
+                    evicted, _ = packages.popitem(last=False)
+                    self.validators.pop(evicted, None)
+                    self.transfer_stats.pop(evicted, None)
+        return entry
 
     def get_package_dependencies(self, package_name, version=None):
         if self.test_mode:
             return self._get_test_dependencies(package_name)
 
+        dependencies = {}
+        for names in self.get_dependencies_by_type(package_name, version).values():
+            dependencies.update(names)
+
+        return dependencies
+
+    def get_dependencies_by_type(self, package_name, version=None):
+        # Зависимости версии по типам: {"dependencies": {...}, "devDependencies": {...}, ...}
+        if self.test_mode:
+            entry = self._get_test_entry(package_name)
+            return {dependency_type: entry[dependency_type] for dependency_type in DEPENDENCY_TYPES
+                    if isinstance(entry.get(dependency_type), dict)}
+
+        metadata = self._get_package_metadata(package_name)
+        version_data = metadata['versions'][self.resolve_version(package_name, version)]
+
+        return {dependency_type: version_data[dependency_type] for dependency_type in DEPENDENCY_TYPES
+                if version_data.get(dependency_type)}
+
+    def resolve_version(self, package_name, spec=None):
+        # Диапазон/тег -> конкретная версия; результат запоминается по (пакет, диапазон)
+        with self._lock:
+            entry = self._entry(package_name)
+            resolved = entry.resolved.get(spec) if entry is not None else None
+        if resolved is not None:
+            return resolved
+
+        if self.test_mode:
+            # В тестовом репозитории у пакета не больше одной версии
+            entry = self.local_repository.get_entry(package_name)
+            version = entry.get('version') if isinstance(entry, dict) else None
+            resolved = version if isinstance(version, str) else ''
+        else:
+            resolved = self._resolve_registry_version(package_name, spec)
+
+        if self.memoize:
+            with self._lock:
+                self._entry(package_name, create=True).resolved[spec] = resolved
+        return resolved
+
+    def _resolve_registry_version(self, package_name, spec):
+        metadata = self._get_package_metadata(package_name)
+        versions = metadata['versions']
+        dist_tags = metadata['dist-tags']
+
         try:
-            url = f"https://registry.npmjs.org/{package_name}"
+            resolved = npm_semver.resolve(spec, versions, dist_tags)
+        except ValueError:
+            # Не semver (git, url, file:, alias): как и раньше, берем последнюю версию
+            resolved = npm_semver.resolve(None, versions, dist_tags)
 
-            with urllib.request.urlopen(url, timeout=15) as response:
-                data = json.loads(response.read().decode('utf-8'))
+        if resolved not in versions:
+            raise PackageNotFoundError(f"Нет версии '{package_name}', удовлетворяющей '{spec or 'latest'}'")
 
-            if version and version in data.get('versions', {}):
-                target_version = version
-            else:
-                target_version = data.get('dist-tags', {}).get('latest',
-                                                               sorted(data.get('versions', {}).keys())[-1])
+        return resolved
 
-            version_data = data['versions'][target_version]
+    def _get_package_metadata(self, package_name):
+        with self._lock:
+            entry = self._entry(package_name, create=True)
+            future = entry.future
+            owner = future is None
+            if owner:
+                future = entry.future = Future()
+                entry.stored = time.monotonic()
 
-            dependencies = {}
-            dependencies.update(version_data.get('dependencies', {}))
-            dependencies.update(version_data.get('devDependencies', {}))
-            dependencies.update(version_data.get('peerDependencies', {}))
+        if owner:
+            try:
+                with self.profiler.span('fetch', 'network', package=package_name) as span:
+                    future.set_result(self._fetch_package_metadata(package_name, span))
+            except Exception as e:
+                # Неудачный запрос не запоминаем: следующий вызов попробует снова
+                with self._lock:
+                    if entry.future is future:
+                        entry.future = None
+                future.set_exception(e)
 
-            return dependencies
+        return future.result()
+
+    def _fetch_package_metadata(self, package_name, span):
+        cached = self.cache.get(self.registry_url, package_name) if self.cache else None
+
+        if cached and (self.offline or self.cache.is_fresh(cached)):
+            span.set(source='cache')
+            self.cache.count("hits")
+            self._remember_validator(package_name, cached.metadata, cached.etag, cached.last_modified)
+            return cached.metadata
 
-        except urllib.error.HTTPError as e:
-            if e.code == 404:
-                raise PackageNotFoundError(f"Пакет '{package_name}' не найден")
-            raise NetworkError(f"HTTP ошибка {e.code}: {e.reason}")
-        except urllib.error.URLError as e:
-            raise NetworkError(f"Ошибка сети: {e.reason}")
+        if self.offline:
+            raise NetworkError(f"Пакет '{package_name}' отсутствует в кэше (режим --offline)")
+
+        headers = self._request_headers(cached.etag if cached else None,
+                                        cached.last_modified if cached else None)
+
+        try:
+            with self.http.get(self.package_url(package_name), headers) as response:
+                if response.status == 304 and cached:
+                    span.set(source='revalidated')
+                    self.cache.count("revalidated")
+                    self.cache.touch(self.registry_url, package_name)
+                    self._remember_validator(package_name, cached.metadata, cached.etag, cached.last_modified)
+                    return cached.metadata
+                if response.status == 404:
+                    raise PackageNotFoundError(f"Пакет '{package_name}' не найден")
+                if response.status != 200:
+                    raise NetworkError(f"HTTP ошибка {response.status}: {response.reason}")
+
+                metadata = self._read_metadata(package_name, response, span)
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+
+            self._store_metadata(package_name, metadata, etag, last_modified)
+            return metadata
+
+        except (PackageDataError, PackageNotFoundError, NetworkError):
+            raise
+        except _network_errors() as e:
+            raise NetworkError(f"Ошибка сети: {e}")
         except Exception as e:
             raise PackageDataError(f"Ошибка обработки данных: {e}")
 
-    def _get_test_dependencies(self, package_name):
+    def revalidate(self, package_name, validator):
+        # Не изменился ли пакет с момента снимка: условный запрос с ETag/Last-Modified
+        # снимка. Новые метаданные (ответ 200) сразу попадают в память коллектора,
+        # и обход графа не будет загружать пакет повторно.
+        if self.test_mode:
+            try:
+                entry = self.local_repository.get_entry(package_name)
+            except PackageNotFoundError:
+                return False
+            return validator.get('digest') == self._entry_digest(entry)
+
+        if self.offline:
+            return True
+
+        cached = self.cache.get(self.registry_url, package_name) if self.cache else None
+        if cached and self.cache.is_fresh(cached) and cached.etag and cached.etag == validator.get('etag'):
+            self.cache.count("hits")
+            self._remember_validator(package_name, cached.metadata, cached.etag, cached.last_modified)
+            return True
+
+        headers = self._request_headers(validator.get('etag'), validator.get('last_modified'))
         try:
-            with open(self.repository_url, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with self.http.get(self.package_url(package_name), headers) as response:
+                if response.status == 304:
+                    if cached:
+                        self.cache.count("revalidated")
+                        self.cache.touch(self.registry_url, package_name)
+                    return True
+                if response.status != 200:
+                    return False
+
+                metadata = self._read_metadata(package_name, response)
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+        except (DependencyVisualizerError, *_network_errors()):
+            # Проверить не удалось - пакет считается измененным, обход загрузит его сам
+            return False
+
+        self._store_metadata(package_name, metadata, etag, last_modified)
+        future = Future()
+        future.set_result(metadata)
+        with self._lock:
+            entry = self._entry(package_name, create=True)
+            if entry.future is None:
+                entry.future = future
+                entry.stored = time.monotonic()
+
+        # Без ETag в снимке сервер мог просто не поддержать условный запрос:
+        # тогда пакет не изменился, если совпадает время modified из реестра
+        modified = metadata.get('modified')
+        return not validator.get('etag') and modified is not None and modified == validator.get('modified')
+
+    @staticmethod
+    def _request_headers(etag=None, last_modified=None):
+        headers = {
+            'Accept': ABBREVIATED_METADATA,
+            'Accept-Encoding': 'gzip'
+        }
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def _store_metadata(self, package_name, metadata, etag, last_modified):
+        self._remember_validator(package_name, metadata, etag, last_modified)
+        if self.cache:
+            self.cache.count("misses")
+            self.cache.put(self.registry_url, package_name, metadata, etag, last_modified)
+
+    def _remember_validator(self, package_name, metadata, etag, last_modified):
+        validator = {
+            key: value
+            for key, value in (('etag', etag), ('last_modified', last_modified), ('modified', metadata.get('modified')))
+            if value
+        }
+        with self._lock:
+            self.validators[package_name] = validator
+
+    @staticmethod
+    def _entry_digest(entry):
+        import hashlib
+        return hashlib.sha1(json.dumps(entry, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _read_metadata(self, package_name, response, span=None):
+        # Ответ разбирается по мере чтения: документ целиком в памяти не собирается
+        parser = PackumentStreamParser()
+        gzipped = response.headers.get('Content-Encoding', '').lower() == 'gzip'
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+        wire_bytes = decoded_bytes = 0
+        # Чтение и разбор чередуются, поэтому время разбора (распаковка + JSON) копится отдельно
+        profiling = self.profiler.enabled
+        decode_time = 0.0
+        started = time.perf_counter() if profiling else 0.0
+
+        while True:
+            chunk = response.read(CHUNK_SIZE)
+            if not chunk:
+                break
+
+            wire_bytes += len(chunk)
+            if profiling:
+                decode_started = time.perf_counter()
+            if decompressor:
+                chunk = decompressor.decompress(chunk)
+            decoded_bytes += len(chunk)
+            parser.feed(chunk)
+            if profiling:
+                decode_time += time.perf_counter() - decode_started
+
+        if profiling:
+            decode_started = time.perf_counter()
+        if decompressor:
+            tail = decompressor.flush()
+            decoded_bytes += len(tail)
+            parser.feed(tail)
+
+        metadata = parser.close()
+
+        with self._lock:
+            self.transfer_stats[package_name] = (wire_bytes, decoded_bytes)
+
+        if profiling:
+            decode_time += time.perf_counter() - decode_started
+            self.profiler.observe('read', time.perf_counter() - started - decode_time)
+            self.profiler.observe('decode', decode_time)
+            self.profiler.count('wire_bytes', wire_bytes)
+            self.profiler.count('decoded_bytes', decoded_bytes)
+            if span is not None:
+                span.set(wire_bytes=wire_bytes, decoded_bytes=decoded_bytes,
+                         decode_ms=round(decode_time * 1000, 3))
+
+        return metadata
+
+    def transfer_summary(self):
+        with self._lock:
+            stats = dict(self.transfer_stats)
+
+        return {
+            "requests": len(stats),
+            "connections": self._http.connections_opened if self._http else 0,
+            "retries": self._http.retried if self._http else 0,
+            "wire_bytes": sum(wire for wire, _ in stats.values()),
+            "decoded_bytes": sum(decoded for _, decoded in stats.values()),
+            "largest": sorted(stats.items(), key=lambda item: item[1][0], reverse=True)[:5],
+            "peak_rss": peak_rss()
+        }
+
+    def _get_test_dependencies(self, package_name):
+        return self._get_test_entry(package_name).get('dependencies', {})
+
+    def _get_test_entry(self, package_name):
+        entry = self.local_repository.get_entry(package_name)
+
+        if not isinstance(entry, dict):
+            raise PackageDataError(f"Некорректная запись пакета '{package_name}' в тестовом репозитории")
 
-            if package_name in data:
-                return data[package_name].get('dependencies', {})
-            else:
-                raise PackageNotFoundError(f"Пакет '{package_name}' не найден в тестовом репозитории")
+        if self.memoize:
+            with self._lock:
+                self.validators[package_name] = {'digest': self._entry_digest(entry)}
 
-        except FileNotFoundError:
-            raise PackageNotFoundError(f"Файл не найден: {self.repository_url}")
-        except json.JSONDecodeError:
-            raise PackageDataError("Ошибка чтения JSON файла")
+        return entry
 
     def filter_dependencies(self, dependencies, filter_substring):
         if not filter_substring:
@@ -67,4 +433,4 @@ class NPMDataCollector:
             if filter_substring.lower() not in package.lower():
                 filtered[package] = version
 
-        return filtered
\ No newline at end of file
+        return filtered
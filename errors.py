@@ -17,4 +17,10 @@ class PackageDataError(DependencyVisualizerError):
     pass
 
 class CyclicDependencyError(DependencyVisualizerError):
-    pass
\ No newline at end of file
+    pass
+
+class CacheError(DependencyVisualizerError):
+    pass
+
+class StoreError(DependencyVisualizerError):
+    pass
@@ -0,0 +1,185 @@
+from array import array
+from collections import deque
+
+UNREACHABLE = -1
+
+
+# Аналитика графа зависимостей за один линейный проход (O(V+E)): компоненты
+# сильной связности (итеративный Тарьян, без рекурсии), сжатый ациклический граф
+# компонент, топологический порядок, кратчайшая и длиннейшая глубина от корня,
+# число входящих и исходящих ребер. Работает с массивами CSR из CompactGraph.
+class GraphAnalysis:
+    def __init__(self, offsets, targets, root=0):
+        self.node_count = len(offsets) - 1
+        self.edge_count = len(targets)
+        self.root = root
+
+        self.fan_out = array('I', (offsets[node + 1] - offsets[node] for node in range(self.node_count)))
+        self.fan_in = array('I', [0]) * self.node_count
+        for target in targets:
+            self.fan_in[target] += 1
+
+        self.component, self.components = self._strongly_connected_components(offsets, targets)
+        self.component_offsets, self.component_targets = self._condense(offsets, targets)
+        self.depth = self._shortest_depths(offsets, targets)
+        self.longest_depth = self._longest_depths()
+
+    @property
+    def cycles(self):
+        # Циклы - компоненты из нескольких узлов и узлы с петлей на себя
+        return [members for component_id, members in enumerate(self.components)
+                if len(members) > 1 or self._has_self_loop(component_id)]
+
+    @property
+    def has_cycles(self):
+        return any(len(members) > 1 or self._has_self_loop(component_id)
+                   for component_id, members in enumerate(self.components))
+
+    @property
+    def max_depth(self):
+        return max(self.depth, default=0)
+
+    @property
+    def max_longest_depth(self):
+        return max(self.longest_depth, default=0)
+
+    def topological_order(self):
+        # Сначала зависящие пакеты, затем их зависимости; узлы одного цикла идут подряд
+        order = []
+        for component_id in range(len(self.components) - 1, -1, -1):
+            order.extend(self.components[component_id])
+        return order
+
+    def levels(self, longest=False):
+        # {глубина: [узлы]} для достижимых из корня узлов
+        depths = self.longest_depth if longest else self.depth
+        levels = {}
+        for node, depth in enumerate(depths):
+            if depth != UNREACHABLE:
+                levels.setdefault(depth, []).append(node)
+        return dict(sorted(levels.items()))
+
+    def _has_self_loop(self, component_id):
+        start = self.component_offsets[component_id]
+        end = self.component_offsets[component_id + 1]
+        return component_id in self.component_targets[start:end]
+
+    def _strongly_connected_components(self, offsets, targets):
+        count = self.node_count
+        index = array('i', [-1]) * count
+        lowlink = array('i', [0]) * count
+        component = array('i', [-1]) * count
+        components = []
+        stack = []
+        counter = 0
+
+        # Узел на стеке Тарьяна <=> уже посещен, но еще не отнесен к компоненте
+        start_nodes = [self.root] if count else []
+        start_nodes.extend(range(count))
+
+        for start in start_nodes:
+            if index[start] != -1:
+                continue
+
+            index[start] = lowlink[start] = counter
+            counter += 1
+            stack.append(start)
+            work = [(start, offsets[start])]
+
+            while work:
+                node, position = work[-1]
+                end = offsets[node + 1]
+
+                while position < end:
+                    target = targets[position]
+                    position += 1
+                    if index[target] == -1:
+                        work[-1] = (node, position)
+                        index[target] = lowlink[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        work.append((target, offsets[target]))
+                        break
+                    if component[target] == -1 and index[target] < lowlink[node]:
+                        lowlink[node] = index[target]
+                else:
+                    work.pop()
+
+                    if lowlink[node] == index[node]:
+                        component_id = len(components)
+                        members = []
+                        while True:
+                            member = stack.pop()
+                            component[member] = component_id
+                            members.append(member)
+                            if member == node:
+                                break
+                        members.reverse()
+                        components.append(members)
+
+                    if work:
+                        parent = work[-1][0]
+                        if lowlink[node] < lowlink[parent]:
+                            lowlink[parent] = lowlink[node]
+
+        return component, components
+
+    def _condense(self, offsets, targets):
+        # Ребра между компонентами без повторов. Тарьян нумерует компоненты в обратном
+        # топологическом порядке, поэтому ребро всегда ведет к меньшему номеру
+        # (кроме петель на себя, которые сохраняются для поиска циклов).
+        component = self.component
+        component_offsets = array('I', [0])
+        component_targets = array('I')
+
+        for members in self.components:
+            seen = set()
+            for node in members:
+                for target in targets[offsets[node]:offsets[node + 1]]:
+                    target_component = component[target]
+                    if target_component not in seen:
+                        seen.add(target_component)
+                        component_targets.append(target_component)
+            component_offsets.append(len(component_targets))
+
+        return component_offsets, component_targets
+
+    def _shortest_depths(self, offsets, targets):
+        depth = array('i', [UNREACHABLE]) * self.node_count
+        if not self.node_count:
+            return depth
+
+        depth[self.root] = 0
+        queue = deque([self.root])
+        while queue:
+            node = queue.popleft()
+            next_depth = depth[node] + 1
+            for target in targets[offsets[node]:offsets[node + 1]]:
+                if depth[target] == UNREACHABLE:
+                    depth[target] = next_depth
+                    queue.append(target)
+
+        return depth
+
+    def _longest_depths(self):
+        # Длиннейший путь от корня по сжатому графу. Проход через цикл из k узлов
+        # стоит k шагов (простой путь не длиннее); в ациклическом графе глубина точная
+        component_count = len(self.components)
+        component_depth = array('i', [UNREACHABLE]) * component_count
+        if not component_count:
+            return array('i')
+
+        component_depth[self.component[self.root]] = 0
+        offsets, targets = self.component_offsets, self.component_targets
+
+        for component_id in range(component_count - 1, -1, -1):
+            current = component_depth[component_id]
+            if current == UNREACHABLE:
+                continue
+            next_depth = current + len(self.components[component_id])
+            for target in targets[offsets[component_id]:offsets[component_id + 1]]:
+                if target != component_id and component_depth[target] < next_depth:
+                    component_depth[target] = next_depth
+
+        return array('i', (max(component_depth[component_id], depth)
+                           for component_id, depth in zip(self.component, self.depth)))
@@ -1,127 +1,475 @@
-from collections import deque
+import json
+import threading
+import time
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from compact_graph import CompactGraphBuilder, as_compact_graph, format_package_key
+from crawl_journal import is_transient
 from errors import CyclicDependencyError
+from profiler import NULL_PROFILER
+from reverse_index import ReverseDependencyIndex
+from subgraph_memo import Subgraph
+
+# Результат обхода одного корня в пакетном режиме: new_packages - сколько узлов
+# не встречалось у предыдущих корней (остальные взяты из общего слоя загрузки)
+BatchResult = namedtuple('BatchResult', ['package', 'version', 'graph', 'elapsed', 'new_packages'])
+
+# Поддеревья пакетов скольких первых уровней обхода запоминаются в SubgraphMemo:
+# глубже поддеревья мелкие, и их замыкание стоит дороже, чем повторный обход
+MEMO_LEVELS = 2
 
 
 class DependencyGraphBuilder:
-    def __init__(self, data_collector):
+    def __init__(self, data_collector, jobs=1, profiler=None, journal=None, transient_retries=1, pruning=None,
+                 memo=None):
         self.data_collector = data_collector
+        self.jobs = max(1, jobs or 1)
+        self.profiler = profiler or NULL_PROFILER
+        # Журнал обхода для --resume и число дополнительных попыток для пакетов
+        # с временной (сетевой) ошибкой в конце каждого уровня
+        self.journal = journal
+        self.transient_retries = transient_retries
+        # Правила отсечения обхода (PruningSpec) и их статистика по последнему обходу
+        self.pruning = pruning
+        self.pruning_stats = None
+        self._pruning_lock = threading.Lock()
+        # Память раскрытых поддеревьев (SubgraphMemo), общая для обходов разных корней
+        self.memo = memo
 
     def build_dependency_graph(self, root_package, root_version=None, filter_substring=None, max_depth=3):
+        # Прежний словарный формат: {ключ: {имя: диапазон}} или {ключ: {"ERROR": сообщение}}
+        graph, _ = self._crawl(root_package, root_version, filter_substring, max_depth)
+        return graph.to_dict()
+
+    def build_compact_graph(self, root_package, root_version=None, filter_substring=None, max_depth=3):
+        graph, resolutions = self._crawl(root_package, root_version, filter_substring, max_depth)
+        return graph.build(resolutions)
+
+    def build_batch(self, roots, filter_substring=None, max_depth=3):
+        # Корни обходятся по очереди через один коллектор: пакет, уже загруженный
+        # для одного корня, для следующих берется из памяти коллектора (и кэша).
+        # Возвращает объединенный граф всех корней и результаты по каждому корню.
+        combined = CompactGraphBuilder()
+        resolutions = {}
+        results = []
+
+        for root_package, root_version in roots:
+            started = time.perf_counter()
+            graph, root_resolutions = self._crawl(root_package, root_version, filter_substring, max_depth)
+            compact = graph.build(root_resolutions)
+            elapsed = time.perf_counter() - started
+
+            new_packages = combined.merge(graph)
+            resolutions.update(root_resolutions)
+
+            results.append(BatchResult(root_package, root_version, compact, elapsed, new_packages))
+
+        return combined.build(resolutions), results
+
+    @staticmethod
+    def batch_overlap(results):
+        # В скольких корнях встречается каждый загруженный пакет
+        roots_by_package = {}
+        for result in results:
+            graph = result.graph
+            for node in graph.fetched_nodes():
+                roots_by_package[graph.keys[node]] = roots_by_package.get(graph.keys[node], 0) + 1
+
+        total = sum(len(result.graph.fetched_nodes()) for result in results)
+        shared = {package: count for package, count in roots_by_package.items() if count > 1}
+
+        return {
+            "total_packages": total,
+            "unique_packages": len(roots_by_package),
+            "shared_packages": len(shared),
+            "saved_fetches": total - len(roots_by_package),
+            "most_shared": sorted(shared.items(), key=lambda item: (-item[1], item[0]))[:10]
+        }
+
+    def _crawl(self, root_package, root_version, filter_substring, max_depth):
         if max_depth is None:
             max_depth = 3
 
-        visited = set()
-        graph = {}
-        stack = [(root_package, root_version, 0)]
+        pruning = self.pruning
+        resolutions = {}
+        # Требование (пакет, диапазон) -> запас уровней, с которым оно уже обработано
+        requested = {}
+        expanded = {}
+        # Граф собирается сразу в массивы CSR, ошибки загрузки - в отдельной таблице
+        graph = CompactGraphBuilder()
+        # Запас уровней: сколько уровней, считая сам пакет, еще можно загрузить.
+        # Без переопределений глубины он равен max_depth - глубина пакета.
+        frontier = [(root_package, root_version, max_depth)]
+        depth = 0
+        stats = self.pruning_stats = {"excluded": set(), "skipped_types": set(), "depth_limited": set(),
+                                      "excluded_edges": 0, "skipped_edges": 0}
+        memo = self.memo
+        memo_params = self._memo_params(filter_substring) if memo is not None else None
+        # Пакеты первых уровней - кандидаты в память поддеревьев после обхода
+        memo_candidates = []
+        transient = set()
 
         print(f" Максимальная глубина обхода: {max_depth}")
 
-        while stack:
-            current_package, current_version, depth = stack.pop()
+        def push_dependencies(package_key, budget):
+            expanded[package_key] = budget
+            if budget <= 1:
+                return
+            for dep_package, dep_version in graph.dependencies(package_key).items():
+                child_budget = budget - 1
+                limit = pruning.depth_limit(dep_package) if pruning else None
+                if limit is not None and limit + 1 < child_budget:
+                    child_budget = limit + 1
+                frontier.append((dep_package, dep_version, child_budget))
+
+        # Обход по уровням (BFS): весь фронтир уровня загружается разом,
+        # при jobs > 1 - через пул потоков. Порядок узлов в графе от jobs не зависит.
+        # Узлы графа - разрешенные версии: "D@^1.0.0" и "D@~1.2.0" сходятся в один "D@1.2.5".
+        executor = ThreadPoolExecutor(max_workers=self.jobs) if self.jobs > 1 else nullcontext()
+        with executor, self.profiler.span('crawl', 'build', package=root_package):
+            while frontier:
+                budgets = {}
+                for package, version, budget in frontier:
+                    requirement = (package, version)
+                    if budget > budgets.get(requirement, 0):
+                        budgets[requirement] = budget
+
+                level = []
+                frontier = []
+                for requirement, budget in budgets.items():
+                    previous = requested.get(requirement)
+                    if previous is not None and previous >= budget:
+                        continue
+                    requested[requirement] = budget
+                    if previous is None:
+                        level.append(requirement)
+                        continue
+                    # Уже загружен, но сейчас достигнут с большим запасом уровней
+                    # (через пакет без переопределения глубины): раскрывается глубже без загрузки
+                    package_key = resolutions.get(requirement)
+                    if package_key in graph and budget > expanded.get(package_key, 0):
+                        push_dependencies(package_key, budget)
+
+                with self.profiler.span('level', 'build', depth=depth, packages=len(level)):
+                    results = self._fetch_level(executor, level, filter_substring, depth)
+                    results = self._retry_transient(executor, level, results, filter_substring, depth)
+
+                for (current_package, current_version), (resolved, dependencies, error) in zip(level, results):
+                    budget = budgets[(current_package, current_version)]
+                    if error is not None:
+                        package_key = format_package_key(current_package, resolved or current_version)
+                        resolutions[(current_package, current_version)] = package_key
+                        if package_key not in graph:
+                            graph.add_error(package_key, str(error))
+                            expanded[package_key] = budget
+                        if is_transient(error):
+                            transient.add(package_key)
+                        continue
+
+                    package_key = format_package_key(current_package, resolved)
+                    resolutions[(current_package, current_version)] = package_key
+                    if package_key in graph:
+                        if budget > expanded.get(package_key, 0):
+                            push_dependencies(package_key, budget)
+                        continue
+
+                    if pruning and pruning.filters_names:
+                        # Отсеченные по имени зависимости не попадают ни в граф, ни в очередь
+                        kept = {name: spec for name, spec in dependencies.items() if pruning.allows(name)}
+                        if len(kept) != len(dependencies):
+                            stats["excluded_edges"] += len(dependencies) - len(kept)
+                            stats["excluded"].update(name for name in dependencies if name not in kept)
+                            dependencies = kept
+
+                    graph.add(package_key, dependencies)
+                    if budget == 1 and depth + 1 < max_depth:
+                        # Глубину пакета ограничило переопределение: его зависимости не загружаются
+                        stats["depth_limited"].update(dependencies)
+
+                    subgraph = None
+                    if memo is not None and depth > 0 and budget > 1:
+                        subgraph = memo.get(package_key, memo_params, budget,
+                                            exact=bool(pruning and pruning.depth_overrides))
+                    if subgraph is not None:
+                        # Поддерево уже раскрывалось для другого корня: вставляется целиком
+                        self._splice(subgraph, graph, expanded, requested, resolutions)
+                        continue
+                    if 0 < depth <= MEMO_LEVELS and memo is not None:
+                        memo_candidates.append((package_key, budget))
+                    push_dependencies(package_key, budget)
+
+                depth += 1
+                if self.journal:
+                    self.journal.level(depth, len(graph))
+
+        if self.journal:
+            self.journal.finish(len(graph))
+
+        if memo_candidates:
+            self._remember_subgraphs(memo_candidates, memo_params, graph, resolutions, transient)
+
+        return graph, resolutions
+
+    def build_graph_store(self, store, root_package, root_version=None, filter_substring=None, max_depth=3):
+        # Обход с ограниченной памятью (--memory-limit): граф пишется в GraphStore,
+        # а не в словарь. Очередь уровня - словарь требований, повторы отсекаются при
+        # добавлении, а не при извлечении. Без переопределений глубины обход в ширину
+        # впервые встречает требование с наибольшим запасом уровней, поэтому
+        # требование загружается один раз и запас не хранится. Номера узлов и
+        # порядок ребер - те же, что у build_compact_graph.
+        pruning = self.pruning
+        self.pruning_stats = {"excluded": set(), "skipped_types": set(), "depth_limited": set(),
+                              "excluded_edges": 0, "skipped_edges": 0}
+        frontier = {(root_package, root_version): 0}
+        depth = 0
+        edges = None
 
-            if depth >= max_depth:
-                continue
+        print(f" Максимальная глубина обхода: {max_depth}")
 
-            package_key = f"{current_package}@{current_version}" if current_version else current_package
+        executor = ThreadPoolExecutor(max_workers=self.jobs) if self.jobs > 1 else nullcontext()
+        with executor, self.profiler.span('crawl', 'build', package=root_package):
+            while frontier:
+                level = list(frontier)
+                with self.profiler.span('level', 'build', depth=depth, packages=len(level)):
+                    results = self._fetch_level(executor, level, filter_substring, depth)
+                    results = self._retry_transient(executor, level, results, filter_substring, depth)
+
+                # Сначала разрешаются все требования уровня (узлы нумеруются по порядку
+                # уровня), затем раскладываются ребра новых узлов
+                resolved = array('I')
+                expanding = []
+                for (package, version), (resolved_version, dependencies, error) in zip(level, results):
+                    if error is not None:
+                        node, _ = store.add_node(format_package_key(package, resolved_version or version),
+                                                 str(error), depth)
+                    else:
+                        node, new = store.add_node(format_package_key(package, resolved_version), depth=depth)
+                        if new:
+                            expanding.append((node, dependencies))
+                    store.resolve(package, version, node)
+                    resolved.append(node)
+                store.levels = depth + 1
+
+                if edges is not None:
+                    edges.resolve(resolved)
+
+                frontier = {}
+                edges = store.level_writer()
+                for node, dependencies in expanding:
+                    if pruning and pruning.filters_names:
+                        kept = {name: spec for name, spec in dependencies.items() if pruning.allows(name)}
+                        if len(kept) != len(dependencies):
+                            self.pruning_stats["excluded_edges"] += len(dependencies) - len(kept)
+                            self.pruning_stats["excluded"].update(name for name in dependencies if name not in kept)
+                            dependencies = kept
+                    if dependencies:
+                        store.with_dependencies += 1
+                    for name, spec in dependencies.items():
+                        target = store.resolution(name, spec)
+                        if target is not None:
+                            edges.add(node, target, store.spec_id(spec))
+                            continue
+                        # Требование следующего уровня (или лист за пределами глубины)
+                        index = frontier.setdefault((name, spec), len(frontier))
+                        edges.add_unresolved(node, index, store.spec_id(spec))
+
+                depth += 1
+                if depth >= max_depth:
+                    break
+
+            # Требования за пределами глубины становятся листьями после всех загруженных узлов
+            leaves = array('I', (store.leaf(package, spec) for package, spec in frontier))
+            edges.resolve(leaves)
+            store.finish()
+
+        return store
+
+    def _memo_params(self, filter_substring):
+        # Параметры обхода, от которых зависит поддерево пакета
+        pruning = json.dumps(self.pruning.describe(), sort_keys=True) if self.pruning else None
+        return filter_substring, pruning
+
+    @staticmethod
+    def _splice(subgraph, graph, expanded, requested, resolutions):
+        for package_key, dependencies, error, budget in subgraph.nodes:
+            if package_key not in graph:
+                if error is not None:
+                    graph.add_error(package_key, error)
+                else:
+                    graph.add(package_key, dependencies)
+                expanded[package_key] = budget
+            elif budget > expanded.get(package_key, 0):
+                # Узел уже был в графе с меньшим запасом: глубже его раскрывает поддерево
+                expanded[package_key] = budget
+        for requirement, package_key, budget in subgraph.requirements:
+            if budget > requested.get(requirement, 0):
+                requested[requirement] = budget
+            resolutions.setdefault(requirement, package_key)
+
+    def _remember_subgraphs(self, candidates, params, graph, resolutions, transient):
+        # Замыкание каждого кандидата восстанавливается по готовому графу
+        # теми же правилами запаса уровней, что и в обходе
+        pruning = self.pruning
+        for root_key, root_budget in candidates:
+            if self.memo.contains(root_key, params, root_budget):
+                continue
 
-            if package_key in visited:
+            budgets = {root_key: root_budget}
+            requirements = {}
+            queue = deque([root_key])
+            while queue:
+                package_key = queue.popleft()
+                budget = budgets[package_key]
+                if budget <= 1:
+                    continue
+                for dep_package, dep_version in graph.dependencies(package_key).items():
+                    child_budget = budget - 1
+                    limit = pruning.depth_limit(dep_package) if pruning else None
+                    if limit is not None and limit + 1 < child_budget:
+                        child_budget = limit + 1
+                    requirement = (dep_package, dep_version)
+                    if child_budget > requirements.get(requirement, 0):
+                        requirements[requirement] = child_budget
+                    child_key = resolutions.get(requirement)
+                    if child_key in graph and child_budget > budgets.get(child_key, 0):
+                        budgets[child_key] = child_budget
+                        queue.append(child_key)
+
+            if transient.intersection(budgets):
+                # Временные ошибки не запоминаются: в следующий раз пакет может загрузиться
                 continue
+            nodes = [(package_key, graph.dependencies(package_key), graph.error(package_key), budget)
+                     for package_key, budget in budgets.items()]
+            requirements = [(requirement, resolutions[requirement], budget)
+                            for requirement, budget in requirements.items() if requirement in resolutions]
+            self.memo.put(root_key, params, Subgraph(root_budget, nodes, requirements))
+
+    def pruning_summary(self, graph):
+        # Сколько загрузок сэкономили правила отсечения в последнем обходе: пакеты,
+        # отброшенные по имени, типу зависимости или глубине и не загруженные иным путем
+        stats = self.pruning_stats
+        graph = as_compact_graph(graph)
+        fetched = {graph.names[node] for node in graph.fetched_nodes()}
+        pruned = stats["excluded"] | stats["skipped_types"] | stats["depth_limited"]
 
-            visited.add(package_key)
+        return {
+            "excluded_edges": stats["excluded_edges"],
+            "skipped_edges": stats["skipped_edges"],
+            "excluded_packages": len(stats["excluded"] - fetched),
+            "skipped_packages": len(stats["skipped_types"] - fetched),
+            "depth_limited_packages": len(stats["depth_limited"] - fetched),
+            "saved_fetches": len(pruned - fetched)
+        }
 
+    def _retry_transient(self, executor, level, results, filter_substring, depth):
+        # Пакеты с временной ошибкой загружаются повторно, когда остальной уровень
+        # уже готов, и только после неудачи всех попыток становятся узлами ERROR
+        for _ in range(self.transient_retries):
+            failed = [position for position, (_, _, error) in enumerate(results)
+                      if error is not None and is_transient(error)]
+            if not failed:
+                break
+
+            retried = self._fetch_level(executor, [level[position] for position in failed], filter_substring, depth)
+            results = list(results)
+            for position, result in zip(failed, retried):
+                results[position] = result
+
+        return results
+
+    def _fetch_level(self, executor, level, filter_substring, depth=0):
+        profiler = self.profiler
+        journal = self.journal
+        dependency_types = self.pruning.types_for(depth) if self.pruning else None
+        submitted = time.perf_counter() if profiler.enabled else 0.0
+
+        def fetch_journaled(requirement):
+            result = journal.replay(requirement)
+            if result is None:
+                result = fetch(requirement)
+                journal.record(requirement, *result)
+            return result
+
+        def fetch(requirement):
+            package, version = requirement
+            resolved = None
+            if profiler.enabled:
+                # Ожидание свободного потока пула с момента постановки уровня в очередь
+                profiler.observe('queue_wait', time.perf_counter() - submitted)
             try:
-                dependencies = self.data_collector.get_package_dependencies(current_package, current_version)
-
-                if filter_substring:
-                    dependencies = self.data_collector.filter_dependencies(dependencies, filter_substring)
-
-                graph[package_key] = dependencies
+                with profiler.span('package', 'build', package=package, depth=depth):
+                    resolved = self.data_collector.resolve_version(package, version)
+                    if dependency_types:
+                        dependencies = self._select_dependency_types(package, resolved or version, dependency_types)
+                    else:
+                        dependencies = self.data_collector.get_package_dependencies(package, resolved or version)
 
-                for dep_package, dep_version in dependencies.items():
-                    if "ERROR" not in dep_package:
-                        stack.append((dep_package, dep_version, depth + 1))
+                    if filter_substring:
+                        dependencies = self.data_collector.filter_dependencies(dependencies, filter_substring)
 
+                return resolved, dependencies, None
             except Exception as e:
-                graph[package_key] = {"ERROR": str(e)}
-
-        return graph
+                return resolved, None, e
+
+        worker = fetch_journaled if journal else fetch
+        if isinstance(executor, ThreadPoolExecutor):
+            return list(executor.map(worker, level))
+        return [worker(requirement) for requirement in level]
+
+    def _select_dependency_types(self, package, version, dependency_types):
+        # Только выбранные типы зависимостей; имена из остальных типов учитываются
+        # как сэкономленные загрузки
+        by_type = self.data_collector.get_dependencies_by_type(package, version)
+        dependencies = {}
+        for dependency_type in dependency_types:
+            dependencies.update(by_type.get(dependency_type) or {})
+
+        skipped = {name for dependency_type, names in by_type.items() if dependency_type not in dependency_types
+                   for name in names if name not in dependencies}
+        if skipped:
+            with self._pruning_lock:
+                self.pruning_stats["skipped_types"].update(skipped)
+                self.pruning_stats["skipped_edges"] += len(skipped)
+        return dependencies
+
+    def build_reverse_index(self, root_package, root_version=None, filter_substring=None, max_depth=3):
+        # Граф от корня строится один раз, дальше на любые цели отвечает индекс
+        graph = self.build_compact_graph(root_package, root_version, filter_substring, max_depth)
+        return ReverseDependencyIndex(graph)
 
     def find_reverse_dependencies(self, target_package, root_package, root_version=None, filter_substring=None,
                                   max_depth=3):
-        if max_depth is None:
-            max_depth = 3
+        index = self.build_reverse_index(root_package, root_version, filter_substring, max_depth)
+        return [index.graph.keys[node] for node in sorted(index.direct_dependents(target_package))]
 
-        graph = self.build_dependency_graph(root_package, root_version, filter_substring, max_depth)
-
-        reverse_deps = []
-        target_name = target_package.split('@')[0]
-
-        for package, dependencies in graph.items():
-            for dep in dependencies:
-                if "ERROR" not in dep:
-                    dep_name = dep.split('@')[0]
-                    if dep_name == target_name:
-                        reverse_deps.append(package)
-                        break
+    def get_graph_statistics(self, graph):
+        with self.profiler.span('statistics', 'build'):
+            return self._graph_statistics(as_compact_graph(graph))
 
-        return reverse_deps
+    def _graph_statistics(self, graph):
+        fetched = graph.fetched_nodes()
 
-    def get_graph_statistics(self, graph):
-        if not graph:
+        if not fetched:
             return {
                 "total_packages": 0,
                 "total_dependencies": 0,
                 "max_depth": 0,
-                "has_cycles": False
+                "longest_path": 0,
+                "has_cycles": False,
+                "cycles": []
             }
 
-        total_deps = sum(1 for deps in graph.values() for dep in deps if "ERROR" not in dep)
-
-        depths = {}
-        max_depth = 0
-
-        if graph:
-            root = next(iter(graph.keys()))
-            depths[root] = 0
-
-            stack = [(root, 0)]
-            while stack:
-                node, depth = stack.pop()
-                max_depth = max(max_depth, depth)
-
-                if node in graph:
-                    for dep in graph[node]:
-                        if "ERROR" not in dep and dep not in depths:
-                            depths[dep] = depth + 1
-                            stack.append((dep, depth + 1))
+        analysis = graph.analysis()
+        most_depended = max(range(len(graph)), key=analysis.fan_in.__getitem__)
 
         return {
-            "total_packages": len(graph),
-            "total_dependencies": total_deps,
-            "max_depth": max_depth,
-            "has_cycles": self._check_cycles(graph)
+            "total_packages": len(fetched),
+            "total_dependencies": graph.edge_count,
+            "max_depth": analysis.max_depth,
+            "longest_path": analysis.max_longest_depth,
+            "has_cycles": analysis.has_cycles,
+            "cycles": [[graph.keys[node] for node in members] for members in analysis.cycles],
+            "most_depended": (graph.keys[most_depended], analysis.fan_in[most_depended])
         }
-
-    def _check_cycles(self, graph):
-        def has_cycle(node, visited, recursion_stack):
-            visited.add(node)
-            recursion_stack.add(node)
-
-            if node in graph:
-                for neighbor in graph[node]:
-                    if "ERROR" not in neighbor:
-                        if neighbor not in visited:
-                            if has_cycle(neighbor, visited, recursion_stack):
-                                return True
-                        elif neighbor in recursion_stack:
-                            return True
-
-            recursion_stack.remove(node)
-            return False
-
-        visited = set()
-        for node in graph:
-            if node not in visited:
-                if has_cycle(node, visited, set()):
-                    return True
-        return False
@@ -0,0 +1,246 @@
+from array import array
+from hashlib import blake2b
+from itertools import chain
+from compact_graph import CompactGraph, as_compact_graph, format_package_key, split_package_key
+from render_pipeline import CHANGE_ADDED, CHANGE_NONE, CHANGE_REMOVED, CHANGE_UPGRADED
+
+HASH_SIZE = 16
+
+
+def subtree_hashes(graph):
+    # Структурный хэш поддерева каждого узла за O(V+E): ключ узла, ошибка или
+    # признак раскрытия и (имя, диапазон, хэш цели) каждой зависимости по порядку.
+    # Компоненты обходятся от зависимостей к зависящим (у Тарьяна ребро ведет к
+    # меньшему номеру компоненты), поэтому хэши целей уже посчитаны. Цикл хэшируется
+    # целиком: ребра внутри компоненты записываются ключом цели, хэш узла цикла -
+    # от хэша компоненты и своего ключа.
+    analysis = graph.analysis()
+    keys, names, specs = graph.keys, graph.names, graph.specs
+    offsets, targets, edge_specs = graph.offsets, graph.targets, graph.edge_specs
+    errors, expanded = graph.errors, graph.expanded
+    component = analysis.component
+    hashes = [b''] * len(graph)
+
+    for component_id, members in enumerate(analysis.components):
+        digest = blake2b(digest_size=HASH_SIZE)
+        for node in (members if len(members) == 1 else sorted(members, key=keys.__getitem__)):
+            if node in errors:
+                state = f"\x02{errors[node]}"
+            else:
+                state = '\x01' if expanded[node] else '\x00'
+            parts = [keys[node].encode(), state.encode()]
+            for position in range(offsets[node], offsets[node + 1]):
+                target = targets[position]
+                parts.append(f"{names[target]}\x00{specs[edge_specs[position]]}".encode())
+                parts.append(hashes[target] if component[target] != component_id else b'@' + keys[target].encode())
+            digest.update(b'\x1f'.join(parts))
+            digest.update(b'\x1e')
+
+        if len(members) == 1:
+            hashes[members[0]] = digest.digest()
+        else:
+            shared = digest.digest()
+            for node in members:
+                hashes[node] = blake2b(shared + keys[node].encode(), digest_size=HASH_SIZE).digest()
+
+    return hashes
+
+
+def describe_versions(values):
+    return ", ".join(sorted(value or "?" for value in values))
+
+
+# Сравнение графов двух версий корневого пакета (--diff-version). Узел с тем же
+# ключом и тем же хэшем поддерева в обоих графах дает одинаковые ребра во всем
+# своем замыкании, поэтому ребра считаются только для "измененных" имен - тех, у
+# которых хоть один загруженный узел не совпал. Это сами изменения и их предки до
+# корня; совпавшие поддеревья не обходятся. Изменения - в формате diff_snapshots
+# (graph_snapshot): пакеты по именам и ребра (пакет -> зависимость) с версиями цели.
+class GraphDiff:
+    def __init__(self, old, new):
+        self.old = as_compact_graph(old)
+        self.new = as_compact_graph(new)
+
+        old_hashes = subtree_hashes(self.old)
+        new_hashes = subtree_hashes(self.new)
+        self.old_shared = bytearray(len(self.old))
+        self.new_shared = bytearray(len(self.new))
+        new_index = self.new.index
+        for node, key in enumerate(self.old.keys):
+            other = new_index.get(key)
+            if other is not None and old_hashes[node] == new_hashes[other]:
+                self.old_shared[node] = self.new_shared[other] = 1
+
+        self.old_versions = self._versions(self.old)
+        self.new_versions = self._versions(self.new)
+
+        self.dirty = set()
+        for graph, shared in ((self.old, self.old_shared), (self.new, self.new_shared)):
+            names = graph.names
+            self.dirty.update(names[node] for node in graph.fetched_nodes() if not shared[node])
+
+        self.old_edges = self._edges(self.old)
+        self.new_edges = self._edges(self.new)
+        self.changes = self._changes()
+
+    @staticmethod
+    def _versions(graph):
+        # Имя -> версии загруженных узлов
+        versions = {}
+        names, keys = graph.names, graph.keys
+        for node in graph.fetched_nodes():
+            versions.setdefault(names[node], set()).add(split_package_key(keys[node])[1])
+        return versions
+
+    def _edges(self, graph):
+        # Измененное имя -> {зависимость: (диапазон, версии цели)} по всем его узлам
+        edges = {}
+        names, keys, specs = graph.names, graph.keys, graph.specs
+        dirty = self.dirty
+        for node in graph.fetched_nodes():
+            name = names[node]
+            if name not in dirty:
+                continue
+            dependencies = edges.setdefault(name, {})
+            for position in range(graph.offsets[node], graph.offsets[node + 1]):
+                target = graph.targets[position]
+                entry = dependencies.get(names[target])
+                if entry is None:
+                    entry = dependencies[names[target]] = (specs[graph.edge_specs[position]], set())
+                entry[1].add(split_package_key(keys[target])[1])
+        return edges
+
+    def _changes(self):
+        old_versions, new_versions = self.old_versions, self.new_versions
+        old_edges = {(source, name): versions for source, dependencies in self.old_edges.items()
+                     for name, (_, versions) in dependencies.items()}
+        new_edges = {(source, name): versions for source, dependencies in self.new_edges.items()
+                     for name, (_, versions) in dependencies.items()}
+
+        return {
+            "added_packages": sorted(new_versions.keys() - old_versions.keys()),
+            "removed_packages": sorted(old_versions.keys() - new_versions.keys()),
+            "upgraded_packages": [
+                [name, describe_versions(old_versions[name]), describe_versions(new_versions[name])]
+                for name in sorted(self.dirty & old_versions.keys() & new_versions.keys())
+                if old_versions[name] != new_versions[name]
+            ],
+            "added_edges": [list(edge) for edge in sorted(new_edges.keys() - old_edges.keys())],
+            "removed_edges": [list(edge) for edge in sorted(old_edges.keys() - new_edges.keys())],
+            "upgraded_edges": [
+                [source, name, describe_versions(old_edges[(source, name)]),
+                 describe_versions(new_edges[(source, name)])]
+                for source, name in sorted(old_edges.keys() & new_edges.keys())
+                if old_edges[(source, name)] != new_edges[(source, name)]
+            ]
+        }
+
+    def summary(self):
+        changes = self.changes
+        return {
+            "old_root": self.old.keys[0] if len(self.old) else None,
+            "new_root": self.new.keys[0] if len(self.new) else None,
+            "old_packages": len(self.old_versions),
+            "new_packages": len(self.new_versions),
+            "identical_nodes": sum(self.new_shared),
+            "changed_names": len(self.dirty),
+            **{name: len(values) for name, values in changes.items()}
+        }
+
+    def node_change(self, name):
+        old, new = self.old_versions.get(name), self.new_versions.get(name)
+        if old is None and new is None:
+            return CHANGE_NONE
+        if old is None:
+            return CHANGE_ADDED
+        if new is None:
+            return CHANGE_REMOVED
+        return CHANGE_UPGRADED if old != new else CHANGE_NONE
+
+    def render_graph(self):
+        # Граф для вывода: узел на имя пакета, от корня по измененным именам; цели,
+        # поддеревья которых совпали, остаются листьями. Возвращает граф и изменения
+        # узлов и ребер (ребра - в порядке CSR) для RenderInput.
+        root_graph = self.new if len(self.new) else self.old
+        if not len(root_graph):
+            return CompactGraph([], array('I', [0]), array('I'), array('I'), [], {}, bytearray()), \
+                bytearray(), bytearray()
+
+        index = {}
+        names = []
+
+        def intern(name):
+            node = index.get(name)
+            if node is None:
+                node = index[name] = len(names)
+                names.append(name)
+            return node
+
+        intern(root_graph.names[0])
+        offsets = array('I', [0])
+        targets = array('I')
+        edge_specs = array('I')
+        edge_changes = bytearray()
+        specs = []
+        spec_index = {}
+        errors = {}
+        expanded = bytearray()
+
+        old_edges, new_edges = self.old_edges, self.new_edges
+        node = 0
+        while node < len(names):
+            name = names[node]
+            old_dependencies = old_edges.get(name)
+            new_dependencies = new_edges.get(name)
+            if old_dependencies is None and new_dependencies is None:
+                expanded.append(0)
+                offsets.append(len(targets))
+                node += 1
+                continue
+
+            expanded.append(1)
+            old_dependencies = old_dependencies or {}
+            new_dependencies = new_dependencies or {}
+            for dependency in dict.fromkeys(chain(new_dependencies, old_dependencies)):
+                old_entry = old_dependencies.get(dependency)
+                new_entry = new_dependencies.get(dependency)
+                if old_entry is None:
+                    change = CHANGE_ADDED
+                elif new_entry is None:
+                    change = CHANGE_REMOVED
+                else:
+                    change = CHANGE_UPGRADED if old_entry[1] != new_entry[1] else CHANGE_NONE
+                spec = (new_entry or old_entry)[0]
+                spec_id = spec_index.get(spec)
+                if spec_id is None:
+                    spec_id = spec_index[spec] = len(specs)
+                    specs.append(spec)
+                targets.append(intern(dependency))
+                edge_specs.append(spec_id)
+                edge_changes.append(change)
+            offsets.append(len(targets))
+            node += 1
+
+        # Ошибка загрузки - из нового графа, а для удаленных пакетов - из старого
+        for graph in (self.new, self.old):
+            for error_node, message in graph.errors.items():
+                merged = index.get(graph.names[error_node])
+                if merged is not None and (graph is self.new or names[merged] not in self.new_versions):
+                    errors.setdefault(merged, message)
+                    expanded[merged] = 0
+
+        keys = []
+        node_changes = bytearray(len(names))
+        for node, name in enumerate(names):
+            change = node_changes[node] = self.node_change(name)
+            old, new = self.old_versions.get(name), self.new_versions.get(name)
+            if change == CHANGE_UPGRADED:
+                version = f"{describe_versions(old)} -> {describe_versions(new)}"
+            else:
+                versions = new or old
+                version = describe_versions(versions) if versions and any(versions) else None
+            keys.append(format_package_key(name, version))
+
+        graph = CompactGraph(keys, offsets, targets, edge_specs, specs, errors, expanded)
+        return graph, node_changes, edge_changes
+
@@ -0,0 +1,257 @@
+import json
+import struct
+import sys
+from array import array
+from compact_graph import split_package_key
+from render_pipeline import (BINARY_FORMATS, CHANGE_NAMES, NODE_ERROR, NODE_EXPANDED, as_render_input, atomic_open,
+                             escape)
+
+
+# Расширение выходного файла -> формат выгрузки
+EXPORT_FORMATS = {
+    '.jsonl': 'jsonl',
+    '.graphml': 'graphml',
+    '.dot': 'dot',
+    '.gv': 'dot',
+    '.edges': 'edges'
+}
+
+EDGE_LIST_MAGIC = b'DVEL'
+EDGE_LIST_VERSION = 1
+
+
+# Потоковые выгрузки графа для внешних инструментов. Узлы и ребра пишутся в файл
+# по одному, документ целиком в памяти не собирается. Писатели получают
+# RenderInput (render_pipeline): имена, версии и источники ребер уже посчитаны
+# один раз на граф для всех форматов. Строки диапазонов интернированы в
+# graph.specs, поэтому экранируются один раз на строку.
+def export_graph(graph, filename, export_format):
+    with atomic_open(filename, export_format in BINARY_FORMATS) as f:
+        EXPORTERS[export_format](as_render_input(graph), f)
+    return filename
+
+
+def _jsonl_node(node, key, name, version, state, error):
+    record = {"type": "node", "id": node, "key": key, "name": name, "version": version,
+              "expanded": state == NODE_EXPANDED}
+    if state == NODE_ERROR:
+        record["error"] = error
+    return record
+
+
+def write_jsonl(render, f):
+    # JSON Lines: сначала узлы, затем ребра, по объекту в строке. У графа сравнения
+    # версий у узлов и ребер есть поле "change" (added, removed, upgraded, unchanged)
+    graph = render.graph
+    names, versions, states = render.names, render.versions, render.states
+    node_changes, edge_changes = render.node_changes, render.edge_changes
+    errors = graph.errors
+    for node, key in enumerate(graph.keys):
+        record = _jsonl_node(node, key, names[node], versions[node], states[node], errors.get(node))
+        if node_changes is not None:
+            record["change"] = CHANGE_NAMES[node_changes[node]]
+        f.write(json.dumps(record, ensure_ascii=False))
+        f.write('\n')
+
+    specs = [json.dumps(spec, ensure_ascii=False) for spec in graph.specs]
+    if edge_changes is not None:
+        for (source, target, spec), change in zip(render.edges(), edge_changes):
+            f.write(f'{{"type": "edge", "source": {source}, "target": {target}, "range": {specs[spec]}, '
+                    f'"change": "{CHANGE_NAMES[change]}"}}\n')
+        return
+    for source, target, spec in render.edges():
+        f.write(f'{{"type": "edge", "source": {source}, "target": {target}, "range": {specs[spec]}}}\n')
+
+
+GRAPHML_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                  '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                  '  <key id="key" for="node" attr.name="key" attr.type="string"/>\n'
+                  '  <key id="name" for="node" attr.name="name" attr.type="string"/>\n'
+                  '  <key id="version" for="node" attr.name="version" attr.type="string"/>\n'
+                  '  <key id="expanded" for="node" attr.name="expanded" attr.type="boolean"/>\n'
+                  '  <key id="error" for="node" attr.name="error" attr.type="string"/>\n'
+                  '  <key id="range" for="edge" attr.name="range" attr.type="string"/>\n'
+                  '  <graph id="dependencies" edgedefault="directed">\n')
+GRAPHML_FOOTER = '  </graph>\n</graphml>\n'
+
+
+def _graphml_node(node, key, name, version, state, error):
+    parts = [f'    <node id="n{node}"><data key="key">{escape(key)}</data><data key="name">{escape(name)}</data>']
+    if version:
+        parts.append(f'<data key="version">{escape(version)}</data>')
+    parts.append(f'<data key="expanded">{"true" if state == NODE_EXPANDED else "false"}</data>')
+    if state == NODE_ERROR:
+        parts.append(f'<data key="error">{escape(error)}</data>')
+    parts.append('</node>\n')
+    return ''.join(parts)
+
+
+def write_graphml(render, f):
+    graph = render.graph
+    names, versions, states = render.names, render.versions, render.states
+    errors = graph.errors
+    f.write(GRAPHML_HEADER)
+    for node, key in enumerate(graph.keys):
+        f.write(_graphml_node(node, key, names[node], versions[node], states[node], errors.get(node)))
+
+    specs = [escape(spec) for spec in graph.specs]
+    for source, target, spec in render.edges():
+        f.write(f'    <edge source="n{source}" target="n{target}"><data key="range">{specs[spec]}</data></edge>\n')
+    f.write(GRAPHML_FOOTER)
+
+
+def _dot_string(text):
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+
+DOT_HEADER = ('digraph dependencies {\n'
+              '  node [shape=box, style="rounded,filled", fillcolor="#e3f2fd", fontname="Arial"];\n'
+              '  edge [fontname="Arial", fontsize=9];\n')
+
+
+def _dot_node(node, key, state, error):
+    attributes = f'label={_dot_string(key)}'
+    if state == NODE_ERROR:
+        attributes += f', fillcolor="#ffebee", tooltip={_dot_string(error)}'
+    elif state != NODE_EXPANDED:
+        attributes += ', fillcolor="#f5f5f5"'
+    return f'  n{node} [{attributes}];\n'
+
+
+def write_dot(render, f):
+    graph, states = render.graph, render.states
+    errors = graph.errors
+    f.write(DOT_HEADER)
+    for node, key in enumerate(graph.keys):
+        f.write(_dot_node(node, key, states[node], errors.get(node)))
+
+    specs = [_dot_string(spec) for spec in graph.specs]
+    for source, target, spec in render.edges():
+        f.write(f'  n{source} -> n{target} [label={specs[spec]}];\n')
+
+    f.write('}\n')
+
+
+def _write_edge_list_keys(f, keys):
+    for key in keys:
+        encoded = key.encode('utf-8')[:0xFFFF]
+        f.write(struct.pack('<H', len(encoded)))
+        f.write(encoded)
+
+
+def write_edge_list(render, f):
+    # Двоичный список ребер (little-endian):
+    #   "DVEL", u32 версия, u32 число узлов, u32 число ребер;
+    #   узлы: u16 длина + ключ в UTF-8;
+    #   ребра: пары u32 (источник, цель), узел 0 - корень
+    graph = render.graph
+    f.write(EDGE_LIST_MAGIC)
+    f.write(struct.pack('<III', EDGE_LIST_VERSION, len(graph), graph.edge_count))
+    _write_edge_list_keys(f, graph.keys)
+
+    # Источники ребер уже разложены в RenderInput, пары собираются двумя срезами
+    pairs = array('I', bytes(8 * len(render.sources)))
+    pairs[0::2] = render.sources
+    pairs[1::2] = graph.targets
+    if sys.byteorder == 'big':
+        pairs.byteswap()
+    f.write(pairs.tobytes())
+
+
+def read_edge_list(f):
+    # Обратное чтение двоичного списка ребер: (ключи узлов, array пар источник/цель)
+    if f.read(4) != EDGE_LIST_MAGIC:
+        raise ValueError("не двоичный список ребер")
+    version, node_count, edge_count = struct.unpack('<III', f.read(12))
+    if version != EDGE_LIST_VERSION:
+        raise ValueError(f"неподдерживаемая версия {version}")
+
+    keys = []
+    for _ in range(node_count):
+        length, = struct.unpack('<H', f.read(2))
+        keys.append(f.read(length).decode('utf-8'))
+
+    pairs = array('I')
+    pairs.frombytes(f.read(edge_count * 2 * pairs.itemsize))
+    if sys.byteorder == 'big':
+        pairs.byteswap()
+    return keys, pairs
+
+
+EXPORTERS = {
+    'jsonl': write_jsonl,
+    'graphml': write_graphml,
+    'dot': write_dot,
+    'edges': write_edge_list
+}
+
+
+# Те же форматы из GraphStore (обход с --memory-limit): узлы и ребра читаются из
+# файлов хранилища потоком, вывод байт в байт совпадает с выгрузкой CompactGraph
+# того же обхода
+def export_store(store, filename, export_format):
+    with atomic_open(filename, export_format in BINARY_FORMATS) as f:
+        STORE_EXPORTERS[export_format](store, f)
+    return filename
+
+
+def _store_nodes(store):
+    # (узел, ключ, имя, версия, состояние, ошибка)
+    for node, key, state, error in store.iter_nodes():
+        name, version = split_package_key(key)
+        yield node, key, name, version, state, error
+
+
+def stream_jsonl(store, f):
+    for record in _store_nodes(store):
+        f.write(json.dumps(_jsonl_node(*record), ensure_ascii=False))
+        f.write('\n')
+
+    specs = [json.dumps(spec, ensure_ascii=False) for spec in store.specs]
+    for source, target, spec in store.iter_edges():
+        f.write(f'{{"type": "edge", "source": {source}, "target": {target}, "range": {specs[spec]}}}\n')
+
+
+def stream_graphml(store, f):
+    f.write(GRAPHML_HEADER)
+    for record in _store_nodes(store):
+        f.write(_graphml_node(*record))
+
+    specs = [escape(spec) for spec in store.specs]
+    for source, target, spec in store.iter_edges():
+        f.write(f'    <edge source="n{source}" target="n{target}"><data key="range">{specs[spec]}</data></edge>\n')
+    f.write(GRAPHML_FOOTER)
+
+
+def stream_dot(store, f):
+    f.write(DOT_HEADER)
+    for node, key, state, error in store.iter_nodes():
+        f.write(_dot_node(node, key, state, error))
+
+    specs = [_dot_string(spec) for spec in store.specs]
+    for source, target, spec in store.iter_edges():
+        f.write(f'  n{source} -> n{target} [label={specs[spec]}];\n')
+
+    f.write('}\n')
+
+
+def stream_edge_list(store, f):
+    f.write(EDGE_LIST_MAGIC)
+    f.write(struct.pack('<III', EDGE_LIST_VERSION, store.node_count, store.edge_count))
+    _write_edge_list_keys(f, (key for _, key, _, _ in store.iter_nodes()))
+
+    for chunk in store.iter_edge_chunks():
+        pairs = array('I', bytes(8 * (len(chunk) // 3)))
+        pairs[0::2] = chunk[0::3]
+        pairs[1::2] = chunk[1::3]
+        if sys.byteorder == 'big':
+            pairs.byteswap()
+        f.write(pairs.tobytes())
+
+
+STORE_EXPORTERS = {
+    'jsonl': stream_jsonl,
+    'graphml': stream_graphml,
+    'dot': stream_dot,
+    'edges': stream_edge_list
+}
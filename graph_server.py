@@ -0,0 +1,292 @@
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from config import DEFAULT_SERVE_ADDRESS, DEFAULT_SERVE_MAX_NODES, parse_address
+from errors import DependencyVisualizerError, ValidationError
+from graph_builder import DependencyGraphBuilder
+from reverse_index import ReverseDependencyIndex
+from simple_visualizer import LAYOUTS, SimpleGraphVisualizer
+
+RENDER_TYPES = {
+    'svg': 'image/svg+xml; charset=utf-8',
+    'plantuml': 'text/plain; charset=utf-8',
+    'text': 'text/plain; charset=utf-8'
+}
+
+
+class _GraphEntry:
+    __slots__ = ('graph', 'built', 'reverse_index', 'statistics', 'renders')
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.built = time.monotonic()
+        self.reverse_index = None
+        self.statistics = None
+        self.renders = {}
+
+
+# Локальный сервер (--serve): коллектор с его кэшем, память поддеревьев и
+# построенные графы живут в процессе между запросами. Графы хранятся в LRU по
+# ключу (пакет, версия, фильтр, глубина) с ограничением на суммарное число
+# узлов; одинаковые запросы, пришедшие во время обхода, ждут этот же обход.
+# Граф старше ttl секунд (--cache-ttl) строится заново, как и пакеты коллектора.
+#
+# GET /health
+# GET /dependencies?package=P[&version=V&depth=N&filter=S]
+# GET /stats?package=P[...]
+# GET /reverse?root=R&target=T[&limit=N&...]   прямые и транзитивные зависимые, пути от корня
+# GET /paths?root=R&target=T[&limit=N&...]
+# GET /render?package=P&format=svg|plantuml|text[&layout=layered|stress...]
+# POST /reset                                   сбросить графы, память поддеревьев и пакетов коллектора
+class GraphService:
+    def __init__(self, data_collector, jobs=1, max_depth=3, max_nodes=DEFAULT_SERVE_MAX_NODES, memo=None,
+                 profiler=None, pruning=None, ttl=None):
+        self.data_collector = data_collector
+        self.jobs = jobs
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.memo = memo
+        self.profiler = profiler
+        self.pruning = pruning
+        self.ttl = ttl
+
+        self.nodes = 0
+        self.crawls = 0
+        self.hits = 0
+        self.shared = 0
+        self._graphs = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def entry(self, package, version=None, filter_substring=None, max_depth=None):
+        key = (package, version, filter_substring, max_depth or self.max_depth)
+        with self._lock:
+            entry = self._graphs.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry.built > self.ttl:
+                del self._graphs[key]
+                self.nodes -= len(entry.graph)
+                entry = None
+            if entry is not None:
+                self._graphs.move_to_end(key)
+                self.hits += 1
+                return entry
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.shared += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            # Свой построитель на обход: статистика отсечения у каждого обхода своя
+            builder = DependencyGraphBuilder(self.data_collector, self.jobs, self.profiler,
+                                             pruning=self.pruning, memo=self.memo)
+            entry = _GraphEntry(builder.build_compact_graph(*key))
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[key]
+            self.crawls += 1
+            self._store(key, entry)
+        future.set_result(entry)
+        return entry
+
+    def _store(self, key, entry):
+        previous = self._graphs.pop(key, None)
+        if previous is not None:
+            self.nodes -= len(previous.graph)
+        self._graphs[key] = entry
+        self.nodes += len(entry.graph)
+        # Последний граф остается, даже если он один больше ограничения
+        while self.nodes > self.max_nodes and len(self._graphs) > 1:
+            _, evicted = self._graphs.popitem(last=False)
+            self.nodes -= len(evicted.graph)
+
+    def reset(self):
+        with self._lock:
+            self._graphs.clear()
+            self.nodes = 0
+        if self.memo is not None:
+            self.memo.clear()
+        self.data_collector.clear()
+
+    def health(self):
+        with self._lock:
+            status = {
+                "graphs": len(self._graphs),
+                "nodes": self.nodes,
+                "max_nodes": self.max_nodes,
+                "crawls": self.crawls,
+                "hits": self.hits,
+                "shared_crawls": self.shared,
+                "inflight": len(self._inflight)
+            }
+        if self.memo is not None:
+            status["memo"] = self.memo.stats()
+        return status
+
+    def dependencies(self, entry):
+        graph = entry.graph
+        return {
+            "root": graph.keys[0] if len(graph) else None,
+            "packages": len(graph.fetched_nodes()),
+            "dependencies": graph.edge_count,
+            "graph": graph.to_dict()
+        }
+
+    def statistics(self, entry):
+        if entry.statistics is None:
+            entry.statistics = DependencyGraphBuilder(None).get_graph_statistics(entry.graph)
+        return entry.statistics
+
+    def reverse(self, entry, target, limit):
+        index = self._reverse_index(entry)
+        keys = entry.graph.keys
+        return {
+            "target": target,
+            "direct": sorted(keys[node] for node in index.direct_dependents(target)),
+            "transitive": [keys[node] for node in index.transitive_dependents(target)],
+            "paths": self._paths(entry, index, target, limit)
+        }
+
+    def paths(self, entry, target, limit):
+        return {"target": target, "paths": self._paths(entry, self._reverse_index(entry), target, limit)}
+
+    def render(self, entry, output_format, title, layout='layered'):
+        # Документ строится один раз на граф, формат и раскладку
+        document = entry.renders.get((output_format, layout))
+        if document is None:
+            visualizer = SimpleGraphVisualizer(self.profiler, layout)
+            document = entry.renders[(output_format, layout)] = visualizer.render(entry.graph, output_format, title)
+        return document
+
+    @staticmethod
+    def _reverse_index(entry):
+        if entry.reverse_index is None:
+            entry.reverse_index = ReverseDependencyIndex(entry.graph)
+        return entry.reverse_index
+
+    @staticmethod
+    def _paths(entry, index, target, limit):
+        keys = entry.graph.keys
+        return [[keys[node] for node in path] for path in index.paths(target, limit)]
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    service = None
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        started = time.perf_counter()
+        url = urlparse(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            status, content_type, body = self._route(url.path, query)
+        except ValidationError as e:
+            status, content_type, body = 400, *self._json({"error": str(e)})
+        except DependencyVisualizerError as e:
+            status, content_type, body = 502, *self._json({"error": str(e)})
+        except Exception as e:
+            status, content_type, body = 500, *self._json({"error": f"Неожиданная ошибка: {e}"})
+        self._send(status, content_type, body)
+        print(f" {self.command} {self.path} {status} {(time.perf_counter() - started) * 1000:.1f} мс")
+
+    def do_POST(self):
+        if urlparse(self.path).path == '/reset':
+            self.service.reset()
+            self._send(200, *self._json({"reset": True}))
+        else:
+            self._send(404, *self._json({"error": f"Неизвестный адрес: {self.path}"}))
+
+    def _route(self, path, query):
+        service = self.service
+        if path == '/health':
+            return 200, *self._json(service.health())
+
+        if path in ('/reverse', '/paths'):
+            target = self._required(query, 'target')
+            entry = self._entry(query, 'root')
+            limit = self._number(query, 'limit', 10)
+            if path == '/reverse':
+                return 200, *self._json(service.reverse(entry, target, limit))
+            return 200, *self._json(service.paths(entry, target, limit))
+
+        if path == '/dependencies':
+            return 200, *self._json(service.dependencies(self._entry(query, 'package')))
+        if path == '/stats':
+            return 200, *self._json(service.statistics(self._entry(query, 'package')))
+        if path == '/render':
+            output_format = query.get('format', 'svg')
+            if output_format not in RENDER_TYPES:
+                raise ValidationError(f"Формат должен быть одним из: {', '.join(RENDER_TYPES)}")
+            layout = query.get('layout', 'layered')
+            if layout not in LAYOUTS:
+                raise ValidationError(f"Раскладка должна быть одной из: {', '.join(LAYOUTS)}")
+            entry = self._entry(query, 'package')
+            document = service.render(entry, output_format, f"Зависимости {query['package']}", layout)
+            return 200, RENDER_TYPES[output_format], document.encode('utf-8')
+
+        return 404, *self._json({"error": f"Неизвестный адрес: {path}"})
+
+    def _entry(self, query, field):
+        return self.service.entry(self._required(query, field), query.get('version'), query.get('filter'),
+                                  self._number(query, 'depth', None))
+
+    @staticmethod
+    def _required(query, field):
+        value = query.get(field)
+        if not value:
+            raise ValidationError(f"Не указан параметр {field}")
+        return value
+
+    @staticmethod
+    def _number(query, field, default):
+        value = query.get(field)
+        if value is None:
+            return default
+        if not value.isdigit() or int(value) < 1:
+            raise ValidationError(f"Параметр {field} должен быть положительным числом")
+        return int(value)
+
+    @staticmethod
+    def _json(data):
+        return 'application/json; charset=utf-8', json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Каждый запрос уже выводится в do_GET с временем ответа
+        pass
+
+
+def serve(service, address=DEFAULT_SERVE_ADDRESS):
+    host, port = parse_address(address)
+    handler = type('RequestHandler', (_RequestHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"\n Сервер запущен: http://{host}:{server.server_address[1]}/ (Ctrl-C - остановить)")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n Сервер остановлен")
+    finally:
+        server.server_close()
@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from compact_graph import format_package_key, split_package_key
+from errors import PackageDataError
+
+SNAPSHOT_FORMAT = 1
+
+
+# Снимок построенного графа: параметры обхода, узлы с зависимостями (у каждого
+# ребра - диапазон и ключ узла, к которому он разрешился) и признаки свежести
+# пакетов. По снимку следующий запуск (--since) загружает только изменившееся.
+#
+# {"format": 1, "root": {"name", "version", "key"}, "registry", "filter",
+#  "max_depth", "prune" (правила отсечения), "created",
+#  "packages": {имя: {"etag", "last_modified", "modified"} или {"digest"}},
+#  "nodes": {ключ: {"dependencies": {имя: [диапазон, ключ цели]}} или {"error": текст}}}
+def snapshot_from_graph(graph, collector, root_package, root_version=None, registry=None,
+                        filter_substring=None, max_depth=None, pruning=None):
+    keys = graph.keys
+    nodes = {}
+
+    for node in graph.fetched_nodes():
+        if node in graph.errors:
+            nodes[keys[node]] = {"error": graph.errors[node]}
+        else:
+            nodes[keys[node]] = {
+                "dependencies": {graph.names[target]: [spec, keys[target]] for target, spec in graph.edges(node)}
+            }
+
+    validators = getattr(collector, 'validators', {})
+    packages = {}
+    for key in nodes:
+        name = split_package_key(key)[0]
+        if name in validators:
+            packages[name] = validators[name]
+
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "root": {"name": root_package, "version": root_version, "key": keys[0] if keys else None},
+        "registry": registry,
+        "filter": filter_substring,
+        "max_depth": max_depth,
+        "prune": pruning,
+        "created": time.time(),
+        "packages": packages,
+        "nodes": nodes
+    }
+
+
+def save_snapshot(path, snapshot):
+    temporary = f"{path}.tmp"
+    try:
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temporary, path)
+    except OSError as e:
+        raise PackageDataError(f"Не удалось сохранить снимок {path}: {e}")
+    return path
+
+
+def load_snapshot(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        raise PackageDataError(f"Снимок не найден: {path}")
+    except (OSError, json.JSONDecodeError) as e:
+        raise PackageDataError(f"Ошибка чтения снимка {path}: {e}")
+
+    if not isinstance(snapshot, dict) or snapshot.get("format") != SNAPSHOT_FORMAT:
+        raise PackageDataError(f"Неподдерживаемый формат снимка: {path}")
+
+    return snapshot
+
+
+def check_freshness(collector, snapshot, jobs=1):
+    # Условные запросы по всем пакетам снимка; возвращает имена неизменившихся.
+    # Ответ 304 не содержит тела, поэтому проверка почти ничего не стоит.
+    packages = snapshot["packages"]
+
+    def check(name):
+        return name, collector.revalidate(name, packages[name])
+
+    if jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(check, packages))
+    else:
+        results = [check(name) for name in packages]
+
+    return {name for name, unchanged in results if unchanged}
+
+
+# Коллектор для инкрементального обхода: для неизменившихся пакетов версия
+# берется из разрешений снимка, а зависимости уже известной версии - из узла
+# снимка (опубликованная версия не меняется). Остальное делегируется коллектору.
+class SnapshotCollector:
+    def __init__(self, collector, snapshot, unchanged):
+        self.collector = collector
+        self.unchanged = unchanged
+        self.previous_validators = {name: validator for name, validator in snapshot["packages"].items()
+                                    if name in unchanged}
+        self.reused = 0
+        self.fetched = 0
+
+        self._lock = threading.Lock()
+        self._dependencies = {}
+        self._resolutions = {}
+
+        nodes = snapshot["nodes"]
+        for key, node in nodes.items():
+            dependencies = node.get("dependencies")
+            if dependencies is None:
+                continue
+            self._dependencies[key] = {name: spec for name, (spec, _) in dependencies.items()}
+            for name, (spec, target) in dependencies.items():
+                if target in nodes:
+                    self._resolutions[(name, spec)] = target
+
+        root = snapshot["root"]
+        if root.get("key") in nodes:
+            self._resolutions[(root["name"], root.get("version"))] = root["key"]
+
+    def resolve_version(self, package_name, spec=None):
+        key = self._resolutions.get((package_name, spec))
+        if key is not None and package_name in self.unchanged:
+            return split_package_key(key)[1] or ''
+        return self.collector.resolve_version(package_name, spec)
+
+    def get_package_dependencies(self, package_name, version=None):
+        dependencies = self._dependencies.get(format_package_key(package_name, version))
+        if dependencies is None:
+            # В тестовом репозитории у пакетов нет версий, ключ узла - просто имя
+            dependencies = self._dependencies.get(package_name)
+        if dependencies is not None and package_name in self.unchanged:
+            with self._lock:
+                self.reused += 1
+            return dict(dependencies)
+
+        with self._lock:
+            self.fetched += 1
+        return self.collector.get_package_dependencies(package_name, version)
+
+    def get_dependencies_by_type(self, package_name, version=None):
+        # В снимке зависимости уже отобраны по тем же правилам отсечения
+        key = format_package_key(package_name, version)
+        if package_name in self.unchanged and (key in self._dependencies or package_name in self._dependencies):
+            return {"dependencies": self.get_package_dependencies(package_name, version)}
+        with self._lock:
+            self.fetched += 1
+        return self.collector.get_dependencies_by_type(package_name, version)
+
+    def filter_dependencies(self, dependencies, filter_substring):
+        return self.collector.filter_dependencies(dependencies, filter_substring)
+
+    @property
+    def validators(self):
+        # Пакеты, взятые из снимка, сохраняют прежние признаки свежести
+        return dict(self.previous_validators, **self.collector.validators)
+
+
+def diff_snapshots(old, new):
+    # Изменения между снимками по именам пакетов: добавленные и удаленные ребра
+    # (пакет -> зависимость) и ребра, цель которых разрешилась в другую версию
+    def edges(snapshot):
+        result = {}
+        for key, node in snapshot["nodes"].items():
+            source = split_package_key(key)[0]
+            for name, (_, target) in node.get("dependencies", {}).items():
+                version = split_package_key(target)[1]
+                result.setdefault((source, name), set()).add(version)
+        return result
+
+    def versions(snapshot):
+        result = {}
+        for key in snapshot["nodes"]:
+            name, version = split_package_key(key)
+            result.setdefault(name, set()).add(version)
+        return result
+
+    old_edges, new_edges = edges(old), edges(new)
+    old_versions, new_versions = versions(old), versions(new)
+
+    def describe(values):
+        return ", ".join(sorted(value or "?" for value in values))
+
+    return {
+        "added_packages": sorted(set(new_versions) - set(old_versions)),
+        "removed_packages": sorted(set(old_versions) - set(new_versions)),
+        "upgraded_packages": [
+            [name, describe(old_versions[name]), describe(new_versions[name])]
+            for name in sorted(set(old_versions) & set(new_versions))
+            if old_versions[name] != new_versions[name]
+        ],
+        "added_edges": [list(edge) for edge in sorted(set(new_edges) - set(old_edges))],
+        "removed_edges": [list(edge) for edge in sorted(set(old_edges) - set(new_edges))],
+        "upgraded_edges": [
+            [source, name, describe(old_edges[(source, name)]), describe(new_edges[(source, name)])]
+            for source, name in sorted(set(old_edges) & set(new_edges))
+            if old_edges[(source, name)] != new_edges[(source, name)]
+        ]
+    }
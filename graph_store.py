@@ -0,0 +1,322 @@
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from array import array
+from compact_graph import format_package_key, package_display_name
+from errors import StoreError
+from render_pipeline import NODE_ERROR, NODE_EXPANDED, NODE_LEAF
+
+# Оценка памяти на запись индекса в словаре сверх длины ключа: объект строки,
+# число и слот словаря. Это оценка, а не замер: лимит соблюдается приблизительно
+ENTRY_OVERHEAD = 200
+
+# Признак цели ребра, которая еще не разрешилась: младшие биты - номер требования
+# в очереди следующего уровня (или в списке листьев за пределами глубины)
+UNRESOLVED = 1 << 31
+
+# Ребер (троек источник, цель, диапазон) в одном чтении и записи файла
+EDGE_CHUNK = 1 << 16
+
+
+def parse_size(text):
+    # "512M", "2G", "800K" или число мегабайт -> байты; ValueError на некорректном
+    text = str(text).strip().upper().rstrip('B')
+    multiplier = 1024 * 1024
+    if text[-1:] in ('K', 'M', 'G'):
+        multiplier = 1024 ** ('KMG'.index(text[-1]) + 1)
+        text = text[:-1]
+    value = float(text)
+    if value <= 0:
+        raise ValueError(text)
+    return int(value * multiplier)
+
+
+# Отображение строка -> номер: словарь в памяти, пока оценка памяти всего
+# хранилища в пределах лимита, затем таблица SQLite в каталоге хранилища
+class SpillIndex:
+    def __init__(self, store, table):
+        self.store = store
+        self.table = table
+        self._memory = {}
+        self._db = None
+
+    def __len__(self):
+        if self._db is None:
+            return len(self._memory)
+        return self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def get(self, key):
+        if self._db is None:
+            return self._memory.get(key)
+        row = self._db.execute(f"SELECT v FROM {self.table} WHERE k = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def add(self, key, value):
+        if self._db is None:
+            self._memory[key] = value
+            self.store.account(len(key) + ENTRY_OVERHEAD)
+        else:
+            self._db.execute(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?)", (key, value))
+
+    def setdefault(self, key, value):
+        if self._db is None:
+            if key not in self._memory:
+                self.add(key, value)
+        else:
+            self._db.execute(f"INSERT OR IGNORE INTO {self.table} VALUES (?, ?)", (key, value))
+
+    def spill(self, db):
+        db.execute(f"CREATE TABLE {self.table} (k TEXT PRIMARY KEY, v INTEGER NOT NULL) WITHOUT ROWID")
+        db.executemany(f"INSERT INTO {self.table} VALUES (?, ?)", self._memory.items())
+        self._memory = {}
+        self._db = db
+
+
+# Хранилище графа для обхода с ограниченной памятью (--memory-limit). Узлы и
+# ребра пишутся в файлы только на дописывание: nodes.jsonl ([ключ, состояние,
+# ошибка] по строке на узел, номер узла - номер строки) и edges.bin (тройки u32
+# источник, цель, номер диапазона в порядке источников, как CSR в CompactGraph).
+# Разрешения требований, ключи узлов и первые узлы по имени лежат в словарях,
+# пока хватает лимита, затем переносятся в SQLite. В памяти остаются только
+# уровень обхода, который сейчас загружается, и строки диапазонов. Статистика и
+# выгрузки читают файлы потоком.
+class GraphStore:
+    def __init__(self, memory_limit, directory=None):
+        self.memory_limit = memory_limit
+        self.memory = 0
+        try:
+            self.directory = tempfile.mkdtemp(prefix='dependency-graph-', dir=directory)
+            self._nodes_file = open(os.path.join(self.directory, 'nodes.jsonl'), 'w', encoding='utf-8')
+            self._edges_file = open(os.path.join(self.directory, 'edges.bin'), 'wb')
+        except OSError as e:
+            raise StoreError(f"Не удалось создать хранилище обхода в {directory or tempfile.gettempdir()}: {e}")
+        self._db = None
+
+        # (имя, диапазон) -> узел; ключ узла -> узел; имя -> первый загруженный узел с этим именем
+        self.requirements = SpillIndex(self, 'requirements')
+        self.nodes = SpillIndex(self, 'nodes')
+        self.names = SpillIndex(self, 'names')
+        self.specs = []
+        self._spec_index = {}
+
+        self.node_count = 0
+        self.fetched_count = 0
+        self.error_count = 0
+        self.with_dependencies = 0
+        self.edge_count = 0
+        self.max_depth = 0
+        self.levels = 0
+
+    @property
+    def spilled(self):
+        return self._db is not None
+
+    def account(self, size):
+        self.memory += size
+        if self.memory > self.memory_limit and self._db is None:
+            self.spill()
+
+    def spill(self):
+        # Индексы переносятся в SQLite одной транзакцией; журнал не нужен, база
+        # живет только до конца прогона
+        try:
+            db = sqlite3.connect(os.path.join(self.directory, 'index.sqlite3'), isolation_level=None)
+            db.execute("PRAGMA journal_mode = OFF")
+            db.execute("PRAGMA synchronous = OFF")
+            db.execute(f"PRAGMA cache_size = -{max(2048, min(self.memory_limit // 4, 256 * 1024 * 1024) // 1024)}")
+            db.execute("BEGIN")
+            for index in (self.requirements, self.nodes, self.names):
+                index.spill(db)
+        except sqlite3.Error as e:
+            raise StoreError(f"Не удалось перенести индексы обхода в {self.directory}: {e}")
+        self._db = db
+        self.memory = sum(len(spec) + ENTRY_OVERHEAD for spec in self.specs)
+
+    @staticmethod
+    def requirement_key(package, spec):
+        return f"{package}\x00{spec if spec is not None else ''}\x00{spec is None:d}"
+
+    def resolution(self, package, spec):
+        return self.requirements.get(self.requirement_key(package, spec))
+
+    def resolve(self, package, spec, node):
+        self.requirements.add(self.requirement_key(package, spec), node)
+
+    def add_node(self, key, error=None, depth=0):
+        # (номер узла, новый ли); загруженный узел раскрыт или с ошибкой
+        node = self.nodes.get(key)
+        if node is not None:
+            return node, False
+        node = self._append_node(key, NODE_ERROR if error is not None else NODE_EXPANDED, error)
+        self.names.setdefault(package_display_name(key), node)
+        self.fetched_count += 1
+        if error is not None:
+            self.error_count += 1
+        self.max_depth = max(self.max_depth, depth)
+        return node, True
+
+    def leaf(self, package, spec):
+        # Цель за пределами глубины - как в CompactGraph.from_dict: узел с точным
+        # ключом, с ключом-именем, первый загруженный узел с этим именем или новый лист
+        node = self.nodes.get(format_package_key(package, spec))
+        if node is None:
+            node = self.nodes.get(package)
+        if node is None:
+            node = self.names.get(package)
+        if node is None:
+            node = self._append_node(package, NODE_LEAF)
+            self.max_depth = max(self.max_depth, self.levels)
+        return node
+
+    def _append_node(self, key, state, error=None):
+        node = self.node_count
+        self.node_count += 1
+        self.nodes.add(key, node)
+        record = [key, state] if error is None else [key, state, error]
+        self._nodes_file.write(json.dumps(record, ensure_ascii=False))
+        self._nodes_file.write('\n')
+        return node
+
+    def spec_id(self, spec):
+        spec = spec if isinstance(spec, str) else str(spec)
+        spec_id = self._spec_index.get(spec)
+        if spec_id is None:
+            spec_id = self._spec_index[spec] = len(self.specs)
+            self.specs.append(spec)
+            self.account(len(spec) + ENTRY_OVERHEAD)
+        return spec_id
+
+    def level_writer(self):
+        return LevelEdges(self)
+
+    def append_edges(self, triples):
+        if sys.byteorder == 'big':
+            triples = array('I', triples)
+            triples.byteswap()
+        triples.tofile(self._edges_file)
+        self.edge_count += len(triples) // 3
+
+    def finish(self):
+        self._nodes_file.flush()
+        self._edges_file.flush()
+        if self._db is not None:
+            self._db.execute("COMMIT")
+            self._db.execute("BEGIN")
+
+    def iter_nodes(self):
+        # (узел, ключ, состояние, ошибка) по порядку номеров
+        self.finish()
+        with open(self._nodes_file.name, 'r', encoding='utf-8') as f:
+            for node, line in enumerate(f):
+                record = json.loads(line)
+                yield node, record[0], record[1], record[2] if len(record) > 2 else None
+
+    def iter_edge_chunks(self):
+        # Ребра пачками: array('I') троек источник, цель, номер диапазона
+        self.finish()
+        with open(self._edges_file.name, 'rb') as f:
+            while True:
+                chunk = array('I')
+                try:
+                    chunk.fromfile(f, EDGE_CHUNK * 3)
+                except EOFError:
+                    pass
+                if not chunk:
+                    return
+                if sys.byteorder == 'big':
+                    chunk.byteswap()
+                yield chunk
+
+    def iter_edges(self):
+        for chunk in self.iter_edge_chunks():
+            yield from zip(chunk[0::3], chunk[1::3], chunk[2::3])
+
+    def statistics(self):
+        # Статистика потоком по файлу ребер; циклы и длиннейший путь требуют всего
+        # графа в памяти и здесь не считаются
+        fan_in = array('I', [0]) * self.node_count
+        for chunk in self.iter_edge_chunks():
+            for target in chunk[1::3]:
+                fan_in[target] += 1
+        most_depended = max(range(self.node_count), key=fan_in.__getitem__) if self.node_count else None
+        most_depended_key = None
+        if most_depended is not None:
+            for node, key, _, _ in self.iter_nodes():
+                if node == most_depended:
+                    most_depended_key = key
+                    break
+
+        return {
+            "total_packages": self.fetched_count,
+            "total_dependencies": self.edge_count,
+            "with_dependencies": self.with_dependencies,
+            "errors": self.error_count,
+            "leaves": self.node_count - self.fetched_count,
+            "max_depth": self.max_depth,
+            "most_depended": (most_depended_key, fan_in[most_depended] if most_depended is not None else 0),
+            "spilled": self.spilled,
+            "index_entries": len(self.requirements) + len(self.nodes) + len(self.names),
+            "disk_bytes": self.disk_usage()
+        }
+
+    def disk_usage(self):
+        self.finish()
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.is_file())
+
+    def close(self):
+        for f in (self._nodes_file, self._edges_file):
+            f.close()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+# Ребра одного уровня обхода. Цели, которые разрешатся только после загрузки
+# следующего уровня, записываются с признаком UNRESOLVED во временный файл
+# уровня; resolve() подставляет узлы и дописывает ребра в edges.bin по порядку.
+class LevelEdges:
+    def __init__(self, store):
+        self.store = store
+        self.path = os.path.join(store.directory, 'level.bin')
+        self._file = open(self.path, 'wb')
+        self._buffer = array('I')
+        self.unresolved = 0
+
+    def add(self, source, target, spec_id):
+        buffer = self._buffer
+        buffer.append(source)
+        buffer.append(target)
+        buffer.append(spec_id)
+        if len(buffer) >= EDGE_CHUNK * 3:
+            buffer.tofile(self._file)
+            self._buffer = array('I')
+
+    def add_unresolved(self, source, index, spec_id):
+        self.unresolved += 1
+        self.add(source, UNRESOLVED | index, spec_id)
+
+    def resolve(self, targets):
+        # targets - узел для каждого номера неразрешенного требования
+        self._buffer.tofile(self._file)
+        self._file.close()
+        mask = UNRESOLVED - 1
+        with open(self.path, 'rb') as f:
+            while True:
+                chunk = array('I')
+                try:
+                    chunk.fromfile(f, EDGE_CHUNK * 3)
+                except EOFError:
+                    pass
+                if not chunk:
+                    break
+                if self.unresolved:
+                    for position in range(1, len(chunk), 3):
+                        target = chunk[position]
+                        if target & UNRESOLVED:
+                            chunk[position] = targets[target & mask]
+                self.store.append_edges(chunk)
+        os.remove(self.path)
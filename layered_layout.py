@@ -0,0 +1,391 @@
+from array import array
+from itertools import chain as chain_iterables
+
+CHAR_WIDTH = 7
+NODE_HEIGHT = 30
+NODE_PADDING = 20
+MIN_NODE_WIDTH = 60
+DUMMY_WIDTH = 0
+
+# Слои меньше этого считаются поэлементно: на коротких слоях накладные расходы
+# вызовов NumPy больше выигрыша
+VECTOR_MIN_LAYER = 32
+
+_numpy = None
+
+
+def numpy_module():
+    # NumPy - необязательная зависимость: импортируется при первой раскладке, а без
+    # него раскладка считается поэлементно на чистом Python
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+def node_width(name):
+    return max(MIN_NODE_WIDTH, len(name) * CHAR_WIDTH + NODE_PADDING)
+
+
+# Послойная раскладка графа (метод Сугиямы): разрыв циклов, назначение слоев,
+# фиктивные узлы на длинных ребрах, упорядочивание внутри слоев по барицентрам
+# и расстановка координат. Вершины раскладки - узлы графа (0..n-1) и фиктивные
+# узлы (n..), через которые проходят ломаные длинных ребер.
+#
+# С NumPy барицентры, выравнивание координат и концы ребер считаются массивами
+# по целому слою (vectorized=False - всегда поэлементно). Порядок вершин в слоях
+# от этого не меняется: барицентры целых позиций складываются в том же порядке
+# и совпадают до бита; координаты могут отличаться в последних знаках.
+class LayeredLayout:
+    clip = 'vertical'
+
+    def __init__(self, graph, layer_spacing=100, node_spacing=20, sweeps=4, margin=40, vectorized=None):
+        self.graph = graph
+        self.layer_spacing = layer_spacing
+        self.node_spacing = node_spacing
+        self.sweeps = sweeps
+        self.margin = margin
+        self.numpy = numpy_module() if vectorized is not False else None
+
+        self.node_count = len(graph)
+        self.layer = array('I')
+        self.width = []
+        self.x = array('d')
+        self.y = array('d')
+        self.layers = []
+        self.routes = []
+        self.route_vertices = array('I')
+        self.route_starts = array('I', [0])
+        self.back = bytearray()
+        self.total_width = 0
+        self.total_height = 0
+
+        self._rank = None
+        self._order = []
+        self._up = []
+        self._down = []
+        self._adjacency = {}
+
+    def compute(self):
+        dag_edges = self._break_cycles()
+        self._assign_layers(dag_edges)
+        self._insert_dummies(dag_edges)
+        self._order_layers()
+        self._assign_coordinates()
+        return self
+
+    @property
+    def dummy_count(self):
+        return len(self.layer) - self.node_count
+
+    def _break_cycles(self):
+        # Узлы упорядочиваются по компонентам сильной связности в топологическом
+        # порядке, внутри цикла - по глубине от корня. Ребра против этого порядка
+        # (обратные ребра циклов) разворачиваются, петли на себя отбрасываются.
+        graph = self.graph
+        analysis = graph.analysis()
+        component_count = len(analysis.components)
+        unreachable = self.node_count
+
+        def order_key(node):
+            depth = analysis.depth[node]
+            return (component_count - analysis.component[node], depth if depth >= 0 else unreachable, node)
+
+        rank = array('I', [0]) * self.node_count
+        for position, node in enumerate(sorted(range(self.node_count), key=order_key)):
+            rank[node] = position
+
+        dag_edges = {}
+        for source in range(self.node_count):
+            for target in graph.successors(source):
+                if source == target:
+                    continue
+                if rank[source] < rank[target]:
+                    dag_edges.setdefault((source, target), False)
+                else:
+                    dag_edges.setdefault((target, source), True)
+
+        self._rank = rank
+        return dag_edges
+
+    def _assign_layers(self, dag_edges):
+        # Слой узла - длиннейший путь до него от истоков; ребра после разрыва циклов
+        # идут только вперед по rank, поэтому хватает одного прохода в порядке rank
+        successors = [[] for _ in range(self.node_count)]
+        in_degree = array('I', [0]) * self.node_count
+        for source, target in dag_edges:
+            successors[source].append(target)
+            in_degree[target] += 1
+
+        layer = array('I', [0]) * self.node_count
+        order = sorted(range(self.node_count), key=self._rank.__getitem__)
+        for node in order:
+            next_layer = layer[node] + 1
+            for target in successors[node]:
+                if layer[target] < next_layer:
+                    layer[target] = next_layer
+
+        # Узел, у которого исходящих ребер больше, чем входящих, опускается вплотную
+        # к своим зависимостям: исходящие ребра укорачиваются сильнее, чем удлиняются
+        # входящие, и фиктивных узлов на длинных ребрах становится меньше
+        for node in reversed(order):
+            targets = successors[node]
+            if len(targets) > in_degree[node]:
+                lowest = min(layer[target] for target in targets) - 1
+                if lowest > layer[node]:
+                    layer[node] = lowest
+
+        self.layer = layer
+        self._order = order
+
+    def _insert_dummies(self, dag_edges):
+        layer = self.layer
+        self.width = [node_width(name) for name in self.graph.names]
+        self._up = [[] for _ in range(self.node_count)]
+        self._down = [[] for _ in range(self.node_count)]
+
+        for (source, target), reversed_edge in dag_edges.items():
+            chain = [source]
+            previous = source
+            for dummy_layer in range(layer[source] + 1, layer[target]):
+                dummy = len(layer)
+                layer.append(dummy_layer)
+                self.width.append(DUMMY_WIDTH)
+                self._up.append([previous])
+                self._down.append([])
+                self._down[previous].append(dummy)
+                chain.append(dummy)
+                previous = dummy
+
+            self._down[previous].append(target)
+            self._up[target].append(previous)
+            chain.append(target)
+
+            if reversed_edge:
+                chain.reverse()
+            self.routes.append((chain, reversed_edge))
+            self.route_vertices.extend(chain)
+            self.route_starts.append(len(self.route_vertices))
+            self.back.append(reversed_edge)
+
+        layer_count = max(layer, default=-1) + 1
+        self.layers = [[] for _ in range(layer_count)]
+        # Начальный порядок: узлы в топологическом порядке, затем фиктивные узлы
+        for node in self._order:
+            self.layers[layer[node]].append(node)
+        for dummy in range(self.node_count, len(layer)):
+            self.layers[layer[dummy]].append(dummy)
+
+    def _order_layers(self):
+        # Барицентрический метод: поочередные проходы сверху вниз и снизу вверх,
+        # вершина встает по среднему положению соседей в соседнем слое
+        position = array('d', [0.0]) * len(self.layer)
+        for vertices in self.layers:
+            for index, vertex in enumerate(vertices):
+                position[vertex] = index
+
+        for sweep in range(self.sweeps):
+            if sweep % 2 == 0:
+                layer_range, neighbours = range(1, len(self.layers)), self._up
+            else:
+                layer_range, neighbours = range(len(self.layers) - 2, -1, -1), self._down
+
+            for layer_index in layer_range:
+                vertices = self.layers[layer_index]
+                if self.numpy and len(vertices) >= VECTOR_MIN_LAYER:
+                    self._order_layer_vectorized(vertices, neighbours, position)
+                    continue
+                keys = {}
+                for vertex in vertices:
+                    adjacent = neighbours[vertex]
+                    if adjacent:
+                        keys[vertex] = sum(position[other] for other in adjacent) / len(adjacent)
+                    else:
+                        keys[vertex] = position[vertex]
+
+                vertices.sort(key=lambda vertex: (keys[vertex], position[vertex]))
+                for index, vertex in enumerate(vertices):
+                    position[vertex] = index
+
+    def _order_layer_vectorized(self, vertices, neighbours, position):
+        np = self.numpy
+        positions = np.frombuffer(position, dtype=np.float64)
+        indices = np.array(vertices, dtype=np.intp)
+        keys = self._barycenters(indices, neighbours, positions)
+        indices = indices[np.lexsort((positions[indices], keys))]
+        vertices[:] = indices.tolist()
+        positions[indices] = np.arange(len(indices))
+
+    def _barycenters(self, indices, neighbours, values):
+        # Среднее значение соседей каждой вершины слоя (без соседей - свое значение).
+        # bincount складывает по порядку, как sum() в поэлементной ветке
+        np = self.numpy
+        counts, offsets, flat = self._neighbour_arrays(neighbours)
+        local_counts = counts[indices]
+        segments = np.repeat(np.arange(len(indices)), local_counts)
+        first = np.cumsum(local_counts) - local_counts
+        gathered = flat[np.arange(len(segments)) - np.repeat(first - offsets[indices], local_counts)]
+        sums = np.bincount(segments, weights=values[gathered], minlength=len(indices))
+        own = values[indices]
+        return np.divide(sums, local_counts, out=own, where=local_counts > 0)
+
+    def _neighbour_arrays(self, neighbours):
+        # Списки соседей (_up или _down) в виде CSR: число, смещения, соседи подряд
+        key = id(neighbours)
+        arrays = self._adjacency.get(key)
+        if arrays is None:
+            np = self.numpy
+            counts = np.fromiter(map(len, neighbours), dtype=np.intp, count=len(neighbours))
+            offsets = np.zeros(len(neighbours) + 1, dtype=np.intp)
+            np.cumsum(counts, out=offsets[1:])
+            flat = np.fromiter(chain_iterables.from_iterable(neighbours), dtype=np.intp, count=int(offsets[-1]))
+            arrays = self._adjacency[key] = (counts, offsets, flat)
+        return arrays
+
+    def _assign_coordinates(self):
+        # Сначала плотная расстановка слева направо, затем проходы, подтягивающие
+        # вершины к среднему x соседей без нарушения порядка и зазоров
+        vertex_count = len(self.layer)
+        self.x = array('d', [0.0]) * vertex_count
+        self.y = array('d', [0.0]) * vertex_count
+        if self.numpy:
+            self._assign_coordinates_vectorized()
+            return
+
+        for layer_index, vertices in enumerate(self.layers):
+            cursor = 0.0
+            for vertex in vertices:
+                half = self.width[vertex] / 2
+                self.x[vertex] = cursor + half
+                cursor += self.width[vertex] + self.node_spacing
+                self.y[vertex] = self.margin + 40 + layer_index * self.layer_spacing
+
+        for sweep in range(self.sweeps):
+            if sweep % 2 == 0:
+                layer_range, neighbours = range(1, len(self.layers)), self._up
+            else:
+                layer_range, neighbours = range(len(self.layers) - 2, -1, -1), self._down
+            for layer_index in layer_range:
+                self._align_layer(self.layers[layer_index], neighbours)
+
+        left = min((self.x[vertex] - self.width[vertex] / 2 for vertex in range(vertex_count)), default=0.0)
+        shift = self.margin - left
+        for vertex in range(vertex_count):
+            self.x[vertex] += shift
+
+        right = max((self.x[vertex] + self.width[vertex] / 2 for vertex in range(vertex_count)), default=0.0)
+        self.total_width = right + self.margin
+        self.total_height = self.margin * 2 + 40 + max(len(self.layers) - 1, 0) * self.layer_spacing + NODE_HEIGHT
+
+    def _assign_coordinates_vectorized(self):
+        np = self.numpy
+        x = np.frombuffer(self.x, dtype=np.float64)
+        y = np.frombuffer(self.y, dtype=np.float64)
+        width = np.array(self.width, dtype=np.float64)
+        gap = self.node_spacing
+
+        # Плотная расстановка всех слоев сразу: накопленная сумма ширин по вершинам
+        # подряд минус сумма на начало слоя. Ширины целые, поэтому суммы точные и
+        # совпадают с поэлементными
+        if len(x):
+            indices = np.fromiter(chain_iterables.from_iterable(self.layers), dtype=np.intp, count=len(x))
+            sizes = np.fromiter(map(len, self.layers), dtype=np.intp, count=len(self.layers))
+            before = np.zeros(len(indices) + 1)
+            np.cumsum(width[indices] + gap, out=before[1:])
+            layer_starts = np.repeat(before[np.cumsum(sizes) - sizes], sizes)
+            x[indices] = before[:-1] - layer_starts + width[indices] / 2
+            y[:] = self.margin + 40 + np.frombuffer(self.layer, dtype=np.uint32) * float(self.layer_spacing)
+
+        for sweep in range(self.sweeps):
+            if sweep % 2 == 0:
+                layer_range, neighbours = range(1, len(self.layers)), self._up
+            else:
+                layer_range, neighbours = range(len(self.layers) - 2, -1, -1), self._down
+            for layer_index in layer_range:
+                vertices = self.layers[layer_index]
+                if len(vertices) >= VECTOR_MIN_LAYER:
+                    self._align_layer_vectorized(vertices, neighbours, x, width)
+                else:
+                    self._align_layer(vertices, neighbours)
+
+        if len(x):
+            half = width / 2
+            x += self.margin - float((x - half).min())
+            self.total_width = float((x + half).max()) + self.margin
+        else:
+            self.total_width = self.margin
+        self.total_height = self.margin * 2 + 40 + max(len(self.layers) - 1, 0) * self.layer_spacing + NODE_HEIGHT
+
+    def _align_layer_vectorized(self, vertices, neighbours, x, width):
+        # Те же проходы слева и справа, что в _align_layer: value[i] = max(desired[i],
+        # value[i-1] + step[i]) сводится к накопленному максимуму от desired - cumsum(step)
+        np = self.numpy
+        indices = np.array(vertices, dtype=np.intp)
+        desired = self._barycenters(indices, neighbours, x)
+        half = width[indices] / 2
+        step = np.zeros(len(indices))
+        step[1:] = half[:-1] + self.node_spacing + half[1:]
+        offset = np.cumsum(step)
+        relative = desired - offset
+        from_left = np.maximum.accumulate(relative)
+        from_right = np.minimum.accumulate(relative[::-1])[::-1]
+        x[indices] = (from_left + from_right) / 2 + offset
+
+    def edge_points(self):
+        # Ломаные всех ребер одним набором: (начала ломаных в точках, x точек, y точек).
+        # Концы ребра - на верхней или нижней границе прямоугольника, а не в центре
+        half_height = NODE_HEIGHT / 2
+        starts = self.route_starts
+        if self.numpy and len(self.route_vertices):
+            np = self.numpy
+            vertices = np.frombuffer(self.route_vertices, dtype=np.uint32)
+            px = np.frombuffer(self.x, dtype=np.float64)[vertices]
+            py = np.frombuffer(self.y, dtype=np.float64)[vertices]
+            first = np.frombuffer(starts, dtype=np.uint32)[:-1].astype(np.intp)
+            last = np.frombuffer(starts, dtype=np.uint32)[1:].astype(np.intp) - 1
+            shift = np.where(py[last] >= py[first], half_height, -half_height)
+            py[first] += shift
+            py[last] -= shift
+            return starts, px.tolist(), py.tolist()
+
+        x, y = self.x, self.y
+        px = [x[vertex] for vertex in self.route_vertices]
+        py = [y[vertex] for vertex in self.route_vertices]
+        for route in range(len(starts) - 1):
+            first, last = starts[route], starts[route + 1] - 1
+            direction = 1 if py[last] >= py[first] else -1
+            py[first] += direction * half_height
+            py[last] -= direction * half_height
+        return starts, px, py
+
+    def _align_layer(self, vertices, neighbours):
+        x, width, gap = self.x, self.width, self.node_spacing
+
+        desired = []
+        for vertex in vertices:
+            adjacent = neighbours[vertex]
+            desired.append(sum(x[other] for other in adjacent) / len(adjacent) if adjacent else x[vertex])
+
+        # Проход слева (не левее соседа слева) и справа (не правее соседа справа),
+        # итог - среднее двух вариантов; порядок и зазоры сохраняются
+        from_left = []
+        bound = float('-inf')
+        for vertex, target in zip(vertices, desired):
+            value = max(target, bound + width[vertex] / 2)
+            from_left.append(value)
+            bound = value + width[vertex] / 2 + gap
+
+        from_right = [0.0] * len(vertices)
+        bound = float('inf')
+        for index in range(len(vertices) - 1, -1, -1):
+            vertex = vertices[index]
+            value = min(desired[index], bound - width[vertex] / 2)
+            from_right[index] = value
+            bound = value - width[vertex] / 2 - gap
+
+        for vertex, left_value, right_value in zip(vertices, from_left, from_right):
+            x[vertex] = (left_value + right_value) / 2
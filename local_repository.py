@@ -0,0 +1,190 @@
+import json
+import mmap
+import os
+import re
+import threading
+from errors import PackageDataError, PackageNotFoundError
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Сколько байт файла декодируется за раз при построении индекса
+_WINDOW_SIZE = 1 << 20
+
+
+# Индекс JSON-файла тестового репозитория: имя пакета -> смещения записи в файле.
+# Файл отображается в память и сканируется один раз, запись пакета декодируется
+# только при обращении к ней. При смене mtime или размера индекс строится заново.
+class LocalRepository:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._buffer = None
+        self._index = {}
+
+    def get_entry(self, package_name):
+        signature = self._stat()
+
+        # Срез берется под блокировкой: при перестроении индекса старое отображение закрывается
+        with self._lock:
+            buffer, index = self._refresh(signature)
+            bounds = index.get(package_name)
+            if bounds is None:
+                raise PackageNotFoundError(f"Пакет '{package_name}' не найден в тестовом репозитории")
+            start, end = bounds
+            data = buffer[start:end]
+
+        try:
+            return json.loads(data)
+        except json.JSONDecodeError:
+            raise PackageDataError("Ошибка чтения JSON файла")
+
+    def __contains__(self, package_name):
+        return package_name in self._ensure_index()
+
+    def __len__(self):
+        return len(self._ensure_index())
+
+    def package_names(self):
+        return list(self._ensure_index())
+
+    def _ensure_index(self):
+        signature = self._stat()
+        with self._lock:
+            return self._refresh(signature)[1]
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            raise PackageNotFoundError(f"Файл не найден: {self.path}")
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self, signature):
+        # Вызывается под блокировкой
+        if signature != self._signature:
+            buffer, index = self._build_index(signature[1])
+            if self._buffer is not None:
+                self._buffer.close()
+            self._buffer, self._index = buffer, index
+            self._signature = signature
+        return self._buffer, self._index
+
+    def _build_index(self, size):
+        if size == 0:
+            raise PackageDataError("Ошибка чтения JSON файла")
+
+        with open(self.path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Один проход C-сканером json: значения декодируются и сразу отбрасываются,
+        # в индексе остаются только границы записей. Файл декодируется окнами,
+        # а не целиком, чтобы не держать в памяти его копию
+        try:
+            index = self._scan_entries(_Window(buffer))
+        except ValueError:
+            # Сюда же попадают UnicodeDecodeError и json.JSONDecodeError
+            buffer.close()
+            raise PackageDataError("Ошибка чтения JSON файла")
+        except BaseException:
+            buffer.close()
+            raise
+
+        return buffer, index
+
+    @staticmethod
+    def _scan_entries(window):
+        decoder = json.JSONDecoder()
+        index = {}
+        length = _WINDOW_SIZE
+        window.load(0, length)
+        # None - открывающая скобка объекта еще не прочитана
+        position = None
+
+        while True:
+            try:
+                if position is None:
+                    position, last = LocalRepository._scan_open(window.text)
+                else:
+                    key, start, end, position, last = LocalRepository._scan_member(window.text, position, decoder)
+                    index[key] = (window.offset(start), window.offset(end))
+            except ValueError:
+                if window.complete:
+                    raise
+                # Шаг не поместился в окно: окно сдвигается к его началу, а если
+                # сдвигать некуда (запись длиннее окна) - растет вдвое
+                step = position or 0
+                if step == 0:
+                    length *= 2
+                window.load(window.offset(step), length)
+                position = None if position is None else 0
+                continue
+
+            if last:
+                return index
+
+    @staticmethod
+    def _scan_open(text):
+        position = _WHITESPACE.match(text, 0).end()
+        if text[position:position + 1] != '{':
+            raise ValueError("ожидался объект")
+        position = _WHITESPACE.match(text, position + 1).end()
+
+        if text[position:position + 1] == '}':
+            return position + 1, True
+        if not text[position:position + 1]:
+            raise ValueError("неожиданный конец файла")
+        return position, False
+
+    @staticmethod
+    def _scan_member(text, position, decoder):
+        # "имя": значение, затем ',' или '}'. Возвращает границы значения и позицию за разделителем
+        position = _WHITESPACE.match(text, position).end()
+        if text[position:position + 1] != '"':
+            raise ValueError("ожидалось имя пакета")
+        key, position = json.decoder.scanstring(text, position + 1)
+
+        position = _WHITESPACE.match(text, position).end()
+        if text[position:position + 1] != ':':
+            raise ValueError("ожидалось ':'")
+        position = _WHITESPACE.match(text, position + 1).end()
+
+        start = position
+        _, end = decoder.raw_decode(text, position)
+
+        position = _WHITESPACE.match(text, end).end()
+        separator = text[position:position + 1]
+        if separator not in ('}', ','):
+            raise ValueError("ожидалась ','")
+        return key, start, end, position + 1, separator == '}'
+
+
+# Декодированный кусок отображенного файла: байты [start, end)
+class _Window:
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.size = len(buffer)
+        self.start = self.end = 0
+        self.text = ''
+        self._char = self._byte = 0
+
+    @property
+    def complete(self):
+        return self.end >= self.size
+
+    def load(self, start, length):
+        end = min(start + length, self.size)
+        # Граница окна не должна резать многобайтный символ UTF-8
+        while start < end < self.size and self.buffer[end] & 0xC0 == 0x80:
+            end -= 1
+        self.text = self.buffer[start:end].decode('utf-8')
+        self.start, self.end = start, end
+        self._char, self._byte = 0, start
+
+    def offset(self, position):
+        # Позиция символа в окне -> смещение в байтах файла. Позиции запрашиваются
+        # по возрастанию, поэтому кодируется только текст после предыдущей
+        if len(self.text) == self.end - self.start:
+            return self.start + position
+        self._byte += len(self.text[self._char:position].encode('utf-8'))
+        self._char = position
+        return self._byte
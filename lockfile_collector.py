@@ -0,0 +1,386 @@
+import json
+import os
+from data_collector import NPMDataCollector
+from errors import PackageDataError, PackageNotFoundError
+import npm_semver
+
+NPM_LOCKFILES = ('package-lock.json', 'npm-shrinkwrap.json')
+NPM_DEPENDENCY_FIELDS = ('dependencies', 'optionalDependencies', 'peerDependencies')
+ROOT_DEPENDENCY_FIELDS = ('dependencies', 'devDependencies', 'optionalDependencies')
+
+
+def _split_spec(spec):
+    # "name@range" / "@scope/name@range" -> (name, range)
+    at = spec.find('@', 1)
+    if at < 0:
+        return spec, ''
+    return spec[:at], spec[at + 1:]
+
+
+def _unquote(text):
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in '"\'':
+        return text[1:-1]
+    return text
+
+
+# Сборщик данных из lock-файла (package-lock.json v1/v2/v3, npm-shrinkwrap.json,
+# yarn.lock, pnpm-lock.yaml). Lock-файл разбирается за один проход, версии в нем
+# уже разрешены, поэтому сеть не нужна. Интерфейс совпадает с NPMDataCollector,
+# так что граф строит тот же DependencyGraphBuilder; зависимости отдаются
+# с точными версиями вместо диапазонов.
+class LockfileCollector:
+    filter_dependencies = NPMDataCollector.filter_dependencies
+
+    def __init__(self, lockfile_path):
+        self.lockfile_path = lockfile_path
+        self.packages = {}
+        self.root_package = None
+        self.root_version = ''
+        self._versions_by_name = {}
+
+        try:
+            with open(lockfile_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except FileNotFoundError:
+            raise PackageNotFoundError(f"Файл не найден: {lockfile_path}")
+
+        file_name = os.path.basename(lockfile_path)
+        if file_name == 'yarn.lock':
+            self._parse_yarn(content)
+        elif file_name.endswith(('.yaml', '.yml')):
+            self._parse_pnpm(content)
+        elif file_name in NPM_LOCKFILES or content.lstrip().startswith('{'):
+            self._parse_npm(content)
+        else:
+            self._parse_yarn(content)
+
+        for name, version in self.packages:
+            self._versions_by_name.setdefault(name, []).append(version)
+
+    def resolve_version(self, package_name, spec=None):
+        versions = self._versions_by_name.get(package_name)
+        if not versions:
+            raise PackageNotFoundError(f"Пакет '{package_name}' отсутствует в lock-файле")
+
+        if spec is None:
+            if package_name == self.root_package:
+                return self.root_version
+            return versions[0]
+        if spec in versions:
+            return spec
+        if len(versions) == 1:
+            return versions[0]
+
+        try:
+            resolved = npm_semver.max_satisfying(versions, spec)
+        except ValueError:
+            resolved = None
+        return resolved or versions[0]
+
+    def get_package_dependencies(self, package_name, version=None):
+        key = (package_name, version or '')
+        if key not in self.packages:
+            key = (package_name, self.resolve_version(package_name, version))
+        return dict(self.packages[key])
+
+    def get_dependencies_by_type(self, package_name, version=None):
+        # В lock-файле типы зависимостей установленных пакетов не различаются
+        return {"dependencies": self.get_package_dependencies(package_name, version)}
+
+    # --- package-lock.json / npm-shrinkwrap.json ---
+
+    def _parse_npm(self, content):
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise PackageDataError(f"Ошибка чтения lock-файла: {e}")
+
+        if 'packages' in data:
+            packages = data['packages']
+        else:
+            # lockfileVersion 1: дерево "dependencies" -> плоская карта путей, как в v2/v3
+            packages = {'': self._npm_v1_root(data)}
+            self._flatten_npm_v1(data.get('dependencies', {}), '', packages)
+
+        root = packages.get('', {})
+        self.root_package = root.get('name') or data.get('name') or self._project_name()
+        self.root_version = root.get('version') or data.get('version') or ''
+
+        identities = {}
+        for path, entry in packages.items():
+            identities[path] = self._npm_identity(packages, path, entry)
+
+        for path, entry in packages.items():
+            if entry.get('link'):
+                continue
+
+            identity = identities[path]
+            if identity in self.packages:
+                continue
+
+            fields = ROOT_DEPENDENCY_FIELDS if path == '' else NPM_DEPENDENCY_FIELDS
+            dependencies = {}
+            for field in fields:
+                for dep_name in entry.get(field, {}):
+                    dep_path = self._npm_find(packages, path, dep_name)
+                    if dep_path is not None:
+                        dependencies[dep_name] = identities[dep_path][1]
+            self.packages[identity] = dependencies
+
+    def _npm_v1_root(self, data):
+        root = {'name': data.get('name'), 'version': data.get('version')}
+
+        # В v1 прямые зависимости проекта хранятся только в package.json
+        manifest = self._read_manifest()
+        if manifest:
+            for field in ROOT_DEPENDENCY_FIELDS:
+                root[field] = manifest.get(field, {})
+        else:
+            root['dependencies'] = {name: '' for name in data.get('dependencies', {})}
+        return root
+
+    def _flatten_npm_v1(self, dependencies, base, packages):
+        stack = [(dependencies, base)]
+        while stack:
+            level, base = stack.pop()
+            for name, entry in level.items():
+                path = f"{base}/node_modules/{name}" if base else f"node_modules/{name}"
+                packages[path] = {'version': entry.get('version'), 'dependencies': entry.get('requires', {})}
+                if entry.get('dependencies'):
+                    stack.append((entry['dependencies'], path))
+
+    @staticmethod
+    def _npm_find(packages, path, name):
+        # Поиск как в node_modules: свой каталог, затем каталоги родителей
+        base = path
+        while True:
+            candidate = f"{base}/node_modules/{name}" if base else f"node_modules/{name}"
+            if candidate in packages:
+                return candidate
+            if not base:
+                return None
+            parent = base.rfind('/node_modules/')
+            base = base[:parent] if parent >= 0 else ''
+
+    def _npm_identity(self, packages, path, entry):
+        if entry.get('link') and entry.get('resolved') in packages:
+            path = entry['resolved']
+            entry = packages[path]
+
+        if path == '':
+            return self.root_package, self.root_version
+
+        name = entry.get('name')
+        if not name:
+            marker = path.rfind('node_modules/')
+            name = path[marker + len('node_modules/'):] if marker >= 0 else os.path.basename(path)
+        return name, entry.get('version') or ''
+
+    # --- yarn.lock (v1 и berry) ---
+
+    def _parse_yarn(self, content):
+        by_spec = {}
+        entries = []
+        current = None
+        section = None
+
+        for line in content.splitlines():
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+
+            indent = len(line) - len(line.lstrip(' '))
+            if indent == 0:
+                specs = [_unquote(spec) for spec in stripped.rstrip(':').split(',')]
+                current = {'specs': specs, 'version': '', 'dependencies': {}}
+                entries.append(current)
+                section = None
+            elif current is None:
+                continue
+            elif indent <= 2:
+                if stripped.endswith(':'):
+                    section = stripped[:-1]
+                else:
+                    key, value = self._yarn_pair(stripped)
+                    if key == 'version':
+                        current['version'] = value
+                    section = None
+            elif section in ('dependencies', 'optionalDependencies'):
+                dep_name, dep_range = self._yarn_pair(stripped)
+                current['dependencies'][dep_name] = dep_range
+
+        packages = []
+        for entry in entries:
+            name = _split_spec(entry['specs'][0])[0]
+            if name == '__metadata':
+                continue
+
+            identity = (name, entry['version'])
+            packages.append((identity, entry['dependencies']))
+            for spec in entry['specs']:
+                spec_name, spec_range = _split_spec(spec)
+                by_spec[(spec_name, self._yarn_range(spec_range))] = identity
+
+        manifest = self._read_manifest()
+        self.root_package = (manifest or {}).get('name') or self._project_name()
+        self.root_version = (manifest or {}).get('version') or ''
+
+        depended_on = set()
+        for identity, entry_dependencies in packages:
+            if identity in self.packages:
+                continue
+
+            dependencies = {}
+            for dep_name, dep_range in entry_dependencies.items():
+                resolved = by_spec.get((dep_name, self._yarn_range(dep_range)))
+                if resolved:
+                    dependencies[dep_name] = resolved[1]
+                    depended_on.add(resolved)
+            self.packages[identity] = dependencies
+
+        root_identity = (self.root_package, self.root_version)
+        if root_identity in self.packages:
+            return
+
+        root_dependencies = {}
+        if manifest:
+            for field in ROOT_DEPENDENCY_FIELDS:
+                for dep_name, dep_range in manifest.get(field, {}).items():
+                    resolved = by_spec.get((dep_name, self._yarn_range(dep_range)))
+                    if resolved:
+                        root_dependencies[dep_name] = resolved[1]
+        else:
+            # Без package.json корнями считаем пакеты, от которых никто не зависит
+            for identity in self.packages:
+                if identity not in depended_on:
+                    root_dependencies[identity[0]] = identity[1]
+        self.packages[root_identity] = root_dependencies
+
+    @staticmethod
+    def _yarn_pair(text):
+        # v1: `version "1.2.3"`, berry: `version: 1.2.3`
+        if text[0] in '"\'':
+            end = text.index(text[0], 1)
+            key, rest = text[1:end], text[end + 1:]
+        else:
+            separator = min((i for i in (text.find(' '), text.find(':')) if i > 0), default=len(text))
+            key, rest = text[:separator], text[separator:]
+        return key, _unquote(rest.lstrip(':').strip())
+
+    @staticmethod
+    def _yarn_range(spec_range):
+        return spec_range[4:] if spec_range.startswith('npm:') else spec_range
+
+    # --- pnpm-lock.yaml ---
+
+    def _parse_pnpm(self, content):
+        data = _parse_yaml_mappings(content)
+
+        manifest = self._read_manifest()
+        self.root_package = (manifest or {}).get('name') or self._project_name()
+        self.root_version = (manifest or {}).get('version') or ''
+
+        importers = data.get('importers', {})
+        root_importer = importers.get('.', data)
+
+        root_dependencies = {}
+        for field in ROOT_DEPENDENCY_FIELDS:
+            for dep_name, value in root_importer.get(field, {}).items():
+                version = value.get('version', '') if isinstance(value, dict) else value
+                root_dependencies[dep_name] = self._pnpm_version(version)
+
+        slash_keys = str(data.get('lockfileVersion', '')).lstrip("'\"").startswith('5')
+        snapshots = data.get('snapshots', {})
+        for key, entry in data.get('packages', {}).items():
+            name, version = self._pnpm_identity(key, slash_keys)
+            if (name, version) in self.packages:
+                continue
+
+            source = snapshots.get(key.lstrip('/'), entry) if snapshots else entry
+            dependencies = {}
+            for field in ('dependencies', 'optionalDependencies'):
+                for dep_name, dep_version in source.get(field, {}).items():
+                    dependencies[dep_name] = self._pnpm_version(dep_version)
+            self.packages[(name, version)] = dependencies
+
+        # В v9 зависимости с разными peer-наборами живут только в snapshots
+        for key, entry in snapshots.items():
+            name, version = self._pnpm_identity(key, slash_keys)
+            if (name, version) not in self.packages:
+                self.packages[(name, version)] = {
+                    dep_name: self._pnpm_version(dep_version)
+                    for field in ('dependencies', 'optionalDependencies')
+                    for dep_name, dep_version in entry.get(field, {}).items()
+                }
+
+        self.packages[(self.root_package, self.root_version)] = root_dependencies
+
+    @staticmethod
+    def _pnpm_version(version):
+        # Отбрасываем суффиксы peer-зависимостей: "1.0.0(react@18.0.0)" и "1.0.0_react@18.0.0"
+        if not isinstance(version, str):
+            return ''
+        return version.split('(', 1)[0].split('_', 1)[0]
+
+    def _pnpm_identity(self, key, slash_keys):
+        key = key.lstrip('/').split('(', 1)[0]
+        if slash_keys:
+            # v5: "name/1.0.0_peer@1.0.0", "@scope/name/1.0.0"
+            name, _, version = key.split('_', 1)[0].rpartition('/')
+            return name, version
+        # v6+: "name@1.0.0", "@scope/name@1.0.0"
+        name, spec_range = _split_spec(key)
+        return name, self._pnpm_version(spec_range)
+
+    # --- общее ---
+
+    def _read_manifest(self):
+        manifest_path = os.path.join(os.path.dirname(os.path.abspath(self.lockfile_path)), 'package.json')
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _project_name(self):
+        return os.path.basename(os.path.dirname(os.path.abspath(self.lockfile_path))) or 'root'
+
+
+def _parse_yaml_mappings(content):
+    # Минимальный разбор YAML для pnpm-lock.yaml: вложенные блочные отображения
+    # и скалярные значения; списки и flow-значения ({...}) остаются строками
+    root = {}
+    stack = [(-1, root)]
+
+    for line in content.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#') or stripped.startswith('- ') or stripped == '---':
+            continue
+
+        indent = len(line) - len(line.lstrip(' '))
+        if stripped[0] in '"\'':
+            end = stripped.index(stripped[0], 1)
+            key, rest = stripped[1:end], stripped[end + 1:]
+        else:
+            colon = stripped.find(': ')
+            if colon < 0:
+                colon = len(stripped) - 1 if stripped.endswith(':') else -1
+            if colon < 0:
+                continue
+            key, rest = stripped[:colon], stripped[colon:]
+
+        value = rest.lstrip(':').strip()
+
+        while stack[-1][0] >= indent:
+            stack.pop()
+        parent = stack[-1][1]
+
+        if value:
+            parent[key] = _unquote(value)
+        else:
+            child = {}
+            parent[key] = child
+            stack.append((indent, child))
+
+    return root
@@ -5,58 +5,325 @@
 
 import sys
 import os
+import json
+import time
+from contextlib import contextmanager, redirect_stdout
 
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-
+# Модули режимов (сеть, кэш SQLite, визуализация, выгрузка, сервер, процессы)
+# импортируются там, где режим выбран: запуск из скриптов сборки не платит за
+# то, что ему не нужно
 from cli import CommandLineInterface
-from config import Config
-from data_collector import NPMDataCollector
-from graph_builder import DependencyGraphBuilder
-from simple_visualizer import SimpleGraphVisualizer
-from errors import DependencyVisualizerError
+from profiler import NULL_PROFILER
+from errors import DependencyVisualizerError, ValidationError
+
+
+@contextmanager
+def quiet_output(quiet):
+    # --quiet: ход работы не выводится, ошибки по-прежнему идут в stderr
+    if not quiet:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        yield
 
 
 class DependencyVisualizer:
     def __init__(self):
         self.cli = CommandLineInterface()
         self.config = None
+        self.cache = None
+        self.previous_snapshot = None
+        self.profiler = NULL_PROFILER
+        self.journal = None
+        self.memo = None
+        # Итог прогона для --json
+        self.summary = {}
 
     def run(self):
+        started = time.perf_counter()
         try:
-            print("=== Инструмент визуализации графа зависимостей ===")
-
             self.config = self.cli.parse_arguments()
+            with quiet_output(self.config.quiet):
+                self._run()
+            self._print_summary(started)
 
-            print("\n" + "=" * 50)
-            print("КОНФИГУРАЦИЯ:")
-            print("=" * 50)
-            self._print_configuration()
-            print("=" * 50)
-
-            collector = NPMDataCollector(self.config.repository_url, self.config.test_repo_mode)
-            builder = DependencyGraphBuilder(collector)
-            visualizer = SimpleGraphVisualizer()
+        except DependencyVisualizerError as e:
+            print(f"\n Ошибка: {e}", file=sys.stderr)
+            self._print_summary(started, e)
+            sys.exit(1)
+        except KeyboardInterrupt:
+            print(f"\n Прервано", file=sys.stderr)
+            if self.journal:
+                print(f" Продолжить обход: --resume {self.journal.path}", file=sys.stderr)
+            sys.exit(130)
+        except Exception as e:
+            print(f"\n Неожиданная ошибка: {e}", file=sys.stderr)
+            self._print_summary(started, e)
+            sys.exit(1)
+        finally:
+            if self.journal:
+                self.journal.close()
+            if self.cache:
+                self.cache.close()
+
+    def _run(self):
+        print("=== Инструмент визуализации графа зависимостей ===")
+        for notice in self.config.notices:
+            print(notice)
+
+        if self.config.lockfile:
+            from lockfile_collector import LockfileCollector
+            collector = LockfileCollector(self.config.lockfile)
+            self._apply_lockfile_root(collector)
+
+        if self.config.since:
+            from graph_snapshot import load_snapshot
+            self.previous_snapshot = load_snapshot(self.config.since)
+            self._apply_snapshot_root()
+
+        print("\n" + "=" * 50)
+        print("КОНФИГУРАЦИЯ:")
+        print("=" * 50)
+        self._print_configuration()
+        print("=" * 50)
 
-            if self.config.reverse_dependencies:
-                self._find_reverse_deps(builder, visualizer)
+        if self.config.profile:
+            from profiler import Profiler
+            self.profiler = Profiler()
+
+        if not self.config.lockfile:
+            from data_collector import NPMDataCollector
+            if self.config.use_cache and not self.config.test_repo_mode:
+                from package_cache import PackageCache
+                self.cache = PackageCache(self.config.cache_dir, self.config.cache_ttl)
+
+            # Сервер живет долго: память коллектора о пакетах ограничена LRU и --cache-ttl
+            serving = bool(self.config.serve_address)
+            collector = NPMDataCollector(self.config.repository_url, self.config.test_repo_mode,
+                                         self.cache, self.config.offline, self.config.retries,
+                                         self.profiler, memoize=not self.config.memory_limit,
+                                         max_packages=self.config.serve_max_packages if serving else None,
+                                         memo_ttl=self.config.cache_ttl if serving else None)
+
+        if self.config.checkpoint:
+            self.journal = self._open_journal()
+
+        if (self.config.batch_manifest or self.config.serve_address or self.config.diff_version) and \
+                self.config.memo_nodes:
+            # Поддеревья, общие для нескольких корней (или двух версий корня), раскрываются один раз
+            from subgraph_memo import SubgraphMemo
+            # В --serve поддеревья, как и пакеты коллектора, живут не дольше --cache-ttl
+            self.memo = SubgraphMemo(self.config.memo_nodes,
+                                     self.config.cache_ttl if self.config.serve_address else None)
+
+        from graph_builder import DependencyGraphBuilder
+
+        builder = DependencyGraphBuilder(collector, self.config.jobs, self.profiler, self.journal,
+                                         pruning=self.config.pruning, memo=self.memo)
+
+        if self.config.serve_address:
+            from graph_server import GraphService, serve
+            service = GraphService(collector, self.config.jobs, self.config.max_depth,
+                                   self.config.serve_max_nodes, self.memo, self.profiler, self.config.pruning,
+                                   self.config.cache_ttl)
+            serve(service, self.config.serve_address)
+        elif self.config.batch_manifest:
+            self._run_batch(builder)
+        elif self.config.diff_version:
+            self._run_diff(builder)
+        elif self.config.memory_limit:
+            self._run_bounded(builder)
+        elif self.config.reverse_dependencies:
+            self._find_reverse_deps(builder)
+        else:
+            crawl_collector = collector
+            if self.previous_snapshot:
+                crawl_collector = self._incremental_collector(collector)
+                builder = DependencyGraphBuilder(crawl_collector, self.config.jobs, self.profiler, self.journal,
+                                                 pruning=self.config.pruning)
+
+            if self.config.workers > 1:
+                graph = self._load_parallel_graph()
             else:
-                graph = builder.build_dependency_graph(
+                graph = builder.build_compact_graph(
                     self.config.package_name,
                     self.config.package_version,
                     self.config.filter_substring,
                     self.config.max_depth
                 )
-                self._display_graph(graph, builder)
-                self._visualize_graph(graph, visualizer)
+            self._display_graph(graph, builder)
+            if self.config.pruning:
+                self._print_pruning(builder, graph)
+            self._visualize_graph(graph)
 
-            print("\n Готово!")
+            if self.config.snapshot_path:
+                self._save_snapshot(graph, crawl_collector)
 
-        except DependencyVisualizerError as e:
-            print(f"\n Ошибка: {e}", file=sys.stderr)
-            sys.exit(1)
-        except Exception as e:
-            print(f"\n Неожиданная ошибка: {e}", file=sys.stderr)
-            sys.exit(1)
+        if self.cache and self.config.cache_stats:
+            self._print_cache_stats()
+
+        if self.config.transfer_stats and not self.config.lockfile:
+            self._print_transfer_stats(collector)
+
+        if self.journal:
+            self._print_journal_stats()
+
+        if self.config.profile:
+            self._print_profile()
+
+        print("\n Готово!")
+
+    def _print_summary(self, started, error=None):
+        # --json: итог прогона одной строкой в настоящий stdout
+        config = self.config or self.cli.config
+        if not (config and config.json_output):
+            return
+        summary = {"status": "error" if error else "ok", "package": config.package_name}
+        if error:
+            summary["error"] = str(error)
+        summary.update(self.summary)
+        summary["elapsed"] = round(time.perf_counter() - started, 3)
+        print(json.dumps(summary, ensure_ascii=False))
+
+    def _load_parallel_graph(self):
+        # Весь файл репозитория разбирается в пуле процессов, затем берется
+        # подграф, достижимый от корня, - тот же, что дал бы обход
+        from parallel_repository import load_repository_graph, reachable_subgraph
+
+        with self.profiler.span('load', 'build', workers=self.config.workers):
+            started = time.perf_counter()
+            repository = load_repository_graph(self.config.repository_url, self.config.workers)
+            loaded = time.perf_counter() - started
+        print(f"\n Файл разобран в {self.config.workers} процессах за {loaded:.2f} с: "
+              f"{len(repository)} пакетов, {repository.edge_count} зависимостей")
+        print(f" Максимальная глубина обхода: {self.config.max_depth}")
+
+        with self.profiler.span('crawl', 'build', root=self.config.package_name):
+            return reachable_subgraph(repository, self.config.package_name, self.config.max_depth)
+
+    def _apply_lockfile_root(self, collector):
+        if not self.config.package_name:
+            self.config.package_name = collector.root_package
+        if self.config.package_name == collector.root_package and not self.config.package_version:
+            self.config.package_version = collector.root_version or None
+        if self.config.reverse_dependencies and not self.config.root_package:
+            self.config.root_package = collector.root_package
+        self.config.repository_url = self.config.lockfile
+        self.config.use_cache = False
+
+    def _apply_snapshot_root(self):
+        snapshot = self.previous_snapshot
+        root = snapshot["root"]
+        if not self.config.package_name:
+            self.config.package_name = root["name"]
+            self.config.package_version = root.get("version")
+
+        # Снимок другого реестра или другой глубины нельзя ни переиспользовать, ни
+        # сравнивать с новым графом: пакеты чужого реестра сочлись бы "неизменившимися",
+        # а обрезка по глубине - удаленными пакетами
+        registry = snapshot.get("registry")
+        if registry is not None and registry.rstrip('/') != (self.config.repository_url or '').rstrip('/'):
+            raise ValidationError(f"Снимок {self.config.since} построен по реестру {registry}, а не "
+                                  f"{self.config.repository_url}: постройте новый снимок (--snapshot)")
+        max_depth = snapshot.get("max_depth")
+        if max_depth is not None and max_depth != self.config.max_depth:
+            raise ValidationError(f"Снимок {self.config.since} построен с глубиной {max_depth}, а не "
+                                  f"{self.config.max_depth}: укажите --max-depth {max_depth} "
+                                  f"или постройте новый снимок (--snapshot)")
+
+    def _incremental_collector(self, collector):
+        from graph_snapshot import SnapshotCollector, check_freshness
+
+        snapshot = self.previous_snapshot
+
+        if snapshot.get("filter") != self.config.filter_substring or snapshot.get("prune") != self._pruning_params():
+            print(" Фильтр или правила отсечения отличаются от снимка: граф строится заново")
+            return collector
+
+        print(f"\n Проверка свежести {len(snapshot['packages'])} пакетов из снимка...")
+        unchanged = check_freshness(collector, snapshot, self.config.jobs)
+        print(f" Не изменилось: {len(unchanged)}, изменилось: {len(snapshot['packages']) - len(unchanged)}")
+
+        return SnapshotCollector(collector, snapshot, unchanged)
+
+    def _open_journal(self):
+        from crawl_journal import CrawlJournal
+
+        path = self.config.checkpoint_path or f"{self._output_base_name()}.journal.jsonl"
+        root = self.config.root_package if self.config.reverse_dependencies else self.config.package_name
+        params = {
+            "root": root,
+            "version": self.config.package_version,
+            "filter": self.config.filter_substring,
+            "registry": self.config.repository_url,
+            "prune": self._pruning_params()
+        }
+
+        journal = CrawlJournal(path, params, resume=self.config.resume)
+        if self.config.resume:
+            print(f"\n Продолжение обхода по журналу {path}: сохранено пакетов {journal.resumable}")
+        return journal
+
+    def _pruning_params(self):
+        return self.config.pruning.describe() if self.config.pruning else None
+
+    def _print_pruning(self, builder, graph):
+        summary = builder.pruning_summary(graph)
+        print(f"\n ОТСЕЧЕНИЕ ОБХОДА:")
+        print("=" * 50)
+        print(f"    Отброшено по имени: {summary['excluded_edges']} ребер, "
+              f"{summary['excluded_packages']} пакетов")
+        print(f"    Отброшено по типу зависимости: {summary['skipped_edges']} ребер, "
+              f"{summary['skipped_packages']} пакетов")
+        print(f"    Не раскрыто из-за ограничения глубины: {summary['depth_limited_packages']} пакетов")
+        print(f"    Сэкономлено загрузок: не меньше {summary['saved_fetches']}")
+
+    def _print_journal_stats(self):
+        journal = self.journal
+        print(f"\n Журнал обхода: {journal.path}")
+        print(f"    Из журнала: {journal.replayed}, обработано заново: {journal.recorded}, "
+              f"временных ошибок: {journal.transient_failures}")
+
+    def _save_snapshot(self, graph, collector):
+        from graph_snapshot import SnapshotCollector, diff_snapshots, save_snapshot, snapshot_from_graph
+
+        snapshot = snapshot_from_graph(graph, collector, self.config.package_name, self.config.package_version,
+                                       self.config.repository_url, self.config.filter_substring,
+                                       self.config.max_depth, self._pruning_params())
+        save_snapshot(self.config.snapshot_path, snapshot)
+        print(f"\n Снимок графа: {self.config.snapshot_path}")
+
+        if isinstance(collector, SnapshotCollector):
+            print(f"    Узлов из снимка: {collector.reused}, загружено заново: {collector.fetched}")
+
+        if self.previous_snapshot:
+            changes = diff_snapshots(self.previous_snapshot, snapshot)
+            self._print_changes(changes)
+
+            changes_path = f"{os.path.splitext(self.config.snapshot_path)[0]}.changes.json"
+            with open(changes_path, 'w', encoding='utf-8') as f:
+                json.dump(changes, f, ensure_ascii=False, indent=2)
+            print(f"    Изменения: {changes_path}")
+
+    def _print_changes(self, changes):
+        print(f"\n ИЗМЕНЕНИЯ С ПРОШЛОГО СНИМКА:")
+        print("=" * 50)
+        if not any(changes.values()):
+            print("    Нет изменений")
+            return
+
+        for name in changes["added_packages"]:
+            print(f"    + {name}")
+        for name in changes["removed_packages"]:
+            print(f"    - {name}")
+        for name, old, new in changes["upgraded_packages"]:
+            print(f"    ~ {name}: {old} -> {new}")
+        for source, name in changes["added_edges"]:
+            print(f"    + {source} -> {name}")
+        for source, name in changes["removed_edges"]:
+            print(f"    - {source} -> {name}")
+        for source, name, old, new in changes["upgraded_edges"]:
+            print(f"    ~ {source} -> {name}: {old} -> {new}")
 
     def _print_configuration(self):
         config_dict = {
@@ -66,39 +333,152 @@ class DependencyVisualizer:
             "Версия": self.config.package_version or "последняя",
             "Выходной файл": self.config.output_filename,
             "Фильтр": self.config.filter_substring or "нет",
-            "Максимальная глубина": self.config.max_depth
+            "Максимальная глубина": self.config.max_depth,
+            "Потоков": self.config.jobs
         }
 
+        if self.config.workers > 1:
+            config_dict["Процессов разбора"] = self.config.workers
+
+        if self.config.memory_limit:
+            config_dict["Лимит памяти"] = self.config.memory_limit
+            config_dict["Хранилище обхода"] = self.config.spill_dir or "временный каталог"
+
+        if self.config.serve_address:
+            config_dict["Сервер"] = f"http://{self.config.serve_address}/"
+
+        if self.config.pruning:
+            described = self.config.pruning.describe()
+            config_dict["Отсечение"] = "; ".join(
+                f"{key}: {value}" for key, value in described.items() if value) or "нет"
+
+        if self.config.lockfile:
+            config_dict["Режим"] = "lock-файл (без сети)"
+        elif not self.config.test_repo_mode:
+            if self.config.use_cache:
+                from package_cache import default_cache_dir
+                config_dict["Кэш"] = self.config.cache_dir or default_cache_dir()
+            else:
+                config_dict["Кэш"] = "нет"
+            if self.config.offline:
+                config_dict["Режим"] = "офлайн (только кэш)"
+
         if self.config.reverse_dependencies:
             config_dict["Режим"] = "обратные зависимости"
             config_dict["Корневой пакет"] = self.config.root_package
+            config_dict["Пакет"] = ", ".join(self.config.reverse_targets)
 
         for key, value in config_dict.items():
             print(f"{key}: {value}")
 
-    def _find_reverse_deps(self, builder, visualizer):
-        print(f"\n Поиск обратных зависимостей для '{self.config.package_name}'...")
+    def _print_cache_stats(self):
+        stats = self.cache.summary()
+        network = stats['misses'] + stats['revalidated']
+
+        print(f"\n КЭШ МЕТАДАННЫХ ({self.cache.cache_dir}):")
+        print("=" * 50)
+        print(f"    Попаданий: {stats['hits']}")
+        print(f"    Перепроверено (304): {stats['revalidated']}")
+        print(f"    Промахов: {stats['misses']}")
+        print(f"    Сетевых запросов: {network}")
+        print(f"    Записей: {stats['entries']} ({stats['size'] / 1024:.1f} КБ)")
+
+    def _print_transfer_stats(self, collector):
+        summary = collector.transfer_summary()
+        requests = summary['requests']
+
+        print(f"\n ЗАГРУЖЕНО ИЗ РЕЕСТРА:")
+        print("=" * 50)
+        print(f"    Запросов с телом ответа: {requests}")
+        print(f"    Открыто соединений: {summary['connections']}, повторных попыток: {summary['retries']}")
+        print(f"    Передано: {summary['wire_bytes'] / 1024:.1f} КБ, "
+              f"после распаковки: {summary['decoded_bytes'] / 1024:.1f} КБ")
+        if requests:
+            print(f"    В среднем на пакет: {summary['wire_bytes'] / requests / 1024:.1f} КБ")
+            for package, (wire, decoded) in summary['largest']:
+                print(f"      {package}: {wire / 1024:.1f} КБ ({decoded / 1024:.1f} КБ)")
+        if summary['peak_rss']:
+            print(f"    Пиковая память процесса: {summary['peak_rss'] / 1024 / 1024:.1f} МБ")
+
+    def _print_profile(self):
+        profiler = self.profiler
+        stats = profiler.stage_stats()
+
+        print(f"\n ПРОФИЛЬ ПРОГОНА:")
+        print("=" * 78)
+        print(f"    {'этап':<14} {'число':>7} {'всего, с':>9} {'p50, мс':>9} {'p95, мс':>9} "
+              f"{'p99, мс':>9} {'макс, мс':>9}")
+        for name, entry in sorted(stats.items(), key=lambda item: -item[1]['total']):
+            print(f"    {name:<14} {entry['count']:>7} {entry['total']:>9.3f} {entry['p50'] * 1000:>9.1f} "
+                  f"{entry['p95'] * 1000:>9.1f} {entry['p99'] * 1000:>9.1f} {entry['max'] * 1000:>9.1f}")
+
+        # Загрузка из реестра, а в тестовом режиме и по lock-файлу - обработка пакета
+        slowest = profiler.slowest('fetch') or profiler.slowest('package')
+        if slowest:
+            print(f"\n    Самые медленные пакеты:")
+            for duration, args in slowest:
+                details = ""
+                if 'wire_bytes' in args:
+                    details = f" ({args['wire_bytes'] / 1024:.1f} КБ, разбор {args['decode_ms']:.1f} мс)"
+                elif 'source' in args:
+                    details = f" ({args['source']})"
+                print(f"      {args.get('package')}: {duration * 1000:.1f} мс{details}")
+
+        path = profiler.critical_path()
+        if path:
+            total = sum(duration for _, _, duration in path)
+            print(f"\n    Критический путь обхода (самый медленный пакет уровня): {total:.3f} с")
+            for depth, package, duration in path:
+                print(f"      уровень {depth}: {package} {duration * 1000:.1f} мс")
+
+        if profiler.counters:
+            print(f"\n    Счетчики: " + ", ".join(f"{name}={value}" for name, value in sorted(profiler.counters.items())))
+
+        trace = self.config.profile_trace or f"{self._output_base_name()}.trace.json"
+        try:
+            profiler.write_chrome_trace(trace)
+            print(f"    Трасса (chrome://tracing, Perfetto): {trace}")
+        except OSError as e:
+            print(f"    Не удалось записать трассу {trace}: {e}")
+
+    def _find_reverse_deps(self, builder):
+        targets = self.config.reverse_targets
+        print(f"\n Поиск обратных зависимостей для {', '.join(targets)}...")
 
-        reverse_deps = builder.find_reverse_dependencies(
-            self.config.package_name,
+        index = builder.build_reverse_index(
             self.config.root_package,
             self.config.package_version,
             self.config.filter_substring,
             self.config.max_depth
         )
+        keys = index.graph.keys
+        reverse = self.summary["reverse"] = {}
 
-        if not reverse_deps:
-            print(f" Не найдено пакетов, зависящих от '{self.config.package_name}'")
-            return
+        for target in targets:
+            direct = index.direct_dependents(target)
+            reverse[target] = sorted(keys[node] for node in direct)
+            if not direct:
+                print(f"\n Не найдено пакетов, зависящих от '{target}'")
+                continue
 
-        print(f"\n Пакеты, зависящие от '{self.config.package_name}':")
-        print("=" * 50)
-        for i, package in enumerate(sorted(reverse_deps), 1):
-            print(f"{i:2d}. {package}")
-        print(f"Всего: {len(reverse_deps)}")
+            print(f"\n Пакеты, зависящие от '{target}':")
+            print("=" * 50)
+            for i, package in enumerate(sorted(keys[node] for node in direct), 1):
+                print(f"{i:2d}. {package}")
+            print(f"Всего: {len(direct)}")
+
+            transitive = index.transitive_dependents(target)
+            print(f" Транзитивно зависящих: {len(transitive)}")
+
+            if self.config.max_paths:
+                paths = index.paths(target, self.config.max_paths)
+                print(f" Пути от корня (не больше {self.config.max_paths}):")
+                for path in paths:
+                    print(f"    {' -> '.join(keys[node] for node in path)}")
 
     def _display_graph(self, graph, builder):
-        if not graph:
+        fetched = graph.fetched_nodes()
+        if not fetched:
             print(f"\n Граф пуст")
             return
 
@@ -110,16 +490,16 @@ class DependencyVisualizer:
         packages_with_deps = 0
         packages_with_errors = 0
 
-        for package, dependencies in graph.items():
-            print(f"\n {package}:")
+        for package in fetched:
+            print(f"\n {graph.keys[package]}:")
 
-            if dependencies and "ERROR" not in next(iter(dependencies.keys()), ""):
-                packages_with_deps += 1
-                for dep, version in dependencies.items():
-                    print(f"   └── {dep}: {version}")
-            elif dependencies and "ERROR" in dependencies:
+            if package in graph.errors:
                 packages_with_errors += 1
-                print(f"   └──  {dependencies['ERROR']}")
+                print(f"   └──  {graph.errors[package]}")
+            elif graph.offsets[package + 1] > graph.offsets[package]:
+                packages_with_deps += 1
+                for dep, version in graph.edges(package):
+                    print(f"   └── {graph.names[dep]}: {version}")
             else:
                 print("   └── (нет зависимостей)")
 
@@ -128,54 +508,209 @@ class DependencyVisualizer:
               f"{stats['total_dependencies']} зависимостей")
         print(f"    С зависимостями: {packages_with_deps}")
         print(f"    С ошибками: {packages_with_errors}")
-        print(f"    Глубина: {stats['max_depth']}")
+        print(f"    Глубина: {stats['max_depth']} (самая длинная цепочка: {stats['longest_path']})")
         print(f"    Циклы: {'да' if stats['has_cycles'] else 'нет'}")
+        self.summary.update(packages=stats['total_packages'], dependencies=stats['total_dependencies'],
+                            errors=packages_with_errors, max_depth=stats['max_depth'],
+                            has_cycles=stats['has_cycles'])
+        for cycle in stats['cycles']:
+            print(f"       {' -> '.join(cycle)} -> {cycle[0]}")
+
+        package, fan_in = stats['most_depended']
+        if fan_in > 1:
+            print(f"    Чаще всего требуется: {package} ({fan_in} раз)")
+
+    def _run_batch(self, builder):
+        from batch_manifest import output_suffixes, read_batch_manifest
+
+        roots = read_batch_manifest(self.config.batch_manifest)
+        print(f"\n ПАКЕТНЫЙ РЕЖИМ: {len(roots)} корневых пакетов из {self.config.batch_manifest}")
+
+        started = time.perf_counter()
+        combined, results = builder.build_batch(roots, self.config.filter_substring, self.config.max_depth)
+        crawl_time = time.perf_counter() - started
+
+        base_name = self._output_base_name()
+        # У каждого корня свои файлы: react@17 и react@18 не перезаписывают друг друга
+        suffixes = output_suffixes(roots)
+
+        print(f"\n{'Пакет':<30} {'узлов':>6} {'новых':>6} {'время, с':>9} {'файлов':>7}")
+        print("-" * 62)
+        for result, suffix in zip(results, suffixes):
+            label = f"{result.package}@{result.version}" if result.version else result.package
+            files = []
+            if result.graph.fetched_nodes():
+                files, _ = self._write_outputs(result.graph, f"{base_name}-{suffix}", f"Зависимости {label}")
+            print(f"{label:<30} {len(result.graph.fetched_nodes()):>6} {result.new_packages:>6} "
+                  f"{result.elapsed:>9.3f} {len(files):>7}")
+            for _, file in files:
+                print(f"    {file}")
 
-    def _visualize_graph(self, graph, visualizer):
-        if not graph:
+        overlap = builder.batch_overlap(results)
+        print("\n" + "=" * 62)
+        print(f" Обход всех корней: {crawl_time:.2f} с")
+        print(f" Пакетов по корням: {overlap['total_packages']}, уникальных: {overlap['unique_packages']}")
+        print(f" Общих для нескольких корней: {overlap['shared_packages']}, "
+              f"повторных загрузок сэкономлено: {overlap['saved_fetches']}")
+        for package, count in overlap['most_shared']:
+            print(f"    {package}: в {count} корнях")
+        if self.memo:
+            memo = self.memo.stats()
+            print(f" Память поддеревьев: {memo['hits']} попаданий, {memo['spliced_nodes']} узлов вставлено без обхода, "
+                  f"хранится {memo['subgraphs']} поддеревьев ({memo['nodes']} узлов)")
+
+        stats = builder.get_graph_statistics(combined)
+        print(f" Объединенный граф: {stats['total_packages']} пакетов, {stats['total_dependencies']} зависимостей, "
+              f"циклы: {'да' if stats['has_cycles'] else 'нет'}")
+        self.summary.update(roots=len(results), packages=stats['total_packages'],
+                            dependencies=stats['total_dependencies'], has_cycles=stats['has_cycles'])
+
+        files, _ = self._write_outputs(combined, f"{base_name}-combined", "Объединенный граф зависимостей")
+        for label, file in files:
+            print(f"    {label}: {file}")
+
+    def _run_diff(self, builder):
+        # Обе версии обходятся одним построителем: метаданные пакетов загружаются
+        # один раз, поддеревья первых уровней старой версии вставляются в обход новой
+        from compact_graph import format_package_key
+        from graph_diff import GraphDiff
+        from render_pipeline import atomic_open
+
+        package = self.config.package_name
+        versions = (self.config.package_version, self.config.diff_version)
+        graphs = []
+        for version in versions:
+            print(f"\n Обход {format_package_key(package, version or 'latest')}...")
+            graphs.append(builder.build_compact_graph(package, version, self.config.filter_substring,
+                                                      self.config.max_depth))
+
+        with self.profiler.span('diff', 'build'):
+            diff = GraphDiff(*graphs)
+            summary = diff.summary()
+        self.summary.update(diff=summary)
+
+        print(f"\n СРАВНЕНИЕ {summary['old_root']} -> {summary['new_root']}")
+        print("=" * 50)
+        print(f"    Пакетов: {summary['old_packages']} -> {summary['new_packages']}")
+        print(f"    Узлов в совпавших поддеревьях: {summary['identical_nodes']}, "
+              f"измененных имен (с предками): {summary['changed_names']}")
+        if self.memo:
+            memo = self.memo.stats()
+            print(f"    Память поддеревьев: {memo['hits']} попаданий, {memo['spliced_nodes']} узлов вставлено без обхода")
+        self._print_changes(diff.changes)
+
+        base_name = self._output_base_name()
+        changes_path = f"{base_name}.diff.json"
+        with atomic_open(changes_path) as f:
+            json.dump(dict(summary, changes=diff.changes), f, ensure_ascii=False, indent=2)
+        self.summary.setdefault("files", []).append(changes_path)
+
+        with self.profiler.span('diff_graph', 'build'):
+            graph, node_changes, edge_changes = diff.render_graph()
+        title = f"Изменения {summary['old_root']} -> {summary['new_root']}"
+        files_created, errors = self._write_outputs(graph, base_name, title, (node_changes, edge_changes))
+
+        print(f"\n Изменения: {changes_path}")
+        for label, file in files_created:
+            print(f"    {label}: {file}")
+        for error in errors:
+            print(f" Ошибка {error}", file=sys.stderr)
+        if errors:
+            self.summary["output_errors"] = errors
+
+    def _run_bounded(self, builder):
+        # --memory-limit: граф пишется в хранилище на диске, статистика и выгрузки
+        # читают его потоком. Список пакетов не печатается: на обходе всей
+        # экосистемы это миллионы строк
+        from graph_exporters import export_store
+        from graph_store import GraphStore
+        from render_pipeline import OUTPUT_FORMATS, output_files
+
+        store = GraphStore(self.config.memory_limit_bytes, self.config.spill_dir)
+        try:
+            builder.build_graph_store(store, self.config.package_name, self.config.package_version,
+                                      self.config.filter_substring, self.config.max_depth)
+            with self.profiler.span('statistics', 'build'):
+                stats = store.statistics()
+
+            print(f"\n ГРАФ ЗАВИСИМОСТЕЙ (хранилище {store.directory}):")
+            print("=" * 60)
+            print(f" Статистика: {stats['total_packages']} пакетов, "
+                  f"{stats['total_dependencies']} зависимостей")
+            print(f"    С зависимостями: {stats['with_dependencies']}")
+            print(f"    С ошибками: {stats['errors']}")
+            print(f"    Глубина: {stats['max_depth']}")
+            package, fan_in = stats['most_depended']
+            if fan_in > 1:
+                print(f"    Чаще всего требуется: {package} ({fan_in} раз)")
+            print(f"    Индексы: {stats['index_entries']} записей, "
+                  f"{'в SQLite (лимит памяти превышен)' if stats['spilled'] else 'в памяти'}; "
+                  f"на диске {stats['disk_bytes'] / (1024 * 1024):.1f} МБ")
+            self.summary.update(packages=stats['total_packages'], dependencies=stats['total_dependencies'],
+                                errors=stats['errors'], max_depth=stats['max_depth'], spilled=stats['spilled'])
+
+            if self.config.pruning:
+                pruning = builder.pruning_stats
+                print(f"\n Отсечение обхода: отброшено по имени {pruning['excluded_edges']} ребер, "
+                      f"по типу зависимости {pruning['skipped_edges']} ребер")
+
+            if not stats['total_packages']:
+                return
+            print(f"\n ВЫГРУЗКА...")
+            files_created = []
+            errors = []
+            for output_format, filename in output_files(self._output_base_name(), self.config.output_formats,
+                                                        self.config.output_filename):
+                label = OUTPUT_FORMATS[output_format][1]
+                try:
+                    with self.profiler.span(output_format, 'output', file=filename):
+                        export_store(store, filename, output_format)
+                    files_created.append(filename)
+                    print(f" {label}: {filename}")
+                except OSError as e:
+                    errors.append(f"{label}: {e}")
+                    print(f" Ошибка {label}: {e}", file=sys.stderr)
+            self.summary.setdefault("files", []).extend(files_created)
+            if errors:
+                self.summary["output_errors"] = errors
+        finally:
+            store.close()
+
+    def _output_base_name(self):
+        if '.' in self.config.output_filename:
+            return os.path.splitext(self.config.output_filename)[0]
+        return self.config.output_filename
+
+    def _write_outputs(self, graph, base_name, title, changes=None):
+        # Все форматы --formats из одного прохода по графу, каждый файл атомарно
+        from render_pipeline import RenderPipeline, output_files
+
+        outputs = output_files(base_name, self.config.output_formats, self.config.output_filename)
+        pipeline = RenderPipeline(self.profiler, self.config.render_workers, self.config.layout)
+        files_created, errors = pipeline.run(graph, outputs, title, changes)
+        self.summary.setdefault("files", []).extend(file for _, file in files_created)
+        return files_created, errors
+
+    def _visualize_graph(self, graph):
+        fetched = graph.fetched_nodes()
+        if not fetched:
             return
 
-        print(f"\n ВИЗУАЛИЗАЦИЯ...")
-
-        if '.' in self.config.output_filename:
-            base_name = os.path.splitext(self.config.output_filename)[0]
-        else:
-            base_name = self.config.output_filename
+        from render_pipeline import VISUAL_FORMATS
+        visual = any(output_format in VISUAL_FORMATS for output_format in self.config.output_formats)
+        print(f"\n ВИЗУАЛИЗАЦИЯ..." if visual else f"\n ВЫГРУЗКА...")
 
         title = f"Зависимости {self.config.package_name}"
+        files_created, errors = self._write_outputs(graph, self._output_base_name(), title)
 
-        files_created = []
-
-        # 1. PlantUML
-        try:
-            puml_file = f"{base_name}.puml"
-            visualizer.save_plantuml_code(graph, puml_file, title)
-            files_created.append(puml_file)
-            print(f" PlantUML: {puml_file}")
-        except Exception as e:
-            print(f" Ошибка PlantUML: {e}")
-
-        # 2. Текстовая диаграмма
-        try:
-            txt_file = f"{base_name}.txt"
-            visualizer.save_text_diagram(graph, txt_file, title)
-            files_created.append(txt_file)
-            print(f" Текст: {txt_file}")
-        except Exception as e:
-            print(f" Ошибка текста: {e}")
-
-        # 3. SVG изображение
-        if len(graph) <= 20:
-            try:
-                svg_file = f"{base_name}.svg"
-                visualizer.generate_svg(graph, svg_file, title)
-                files_created.append(svg_file)
-                print(f" SVG: {svg_file}")
-            except Exception as e:
-                print(f" Ошибка SVG: {e}")
-        else:
-            print(f" Граф слишком большой для SVG ({len(graph)} узлов)")
+        for label, file in files_created:
+            print(f" {label}: {file}")
+        for error in errors:
+            print(f" Ошибка {error}", file=sys.stderr)
+        if errors:
+            self.summary["output_errors"] = errors
 
+        files_created = [file for _, file in files_created]
         if files_created:
             print(f"\n Создано файлов: {len(files_created)}")
             for file in files_created:
@@ -0,0 +1,243 @@
+import re
+from functools import lru_cache
+
+# Разбор версий и диапазонов по правилам npm (node-semver): ^, ~, x-диапазоны,
+# сравнения, диапазоны через дефис, объединение через || и пре-релизы.
+
+_NUMBER = r'0|[1-9]\d*'
+_IDENTIFIER = r'[0-9A-Za-z-]+'
+_PRERELEASE = rf'(?:-({_IDENTIFIER}(?:\.{_IDENTIFIER})*))?'
+_BUILD = rf'(?:\+{_IDENTIFIER}(?:\.{_IDENTIFIER})*)?'
+
+_VERSION = re.compile(rf'^[v=\s]*({_NUMBER})\.({_NUMBER})\.({_NUMBER}){_PRERELEASE}{_BUILD}$')
+_XR = rf'(?:{_NUMBER}|x|X|\*)'
+_PARTIAL = rf'[v=\s]*({_XR})(?:\.({_XR})(?:\.({_XR}){_PRERELEASE}{_BUILD})?)?'
+_PARTIAL_RE = re.compile(rf'^{_PARTIAL}$')
+_HYPHEN = re.compile(r'^\s*(\S+)\s+-\s+(\S+)\s*$')
+_OPERATOR_SPACE = re.compile(r'(<=|>=|<|>|=|~>?|\^)\s+')
+_COMPARATOR = re.compile(r'^(<=|>=|<|>|=|~>?|\^)?(.*)$')
+
+_ANY = (0, 0, 0, ())
+_NOTHING = ('<', (0, 0, 0, ((0, 0),)))
+
+
+def _prerelease_key(prerelease):
+    if not prerelease:
+        return ()
+    return tuple((0, int(part)) if part.isdigit() else (1, part) for part in prerelease.split('.'))
+
+
+@lru_cache(maxsize=65536)
+def parse_version(text):
+    match = _VERSION.match(text.strip()) if isinstance(text, str) else None
+    if not match:
+        return None
+    major, minor, patch, prerelease = match.groups()
+    return int(major), int(minor), int(patch), _prerelease_key(prerelease)
+
+
+def version_key(version):
+    # Ключ сортировки: релиз старше любого своего пре-релиза
+    major, minor, patch, prerelease = version
+    return major, minor, patch, (0, prerelease) if prerelease else (1,)
+
+
+def _is_x(part):
+    return part is None or part in ('x', 'X', '*')
+
+
+def _parse_partial(text):
+    match = _PARTIAL_RE.match(text)
+    if not match:
+        raise ValueError(f"Некорректная версия в диапазоне: {text}")
+
+    major, minor, patch, prerelease = match.groups()
+    parts = []
+    for part in (major, minor, patch):
+        if _is_x(part) or (parts and parts[-1] is None):
+            parts.append(None)
+        else:
+            parts.append(int(part))
+    return parts[0], parts[1], parts[2], _prerelease_key(prerelease) if parts[2] is not None else ()
+
+
+def _upper(major, minor=None):
+    # Исключающая верхняя граница "<M.m.0-0": не пускает пре-релизы следующей версии
+    if minor is None:
+        return '<', (major + 1, 0, 0, ((0, 0),))
+    return '<', (major, minor + 1, 0, ((0, 0),))
+
+
+def _x_range(major, minor, patch, prerelease):
+    if major is None:
+        return [('>=', _ANY)]
+    if minor is None:
+        return [('>=', (major, 0, 0, ())), _upper(major)]
+    if patch is None:
+        return [('>=', (major, minor, 0, ())), _upper(major, minor)]
+    return [('=', (major, minor, patch, prerelease))]
+
+
+def _tilde(major, minor, patch, prerelease):
+    if major is None:
+        return [('>=', _ANY)]
+    if minor is None:
+        return [('>=', (major, 0, 0, ())), _upper(major)]
+    return [('>=', (major, minor, patch or 0, prerelease)), _upper(major, minor)]
+
+
+def _caret(major, minor, patch, prerelease):
+    if major is None:
+        return [('>=', _ANY)]
+    if minor is None:
+        return [('>=', (major, 0, 0, ())), _upper(major)]
+
+    lower = ('>=', (major, minor, patch or 0, prerelease))
+    if major != 0:
+        return [lower, _upper(major)]
+    if minor != 0 or patch is None:
+        return [lower, _upper(0, minor)]
+    return [lower, ('<', (0, 0, patch + 1, ((0, 0),)))]
+
+
+def _primitive(operator, major, minor, patch, prerelease):
+    if operator == '=':
+        return _x_range(major, minor, patch, prerelease)
+
+    if major is None:
+        return [('>=', _ANY)] if operator in ('>=', '<=') else [_NOTHING]
+
+    if patch is not None:
+        return [(operator, (major, minor, patch, prerelease))]
+
+    if operator == '>':
+        # ">1" означает ">=2.0.0", ">1.2" - ">=1.3.0"
+        return [('>=', (major + 1, 0, 0, ()) if minor is None else (major, minor + 1, 0, ()))]
+    if operator == '>=':
+        return [('>=', (major, minor or 0, 0, ()))]
+    if operator == '<':
+        return [('<', (major, minor or 0, 0, ((0, 0),)))]
+    return [_upper(major, minor)]
+
+
+def _hyphen(lower_text, upper_text):
+    lower = _parse_partial(lower_text)
+    upper = _parse_partial(upper_text)
+
+    comparators = []
+    if lower[0] is not None:
+        comparators.append(('>=', (lower[0], lower[1] or 0, lower[2] or 0, lower[3])))
+
+    major, minor, patch, prerelease = upper
+    if major is None:
+        pass
+    elif minor is None:
+        comparators.append(_upper(major))
+    elif patch is None:
+        comparators.append(_upper(major, minor))
+    else:
+        comparators.append(('<=', (major, minor, patch, prerelease)))
+
+    return comparators or [('>=', _ANY)]
+
+
+def _parse_comparator_set(text):
+    text = text.strip()
+    hyphen = _HYPHEN.match(text)
+    if hyphen:
+        return tuple(_hyphen(hyphen.group(1), hyphen.group(2)))
+
+    comparators = []
+    for token in _OPERATOR_SPACE.sub(r'\1', text).split():
+        operator, rest = _COMPARATOR.match(token).groups()
+        partial = _parse_partial(rest)
+
+        if operator in ('~', '~>'):
+            comparators.extend(_tilde(*partial))
+        elif operator == '^':
+            comparators.extend(_caret(*partial))
+        elif operator:
+            comparators.extend(_primitive(operator, *partial))
+        else:
+            comparators.extend(_x_range(*partial))
+
+    return tuple(comparators) or (('>=', _ANY),)
+
+
+@lru_cache(maxsize=65536)
+def parse_range(spec):
+    if spec is None or not spec.strip():
+        spec = '*'
+    return tuple(_parse_comparator_set(part) for part in spec.split('||'))
+
+
+def _compare(version, operator, bound):
+    version, bound = version_key(version), version_key(bound)
+    if operator == '>=':
+        return version >= bound
+    if operator == '>':
+        return version > bound
+    if operator == '<=':
+        return version <= bound
+    if operator == '<':
+        return version < bound
+    return version == bound
+
+
+def _set_satisfied(version, comparators):
+    if not all(_compare(version, operator, bound) for operator, bound in comparators):
+        return False
+
+    if not version[3]:
+        return True
+
+    # Пре-релиз подходит, только если диапазон явно упоминает пре-релиз той же версии
+    return any(bound[3] and bound[:3] == version[:3] for _, bound in comparators)
+
+
+def satisfies(version, spec):
+    if isinstance(version, str):
+        version = parse_version(version)
+        if version is None:
+            return False
+    return any(_set_satisfied(version, comparators) for comparators in parse_range(spec))
+
+
+def max_satisfying(versions, spec):
+    comparator_sets = parse_range(spec)
+    best = best_key = None
+
+    for text in versions:
+        version = parse_version(text)
+        if version is None:
+            continue
+        if not any(_set_satisfied(version, comparators) for comparators in comparator_sets):
+            continue
+
+        key = version_key(version)
+        if best_key is None or key > best_key:
+            best, best_key = text, key
+
+    return best
+
+
+def resolve(spec, versions, dist_tags):
+    # Возвращает версию из versions для спецификации npm (диапазон, тег или точная версия).
+    # ValueError - спецификация не является semver-диапазоном (git, url, file: и т.п.)
+    spec = (spec or '').strip() or 'latest'
+
+    if spec in versions:
+        return spec
+    if spec in dist_tags:
+        return dist_tags[spec]
+    if spec == 'latest':
+        spec = '*'
+
+    parse_range(spec)
+
+    # Как и npm, предпочитаем версию с тегом latest, если она входит в диапазон
+    latest = dist_tags.get('latest')
+    if latest in versions and satisfies(latest, spec):
+        return latest
+
+    return max_satisfying(versions, spec)
@@ -0,0 +1,154 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from errors import CacheError
+
+DEFAULT_TTL = 3600
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+CacheEntry = namedtuple('CacheEntry', ['metadata', 'etag', 'last_modified', 'fetched_at'])
+
+
+def default_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'dependency-visualizer')
+
+
+class PackageCache:
+    def __init__(self, cache_dir=None, ttl=DEFAULT_TTL, max_size=DEFAULT_MAX_SIZE, max_age=DEFAULT_MAX_AGE):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_age = max_age
+        self.stats = {
+            "hits": 0,
+            "revalidated": 0,
+            "misses": 0,
+            "stored": 0,
+            "evicted": 0
+        }
+        self._lock = threading.Lock()
+        # (реестр, имя) -> время последнего чтения. Попадания не пишут в базу:
+        # время обращения нужно только вытеснению и записывается пачкой перед ним
+        self._accessed = {}
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.cache_dir, 'packuments.sqlite3'),
+                                       check_same_thread=False)
+            # Ключ записи - реестр и имя пакета: зеркало и публичный реестр отдают
+            # разные документы и ETag под одним именем. Таблица прежнего формата
+            # (ключ - только имя) не знает, из какого реестра запись, и пересоздается
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(packuments)")]
+            if columns and 'registry' not in columns:
+                self._db.execute("DROP TABLE packuments")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS packuments (
+                    registry TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    PRIMARY KEY (registry, name)
+                )
+            """)
+            self._db.commit()
+        except (OSError, sqlite3.Error) as e:
+            raise CacheError(f"Не удалось открыть кэш {self.cache_dir}: {e}")
+
+    def get(self, registry, package_name):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT metadata, etag, last_modified, fetched_at FROM packuments WHERE registry = ? AND name = ?",
+                (registry, package_name)
+            ).fetchone()
+            if row is None:
+                return None
+
+            self._accessed[(registry, package_name)] = time.time()
+
+        metadata, etag, last_modified, fetched_at = row
+        return CacheEntry(json.loads(metadata), etag, last_modified, fetched_at)
+
+    def is_fresh(self, entry):
+        return time.time() - entry.fetched_at < self.ttl
+
+    def put(self, registry, package_name, metadata, etag=None, last_modified=None):
+        payload = json.dumps(metadata, separators=(',', ':'))
+        now = time.time()
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO packuments VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (registry, package_name, payload, etag, last_modified, now, now, len(payload))
+            )
+            self._db.commit()
+            self._accessed.pop((registry, package_name), None)
+            self.stats["stored"] += 1
+
+    def touch(self, registry, package_name):
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE packuments SET fetched_at = ?, accessed_at = ? WHERE registry = ? AND name = ?",
+                             (now, now, registry, package_name))
+            self._db.commit()
+            self._accessed.pop((registry, package_name), None)
+
+    def count(self, counter):
+        with self._lock:
+            self.stats[counter] += 1
+
+    def _flush_accessed(self):
+        # Вызывается под блокировкой
+        if self._accessed:
+            self._db.executemany("UPDATE packuments SET accessed_at = ? WHERE registry = ? AND name = ?",
+                                 [(accessed_at, registry, name)
+                                  for (registry, name), accessed_at in self._accessed.items()])
+            self._accessed.clear()
+
+    def evict(self):
+        with self._lock:
+            self._flush_accessed()
+            cursor = self._db.execute("DELETE FROM packuments WHERE accessed_at < ?", (time.time() - self.max_age,))
+            evicted = cursor.rowcount
+
+            total_size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM packuments").fetchone()[0]
+            if total_size > self.max_size:
+                # Вытесняем давно не использованные записи, пока не уложимся в лимит
+                excess = total_size - self.max_size
+                stale = []
+                for registry, name, size in self._db.execute(
+                        "SELECT registry, name, size FROM packuments ORDER BY accessed_at"):
+                    if excess <= 0:
+                        break
+                    stale.append((registry, name))
+                    excess -= size
+
+                self._db.executemany("DELETE FROM packuments WHERE registry = ? AND name = ?", stale)
+                evicted += len(stale)
+
+            self._db.commit()
+            self.stats["evicted"] += evicted
+
+        return evicted
+
+    def summary(self):
+        with self._lock:
+            entries, total_size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM packuments"
+            ).fetchone()
+
+        return dict(self.stats, entries=entries, size=total_size)
+
+    def close(self):
+        try:
+            self.evict()
+        finally:
+            self._db.close()
@@ -0,0 +1,165 @@
+import codecs
+import json
+import re
+from json.decoder import scanstring
+from errors import PackageDataError
+
+DEPENDENCY_TYPES = ('dependencies', 'devDependencies', 'peerDependencies')
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def trim_version(version_data):
+    if not isinstance(version_data, dict):
+        return {}
+    return {
+        dependency_type: version_data[dependency_type]
+        for dependency_type in DEPENDENCY_TYPES
+        if version_data.get(dependency_type)
+    }
+
+
+# Потоковый разбор документа пакета из реестра. Данные подаются кусками по мере
+# загрузки, в памяти остаются только dist-tags и карты зависимостей версий,
+# остальные поля (readme, time, dist, ...) разбираются и сразу отбрасываются.
+class PackumentStreamParser:
+    def __init__(self):
+        self.dist_tags = {}
+        self.versions = {}
+        self.modified = None
+
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._text = ''
+        self._pending = []
+        self._pending_size = 0
+        self._position = 0
+        self._state = self._object_start
+        self._in_versions = False
+        self._done = False
+        self._retry_at = 0
+
+    def feed(self, chunk):
+        if isinstance(chunk, bytes):
+            chunk = self._text_decoder.decode(chunk)
+
+        self._pending.append(chunk)
+        self._pending_size += len(chunk)
+
+        # Крупное значение разбираем заново, только когда буфер заметно вырос,
+        # иначе повторные попытки на каждом куске дали бы квадратичное время
+        if len(self._text) - self._position + self._pending_size < self._retry_at:
+            return
+
+        self._text = self._text[self._position:] + ''.join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        self._position = 0
+        self._retry_at = 0
+
+        while not self._done:
+            if not self._state():
+                self._retry_at = 2 * (len(self._text) - self._position)
+                break
+
+    def close(self):
+        self._retry_at = 0
+        self.feed(self._text_decoder.decode(b'', final=True))
+
+        if not self._done:
+            raise PackageDataError("Ошибка обработки данных: документ пакета оборван")
+
+        metadata = {
+            'dist-tags': self.dist_tags,
+            'versions': self.versions
+        }
+        if self.modified:
+            metadata['modified'] = self.modified
+
+        return metadata
+
+    def _skip_whitespace(self, position):
+        position = _WHITESPACE.match(self._text, position).end()
+        return position if position < len(self._text) else None
+
+    def _object_start(self):
+        position = self._skip_whitespace(self._position)
+        if position is None:
+            return False
+        if self._text[position] != '{':
+            raise PackageDataError("Ошибка обработки данных: ожидался JSON-объект")
+
+        self._position = position + 1
+        self._state = self._member
+        return True
+
+    def _member(self):
+        text = self._text
+        position = self._skip_whitespace(self._position)
+        if position is None:
+            return False
+
+        if text[position] == '}':
+            self._position = position + 1
+            if self._in_versions:
+                self._in_versions = False
+                self._state = self._separator
+            else:
+                self._done = True
+            return True
+
+        if text[position] != '"':
+            raise PackageDataError("Ошибка обработки данных: ожидалось имя поля")
+
+        try:
+            key, end = scanstring(text, position + 1)
+        except json.JSONDecodeError:
+            return False
+
+        colon = self._skip_whitespace(end)
+        if colon is None:
+            return False
+        if text[colon] != ':':
+            raise PackageDataError("Ошибка обработки данных: ожидалось ':'")
+
+        value_start = self._skip_whitespace(colon + 1)
+        if value_start is None:
+            return False
+
+        if not self._in_versions and key == 'versions' and text[value_start] == '{':
+            self._in_versions = True
+            self._position = value_start + 1
+            return True
+
+        try:
+            value, end = self._decoder.raw_decode(text, value_start)
+        except json.JSONDecodeError:
+            return False
+
+        # Значение в самом конце буфера могло быть обрезано (например, число)
+        if end >= len(text):
+            return False
+
+        if self._in_versions:
+            self.versions[key] = trim_version(value)
+        elif key == 'dist-tags' and isinstance(value, dict):
+            self.dist_tags = value
+        elif key == 'modified':
+            self.modified = value
+
+        self._position = end
+        self._state = self._separator
+        return True
+
+    def _separator(self):
+        position = self._skip_whitespace(self._position)
+        if position is None:
+            return False
+
+        separator = self._text[position]
+        if separator == ',':
+            self._position = position + 1
+        elif separator != '}':
+            raise PackageDataError("Ошибка обработки данных: ожидалась ','")
+
+        self._state = self._member
+        return True
@@ -0,0 +1,446 @@
+import json
+import mmap
+import os
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from compact_graph import CompactGraph, format_package_key
+from errors import PackageDataError, PackageNotFoundError
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Кандидат на начало записи верхнего уровня: ',' и кавычка имени пакета
+_CANDIDATE = re.compile(r',[ \t\n\r]*"')
+# Запас сверх границы раздела: последняя запись раздела заканчивается за ней
+TAIL_MARGIN = 64 * 1024
+PARTITIONS_PER_WORKER = 4
+
+
+# Параллельная загрузка всего файла тестового репозитория в CompactGraph для
+# анализа снимков на миллионы пакетов. Файл делится на байтовые диапазоны,
+# процессы пула сами находят начало записей в своем диапазоне, декодируют их и
+# возвращают ребра массивами CSR в разделяемой памяти (pickle только для таблиц
+# строк). Границы разделов сверяются по цепочке: раздел принимается, только если
+# начинается ровно там, где закончил предыдущий, иначе он разбирается заново от
+# известной границы в основном процессе.
+def load_repository_graph(path, workers=1):
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        raise PackageNotFoundError(f"Файл не найден: {path}")
+    except OSError as e:
+        raise PackageDataError(f"Ошибка чтения {path}: {e}")
+
+    first = _object_start(path)
+    if workers <= 1 or size < TAIL_MARGIN * 4:
+        partitions = [_parse_range(path, first, size, trusted=True)]
+    else:
+        count = workers * PARTITIONS_PER_WORKER
+        step = max(1, (size - first) // count)
+        bounds = [first + step * part for part in range(count)] + [size]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_partition_worker, path, bounds[part], bounds[part + 1], part == 0)
+                       for part in range(count)]
+            partitions = [_attach(future.result()) for future in futures]
+        partitions = _verify_chain(path, first, partitions)
+
+    return _merge(partitions)
+
+
+def reachable_subgraph(graph, root_package, max_depth):
+    # Подграф, достижимый от корня не глубже max_depth, с теми же узлами и ключами,
+    # что дает обход DependencyGraphBuilder по этому же файлу в тестовом режиме
+    names = graph.names
+    in_snapshot = {}
+    for node in range(len(graph)):
+        if graph.expanded[node] or node in graph.errors:
+            in_snapshot[names[node]] = node
+
+    keys = []
+    key_ids = {}
+    by_name = {}
+    source = []
+    depth = []
+    errors = {}
+    fetched = {}
+
+    def add(key, old, node_depth, error=None):
+        node = key_ids[key] = len(keys)
+        keys.append(key)
+        source.append(old)
+        depth.append(node_depth)
+        if error is not None:
+            errors[node] = error
+        return node
+
+    def requirement_node(name, spec, node_depth):
+        # Узел, к которому обход разрешит требование (имя, диапазон) на этой глубине
+        requirement = (name, spec)
+        node = fetched.get(requirement)
+        if node is not None:
+            return node
+
+        old = in_snapshot.get(name)
+        if node_depth < max_depth:
+            if old is not None and old not in graph.errors:
+                key = graph.keys[old]
+                node = key_ids.get(key)
+                if node is None:
+                    node = add(key, old, node_depth)
+                    by_name.setdefault(name, node)
+            else:
+                # Пакета нет в файле или запись некорректна: узел ошибки, как у обходчика
+                key = format_package_key(name, spec)
+                node = key_ids.get(key)
+                if node is None:
+                    message = graph.errors.get(old) if old is not None else \
+                        f"Пакет '{name}' не найден в тестовом репозитории"
+                    node = add(key, None, node_depth, message)
+                    by_name.setdefault(name, node)
+            fetched[requirement] = node
+            return node
+
+        # За пределами глубины - лист, как его находит CompactGraph.from_dict
+        for key in (format_package_key(name, spec), name):
+            node = key_ids.get(key)
+            if node is not None:
+                return node
+        node = by_name.get(name)
+        if node is None:
+            node = add(name, None, node_depth)
+        return node
+
+    if max_depth >= 1:
+        requirement_node(root_package, None, 0)
+    else:
+        add(root_package, None, 0)
+
+    offsets = array('I', [0])
+    targets = array('I')
+    edge_specs = array('I')
+    expanded = bytearray()
+    specs = graph.specs
+
+    node = 0
+    while node < len(keys):
+        old = source[node]
+        if old is not None and depth[node] < max_depth and node not in errors:
+            expanded.append(1)
+            for position in range(graph.offsets[old], graph.offsets[old + 1]):
+                target = graph.targets[position]
+                spec_id = graph.edge_specs[position]
+                targets.append(requirement_node(names[target], specs[spec_id], depth[node] + 1))
+                edge_specs.append(spec_id)
+        else:
+            expanded.append(0)
+        offsets.append(len(targets))
+        node += 1
+
+    return CompactGraph(keys, offsets, targets, edge_specs, specs, errors, expanded)
+
+
+class _Partition:
+    __slots__ = ('start', 'end', 'limit', 'keys', 'names', 'errors', 'dependency_names', 'specs',
+                 'offsets', 'targets', 'edge_specs')
+
+    def __init__(self, start, end, limit):
+        self.start = start
+        self.end = end
+        self.limit = limit
+        self.keys = []
+        self.names = []
+        self.errors = {}
+        self.dependency_names = []
+        self.specs = []
+        self.offsets = array('I', [0])
+        self.targets = array('I')
+        self.edge_specs = array('I')
+
+
+def _object_start(path):
+    # Смещение первой записи: после '{' объекта верхнего уровня и пробелов
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+    stripped = head.lstrip(b' \t\r\n\xef\xbb\xbf')
+    if not stripped.startswith(b'{'):
+        raise PackageDataError("Ошибка чтения JSON файла")
+    return len(head) - len(stripped[1:].lstrip(b' \t\r\n'))
+
+
+def _parse_range(path, start, limit, trusted):
+    # Записи, начинающиеся в [start, limit). Без trusted начало первой записи
+    # ищется эвристикой и подтверждается сверкой границ в основном процессе.
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if f.seek(0, 2) else b''
+    try:
+        return _parse_buffer(buffer, start, limit, trusted)
+    finally:
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+
+
+def _parse_buffer(buffer, start, limit, trusted):
+    decoder = json.JSONDecoder()
+    partition = _Partition(None, None, limit)
+    margin = TAIL_MARGIN
+
+    if not trusted:
+        # Произвольная граница могла попасть внутрь многобайтового символа UTF-8
+        while start < limit and 0x80 <= buffer[start] < 0xC0:
+            start += 1
+
+    while True:
+        window_end = min(len(buffer), limit + margin)
+        text = bytes(buffer[start:window_end]).decode('utf-8', errors='ignore')
+        complete = window_end == len(buffer)
+        try:
+            position = _first_entry(text, decoder, trusted)
+            if position is None or (not trusted and start + len(text[:position].encode('utf-8')) >= limit):
+                # Ни одна запись не начинается в диапазоне - его покроет предыдущий раздел
+                return partition
+            _parse_entries(partition, text, position, decoder, start, limit, complete)
+            return partition
+        except _NeedMore:
+            if complete:
+                raise PackageDataError("Ошибка чтения JSON файла")
+            margin *= 4
+            partition = _Partition(None, None, limit)
+
+
+class _NeedMore(Exception):
+    pass
+
+
+def _first_entry(text, decoder, trusted):
+    if trusted:
+        return _WHITESPACE.match(text, 0).end()
+
+    # Запись верхнего уровня - "имя": {объект}, за которой идет ',' или '}'.
+    # Кандидат принимается, если так разбираются несколько записей подряд:
+    # у вложенных полей пакета ("dependencies": {...}) соседи обычно не объекты.
+    for match in _CANDIDATE.finditer(text):
+        position = match.end() - 1
+        if _looks_like_entries(text, position, decoder):
+            return position
+    return None
+
+
+def _looks_like_entries(text, position, decoder, required=4):
+    try:
+        for _ in range(required):
+            if text[position:position + 1] != '"':
+                return False
+            _, position = json.decoder.scanstring(text, position + 1)
+            position = _WHITESPACE.match(text, position).end()
+            if text[position:position + 1] != ':':
+                return False
+            value, position = decoder.raw_decode(text, _WHITESPACE.match(text, position + 1).end())
+            if not isinstance(value, dict):
+                return False
+            position = _WHITESPACE.match(text, position).end()
+            separator = text[position:position + 1]
+            if separator == '}':
+                # Закрыть объект верхнего уровня может только конец файла;
+                # иначе это была вложенная запись ("dependencies": {...}})
+                return not text[position + 1:].strip()
+            if separator != ',':
+                return False
+            position = _WHITESPACE.match(text, position + 1).end()
+        return True
+    except (ValueError, IndexError):
+        return False
+
+
+def _parse_entries(partition, text, position, decoder, base, limit, complete):
+    dependency_ids = {}
+    spec_ids = {}
+    ascii_text = text.isascii()
+    # Позиция в тексте -> смещение в файле; для не-ASCII считается приращениями
+    counted = [0, base]
+
+    def byte_offset(char_position):
+        if ascii_text:
+            return base + char_position
+        last_char, last_byte = counted
+        counted[:] = [char_position, last_byte + len(text[last_char:char_position].encode('utf-8'))]
+        return counted[1]
+
+    partition.start = byte_offset(position)
+
+    while True:
+        if byte_offset(position) >= limit:
+            partition.end = byte_offset(position)
+            return
+
+        if text[position:position + 1] == '}':
+            partition.end = byte_offset(position)
+            return
+        if position >= len(text):
+            raise _NeedMore()
+
+        try:
+            if text[position] != '"':
+                raise PackageDataError("Ошибка чтения JSON файла")
+            name, position = json.decoder.scanstring(text, position + 1)
+            position = _WHITESPACE.match(text, position).end()
+            if text[position:position + 1] != ':':
+                raise ValueError("ожидалось ':'")
+            entry, position = decoder.raw_decode(text, _WHITESPACE.match(text, position + 1).end())
+            position = _WHITESPACE.match(text, position).end()
+            separator = text[position:position + 1]
+        except (ValueError, IndexError):
+            if not complete:
+                raise _NeedMore()
+            raise PackageDataError("Ошибка чтения JSON файла")
+
+        if not separator and not complete:
+            raise _NeedMore()
+
+        node = len(partition.keys)
+        dependencies = entry.get('dependencies', {}) if isinstance(entry, dict) else None
+        if isinstance(dependencies, dict):
+            version = entry.get('version')
+            partition.keys.append(format_package_key(name, version if isinstance(version, str) else ''))
+            for dependency, spec in dependencies.items():
+                dependency_id = dependency_ids.get(dependency)
+                if dependency_id is None:
+                    dependency_id = dependency_ids[dependency] = len(partition.dependency_names)
+                    partition.dependency_names.append(dependency)
+                spec = spec if isinstance(spec, str) else str(spec)
+                spec_id = spec_ids.get(spec)
+                if spec_id is None:
+                    spec_id = spec_ids[spec] = len(partition.specs)
+                    partition.specs.append(spec)
+                partition.targets.append(dependency_id)
+                partition.edge_specs.append(spec_id)
+        else:
+            partition.keys.append(name)
+            partition.errors[node] = f"Некорректная запись пакета '{name}' в тестовом репозитории"
+        partition.names.append(name)
+        partition.offsets.append(len(partition.targets))
+
+        if separator == ',':
+            position = _WHITESPACE.match(text, position + 1).end()
+        elif separator != '}':
+            raise PackageDataError("Ошибка чтения JSON файла")
+
+
+def _partition_worker(path, start, limit, first):
+    # В процессе пула: массивы ребер уходят в разделяемую память, в ответе - ее имя
+    partition = _parse_range(path, start, limit, trusted=first)
+    arrays = (partition.offsets, partition.targets, partition.edge_specs)
+    lengths = [len(values) for values in arrays]
+    size = sum(len(values) * values.itemsize for values in arrays)
+
+    block = _create_shared_block(max(1, size))
+    position = 0
+    for values in arrays:
+        data = values.tobytes()
+        block.buf[position:position + len(data)] = data
+        position += len(data)
+    name = block.name
+    block.close()
+
+    partition.offsets = partition.targets = partition.edge_specs = None
+    return partition, name, lengths
+
+
+def _create_shared_block(size):
+    # Блок освобождает основной процесс после копирования; трекер ресурсов
+    # процесса пула не должен удалять его сам при завершении процесса
+    try:
+        return shared_memory.SharedMemory(create=True, size=size, track=False)
+    except TypeError:
+        block = shared_memory.SharedMemory(create=True, size=size)
+        resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+def _attach(result):
+    partition, name, lengths = result
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        position = 0
+        arrays = []
+        for length in lengths:
+            values = array('I')
+            size = length * values.itemsize
+            values.frombytes(block.buf[position:position + size])
+            position += size
+            arrays.append(values)
+    finally:
+        block.close()
+        block.unlink()
+
+    partition.offsets, partition.targets, partition.edge_specs = arrays
+    return partition
+
+
+def _verify_chain(path, first, partitions):
+    # Раздел верен, если начинается там, где закончил предыдущий (первый - от
+    # начала объекта); иначе он разбирается от известной границы заново
+    verified = []
+    position = first
+    for partition in partitions:
+        if partition.limit <= position:
+            # Весь диапазон уже разобран предыдущим разделом
+            continue
+        if partition.start != position:
+            partition = _parse_range(path, position, partition.limit, trusted=True)
+        verified.append(partition)
+        position = partition.end
+    return verified
+
+
+def _merge(partitions):
+    keys = []
+    errors = {}
+    node_by_name = {}
+
+    for partition in partitions:
+        base = len(keys)
+        keys.extend(partition.keys)
+        for node, message in partition.errors.items():
+            errors[base + node] = message
+        for node, name in enumerate(partition.names):
+            # Повтор имени в файле: как и json.load, берется последняя запись
+            node_by_name[name] = base + node
+
+    source_count = len(keys)
+    specs = []
+    spec_index = {}
+    offsets = array('I', [0])
+    targets = array('I')
+    edge_specs = array('I')
+
+    for partition in partitions:
+        mapping = array('I')
+        for name in partition.dependency_names:
+            node = node_by_name.get(name)
+            if node is None:
+                # Зависимость, которой нет в файле, - лист без данных
+                node = node_by_name[name] = len(keys)
+                keys.append(name)
+            mapping.append(node)
+
+        spec_mapping = array('I')
+        for spec in partition.specs:
+            spec_id = spec_index.get(spec)
+            if spec_id is None:
+                spec_id = spec_index[spec] = len(specs)
+                specs.append(spec)
+            spec_mapping.append(spec_id)
+
+        base = len(targets)
+        targets.extend(map(mapping.__getitem__, partition.targets))
+        edge_specs.extend(map(spec_mapping.__getitem__, partition.edge_specs))
+        offsets.extend(base + offset for offset in partition.offsets[1:])
+
+    expanded = bytearray(b'\x01') * source_count
+    for node in errors:
+        expanded[node] = 0
+    leaves = len(keys) - source_count
+    offsets.extend([len(targets)] * leaves)
+    expanded.extend(bytes(leaves))
+
+    return CompactGraph(keys, offsets, targets, edge_specs, specs, errors, expanded)
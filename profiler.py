@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import time
+
+PERCENTILES = (50, 95, 99)
+
+
+# Профилирование прогона (--profile): интервалы (spans) с аргументами, выборки
+# длительностей и счетчики. Интервалы пишутся в формате Chrome trace-event
+# (chrome://tracing, Perfetto). Без --profile компоненты получают NULL_PROFILER,
+# у которого все методы пустые, и инструментирование почти ничего не стоит.
+class Profiler:
+    enabled = True
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._threads = {}
+        self.spans = []
+        self.samples = {}
+        self.counters = {}
+
+    def span(self, name, category='run', **args):
+        return _Span(self, name, category, args)
+
+    def add_span(self, name, category, start, duration, **args):
+        thread = self._thread_id()
+        with self._lock:
+            self.spans.append((name, category, start, duration, thread, args))
+            self.samples.setdefault(name, []).append(duration)
+
+    def observe(self, name, value):
+        # Выборка без интервала на временной шкале (например, время разбора JSON)
+        with self._lock:
+            self.samples.setdefault(name, []).append(value)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _thread_id(self):
+        ident = threading.get_ident()
+        thread = self._threads.get(ident)
+        if thread is None:
+            with self._lock:
+                thread = self._threads.setdefault(ident, (len(self._threads) + 1, threading.current_thread().name))
+        return thread[0]
+
+    def stage_stats(self):
+        # Имя -> число, сумма, p50/p95/p99, максимум (в секундах)
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self.samples.items()}
+
+        stats = {}
+        for name, values in samples.items():
+            entry = {"count": len(values), "total": sum(values), "max": values[-1]}
+            for percentile in PERCENTILES:
+                entry[f"p{percentile}"] = _percentile(values, percentile)
+            stats[name] = entry
+        return stats
+
+    def slowest(self, name, limit=10):
+        # Самые долгие интервалы с данным именем: (длительность, аргументы)
+        with self._lock:
+            spans = [(span[3], span[5]) for span in self.spans if span[0] == name]
+        return sorted(spans, key=lambda item: item[0], reverse=True)[:limit]
+
+    def critical_path(self):
+        # Обход идет по уровням, и уровень заканчивается вместе с самым медленным
+        # пакетом в нем: критический путь - самый медленный пакет каждого уровня
+        slowest = {}
+        with self._lock:
+            for name, _, _, duration, _, args in self.spans:
+                if name != 'package':
+                    continue
+                depth = args.get('depth', 0)
+                if depth not in slowest or duration > slowest[depth][0]:
+                    slowest[depth] = (duration, args.get('package'))
+        return [(depth, package, duration) for depth, (duration, package) in sorted(slowest.items())]
+
+    def write_chrome_trace(self, path):
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+            threads = list(self._threads.values())
+            counters = dict(self.counters)
+
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                  for tid, name in threads]
+        end = 0
+        for name, category, start, duration, tid, args in spans:
+            ts = (start - self._origin) * 1e6
+            end = max(end, ts + duration * 1e6)
+            events.append({"name": name, "cat": category, "ph": "X", "ts": round(ts, 3),
+                           "dur": round(duration * 1e6, 3), "pid": pid, "tid": tid, "args": args})
+        for name, value in counters.items():
+            events.append({"name": name, "ph": "C", "ts": round(end, 3), "pid": pid, "args": {name: value}})
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        return path
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'category', 'args', 'start')
+
+    def __init__(self, profiler, name, category, args):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.profiler.add_span(self.name, self.category, self.start, duration, **self.args)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class NullProfiler:
+    enabled = False
+
+    def span(self, name, category='run', **args):
+        return _NULL_SPAN
+
+    def add_span(self, name, category, start, duration, **args):
+        pass
+
+    def observe(self, name, value):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+
+def _percentile(values, percentile):
+    # Ближайший ранг по отсортированной выборке
+    rank = max(1, -(-len(values) * percentile // 100))
+    return values[rank - 1]
+
+
+_NULL_SPAN = _NullSpan()
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,128 @@
+import json
+import re
+from fnmatch import fnmatchcase
+from errors import ValidationError
+
+# Короткие имена типов зависимостей -> поля версии пакета в реестре
+DEPENDENCY_TYPE_NAMES = {
+    'prod': 'dependencies',
+    'dev': 'devDependencies',
+    'peer': 'peerDependencies'
+}
+
+
+def parse_dependency_types(text):
+    # "prod,peer" -> ('dependencies', 'peerDependencies')
+    types = []
+    for item in text.split(',') if isinstance(text, str) else text:
+        item = item.strip()
+        if not item:
+            continue
+        field = DEPENDENCY_TYPE_NAMES.get(item, item)
+        if field not in DEPENDENCY_TYPE_NAMES.values():
+            raise ValidationError(f"Неизвестный тип зависимостей: {item} (допустимы: "
+                                  f"{', '.join(DEPENDENCY_TYPE_NAMES)})")
+        if field not in types:
+            types.append(field)
+    if not types:
+        raise ValidationError("Список типов зависимостей пуст")
+    return tuple(types)
+
+
+def compile_pattern(pattern):
+    # "re:<выражение>" - регулярное выражение, иначе glob по имени пакета
+    if pattern.startswith('re:'):
+        try:
+            return re.compile(pattern[3:]).search
+        except re.error as e:
+            raise ValidationError(f"Некорректное регулярное выражение {pattern!r}: {e}")
+    return lambda name: fnmatchcase(name, pattern)
+
+
+# Правила отсечения обхода (--include, --exclude, --exclude-scope,
+# --dependency-types, --depth-override или файл --prune). Проверяются в
+# построителе до постановки зависимости в очередь, поэтому отсеченный пакет
+# не загружается вовсе.
+#
+# Файл --prune (JSON):
+# {"include": [шаблон], "exclude": [шаблон], "exclude_scopes": ["@scope"],
+#  "dependency_types": ["prod", "peer"], "root_dependency_types": ["prod", "dev"],
+#  "depth": {шаблон: уровней зависимостей под пакетом}}
+class PruningSpec:
+    def __init__(self, include=(), exclude=(), exclude_scopes=(), dependency_types=None,
+                 root_dependency_types=None, depth_overrides=None):
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.exclude_scopes = [scope if scope.startswith('@') else f"@{scope}" for scope in exclude_scopes]
+        self.dependency_types = parse_dependency_types(dependency_types) if dependency_types else None
+        # У корня свои типы: devDependencies самого проекта обычно нужны, транзитивные - нет
+        self.root_dependency_types = (parse_dependency_types(root_dependency_types) if root_dependency_types
+                                      else self.dependency_types)
+        self.depth_overrides = dict(depth_overrides or {})
+
+        for pattern, depth in self.depth_overrides.items():
+            if not isinstance(depth, int) or depth < 0:
+                raise ValidationError(f"Глубина для {pattern!r} должна быть неотрицательным целым")
+
+        self._include = [compile_pattern(pattern) for pattern in self.include]
+        self._exclude = [compile_pattern(pattern) for pattern in self.exclude]
+        self._exclude += [compile_pattern(f"{scope}/*") for scope in self.exclude_scopes]
+        self._depth = [(compile_pattern(pattern), depth) for pattern, depth in self.depth_overrides.items()]
+        self._allowed = {}
+        self._limits = {}
+
+    @classmethod
+    def from_file(cls, path, **overrides):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except OSError as e:
+            raise ValidationError(f"Не удалось прочитать правила отсечения {path}: {e}")
+        except json.JSONDecodeError as e:
+            raise ValidationError(f"Ошибка чтения JSON правил отсечения {path}: {e}")
+
+        if not isinstance(data, dict):
+            raise ValidationError(f"Правила отсечения {path} должны быть JSON-объектом")
+
+        # Параметры командной строки дополняют файл
+        return cls(
+            include=list(data.get('include', [])) + list(overrides.get('include', [])),
+            exclude=list(data.get('exclude', [])) + list(overrides.get('exclude', [])),
+            exclude_scopes=list(data.get('exclude_scopes', [])) + list(overrides.get('exclude_scopes', [])),
+            dependency_types=overrides.get('dependency_types') or data.get('dependency_types'),
+            root_dependency_types=overrides.get('root_dependency_types') or data.get('root_dependency_types'),
+            depth_overrides=dict(data.get('depth', {}), **overrides.get('depth_overrides', {}))
+        )
+
+    def allows(self, name):
+        # Проходит ли пакет фильтры имен; результат запоминается по имени
+        allowed = self._allowed.get(name)
+        if allowed is None:
+            allowed = (not self._include or any(match(name) for match in self._include)) and \
+                not any(match(name) for match in self._exclude)
+            self._allowed[name] = allowed
+        return allowed
+
+    def depth_limit(self, name):
+        # Сколько уровней зависимостей раскрывать под пакетом (None - без ограничения)
+        if name not in self._limits:
+            self._limits[name] = next((depth for match, depth in self._depth if match(name)), None)
+        return self._limits[name]
+
+    def types_for(self, depth):
+        return self.root_dependency_types if depth == 0 else self.dependency_types
+
+    @property
+    def filters_names(self):
+        return bool(self._include or self._exclude)
+
+    def describe(self):
+        # Параметры для журнала обхода и снимка: по ним сверяется, что граф строился так же
+        return {
+            "include": self.include,
+            "exclude": self.exclude,
+            "exclude_scopes": self.exclude_scopes,
+            "dependency_types": list(self.dependency_types) if self.dependency_types else None,
+            "root_dependency_types": list(self.root_dependency_types) if self.root_dependency_types else None,
+            "depth": self.depth_overrides
+        }
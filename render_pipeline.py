@@ -0,0 +1,203 @@
+import os
+from array import array
+from contextlib import contextmanager
+from html import escape as html_escape
+from compact_graph import as_compact_graph, split_package_key
+from profiler import NULL_PROFILER
+
+# Формат --formats -> (расширение файла, подпись в выводе)
+OUTPUT_FORMATS = {
+    'svg': ('.svg', 'SVG'),
+    'puml': ('.puml', 'PlantUML'),
+    'txt': ('.txt', 'Текст'),
+    'jsonl': ('.jsonl', 'JSONL'),
+    'graphml': ('.graphml', 'GRAPHML'),
+    'dot': ('.dot', 'DOT'),
+    'edges': ('.edges', 'EDGES')
+}
+
+# Другие названия форматов в --formats
+FORMAT_ALIASES = {'plantuml': 'puml', 'text': 'txt', 'json': 'jsonl', 'gv': 'dot'}
+
+# Форматы визуализатора (--formats -> SimpleGraphVisualizer.write); остальные -
+# выгрузки graph_exporters
+VISUAL_FORMATS = {'svg': 'svg', 'puml': 'plantuml', 'txt': 'text'}
+VISUAL_EXTENSIONS = {'.svg': 'svg', '.puml': 'puml', '.txt': 'txt'}
+
+BINARY_FORMATS = ('edges',)
+
+# Прежний набор для --output без однозначного формата (.png, .jpg)
+LEGACY_FORMATS = ('puml', 'txt', 'svg')
+
+NODE_LEAF = 0
+NODE_EXPANDED = 1
+NODE_ERROR = 2
+
+# Изменения узлов и ребер в графе сравнения версий (--diff-version)
+CHANGE_NONE = 0
+CHANGE_ADDED = 1
+CHANGE_REMOVED = 2
+CHANGE_UPGRADED = 3
+CHANGE_NAMES = ('unchanged', 'added', 'removed', 'upgraded')
+
+
+def parse_formats(text):
+    # "svg,puml,json" -> ['svg', 'puml', 'jsonl'] без повторов; ValueError на неизвестном
+    formats = []
+    for value in text.split(','):
+        value = value.strip().lower().lstrip('.')
+        if not value:
+            continue
+        value = FORMAT_ALIASES.get(value, value)
+        if value not in OUTPUT_FORMATS:
+            raise ValueError(f"Неизвестный формат: {value} (доступны: {', '.join(OUTPUT_FORMATS)})")
+        if value not in formats:
+            formats.append(value)
+    if not formats:
+        raise ValueError("Не указано ни одного формата")
+    return formats
+
+
+def output_files(base_name, formats, output_filename=None):
+    # [(формат, файл)]; формат, совпадающий с расширением --output, сохраняет
+    # это расширение (.gv, .SVG)
+    extension = os.path.splitext(output_filename)[1] if output_filename else ''
+    files = []
+    for output_format in formats:
+        default = OUTPUT_FORMATS[output_format][0]
+        same = extension.lower() == default or (output_format == 'dot' and extension.lower() == '.gv')
+        files.append((output_format, base_name + (extension if same else default)))
+    return files
+
+
+def escape(text):
+    # Как xml.sax.saxutils.escape (&, <, >), но без загрузки urllib.request и ssl
+    return html_escape(text, quote=False)
+
+
+@contextmanager
+def atomic_open(filename, binary=False):
+    # Файл пишется во временный рядом с целевым и переименовывается только после
+    # успешной записи: читатель видит прежний файл или новый целиком, а не обрывок
+    temporary = f"{filename}.tmp"
+    if binary:
+        f = open(temporary, 'wb')
+    else:
+        f = open(temporary, 'w', encoding='utf-8', newline='\n')
+    try:
+        with f:
+            yield f
+        os.replace(temporary, filename)
+    except BaseException:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+
+
+# Данные для вывода, общие для всех форматов: собираются одним проходом по графу
+# перед записью, и ни один писатель не делит ключи и не обходит смежность заново.
+# names/versions - имя и версия узла, states - лист, раскрыт или ошибка,
+# sources - источник каждого ребра в порядке CSR (пара к graph.targets),
+# fetched - узлы, для которых загружались данные. У графа сравнения версий
+# changes - (изменения узлов, изменения ребер в порядке CSR) из CHANGE_*, иначе None.
+class RenderInput:
+    __slots__ = ('graph', 'names', 'versions', 'states', 'sources', 'fetched', 'node_changes', 'edge_changes')
+
+    def __init__(self, graph, changes=None):
+        graph = as_compact_graph(graph)
+        self.graph = graph
+        self.node_changes, self.edge_changes = changes or (None, None)
+
+        self.names = graph.names
+        self.versions = [split_package_key(key)[1] for key in graph.keys]
+
+        errors, expanded = graph.errors, graph.expanded
+        states = bytearray(len(graph))
+        fetched = []
+        for node in range(len(graph)):
+            if node in errors:
+                states[node] = NODE_ERROR
+            elif expanded[node]:
+                states[node] = NODE_EXPANDED
+            else:
+                continue
+            fetched.append(node)
+        self.states = states
+        self.fetched = fetched
+
+        offsets = graph.offsets
+        sources = array('I')
+        for node in range(len(graph)):
+            count = offsets[node + 1] - offsets[node]
+            if count:
+                sources.extend(array('I', (node,)) * count)
+        self.sources = sources
+
+    def __len__(self):
+        return len(self.graph)
+
+    def edges(self):
+        # (источник, цель, номер строки диапазона) в порядке CSR
+        return zip(self.sources, self.graph.targets, self.graph.edge_specs)
+
+
+def as_render_input(graph):
+    return graph if isinstance(graph, RenderInput) else RenderInput(graph)
+
+
+# Однопроходный вывод: граф один раз готовится в RenderInput, и все запрошенные
+# форматы пишутся из него по очереди, каждый - через atomic_open. Ошибка одного
+# формата не мешает остальным. Писатели собирают строки под GIL, поэтому пул
+# потоков (workers > 1, --render-workers) включается только явно: на малых
+# графах он медленнее последовательной записи, выигрыш - на больших графах с
+# несколькими тяжелыми форматами (см. bench_render_pipeline).
+class RenderPipeline:
+    def __init__(self, profiler=None, workers=1, layout='layered'):
+        self.profiler = profiler or NULL_PROFILER
+        self.workers = workers
+        self.layout = layout
+
+    def run(self, graph, outputs, title="Граф зависимостей", changes=None):
+        # outputs - [(формат, файл)]; возвращает ([(подпись, файл)], [ошибки]);
+        # changes - разметка графа сравнения версий (см. RenderInput)
+        graph = as_compact_graph(graph)
+        with self.profiler.span('prepare', 'output', nodes=len(graph)):
+            render = RenderInput(graph, changes)
+
+        if len(outputs) > 1 and self.workers and self.workers > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            # SVG с раскладкой - самый долгий, он уходит в пул первым
+            ordered = sorted(outputs, key=lambda output: output[0] != 'svg')
+            with ThreadPoolExecutor(min(self.workers, len(outputs))) as pool:
+                futures = {output: pool.submit(self._write, render, *output, title) for output in ordered}
+            results = [futures[output].result() for output in outputs]
+        else:
+            results = [self._write(render, *output, title) for output in outputs]
+
+        files_created = []
+        errors = []
+        for (output_format, filename), error in zip(outputs, results):
+            label = OUTPUT_FORMATS[output_format][1]
+            if error is None:
+                files_created.append((label, filename))
+            else:
+                errors.append(f"{label}: {error}")
+        return files_created, errors
+
+    def _write(self, render, output_format, filename, title):
+        try:
+            with self.profiler.span(output_format, 'output', file=filename):
+                if output_format in VISUAL_FORMATS:
+                    from simple_visualizer import SimpleGraphVisualizer
+                    with atomic_open(filename) as f:
+                        SimpleGraphVisualizer(self.profiler, self.layout).write(f, render, VISUAL_FORMATS[output_format],
+                                                                                title)
+                else:
+                    from graph_exporters import EXPORTERS
+                    with atomic_open(filename, output_format in BINARY_FORMATS) as f:
+                        EXPORTERS[output_format](render, f)
+            return None
+        except Exception as e:
+            return e
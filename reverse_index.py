@@ -0,0 +1,139 @@
+from collections import deque
+from compact_graph import package_display_name
+
+
+# Индекс обратных зависимостей поверх CompactGraph: строится один раз на граф,
+# после чего каждый запрос "кто тянет пакет X?" обходит только ту часть графа,
+# которая входит в ответ (прямые и транзитивные зависимые, пути от корня).
+class ReverseDependencyIndex:
+    def __init__(self, graph):
+        self.graph = graph
+        self.offsets, self.sources = graph.reverse_adjacency()
+
+        self._reachable_from = {}
+        self._cyclic = None
+
+        self._nodes_by_name = {}
+        for node, name in enumerate(graph.names):
+            self._nodes_by_name.setdefault(name, []).append(node)
+
+    def nodes(self, package):
+        # Узлы пакета: точный ключ "name@1.2.3" или все версии по имени
+        node = self.graph.node_id(package)
+        if node is not None:
+            return [node]
+        return self._nodes_by_name.get(package_display_name(package), [])
+
+    def direct_dependents(self, package):
+        dependents = {}
+        for target in self.nodes(package):
+            for source in self._predecessors(target):
+                dependents[source] = None
+        return list(dependents)
+
+    def transitive_dependents(self, package):
+        # Обратный BFS от узлов пакета; ближайшие зависимые идут первыми
+        targets = self.nodes(package)
+        seen = set(targets)
+        queue = deque(targets)
+        dependents = []
+
+        while queue:
+            node = queue.popleft()
+            for source in self._predecessors(node):
+                if source not in seen:
+                    seen.add(source)
+                    dependents.append(source)
+                    queue.append(source)
+
+        return dependents
+
+    def paths(self, package, limit=None, root=0):
+        # Все простые пути root -> пакет: обратный DFS от цели, узлы пути не повторяются.
+        # Число путей может расти экспоненциально, поэтому limit ограничивает выдачу.
+        # Шаг назад делается только в узел, из которого путь к root еще есть: узел
+        # достижим от root, а если он в цикле - то и в обход узлов пути. Тупиковых
+        # ветвей нет, и работа растет с числом найденных путей, а не всех цепочек.
+        reachable = self._reachable(root)
+        component = self.graph.analysis().component
+        cyclic = self._cyclic_components()
+        paths = []
+
+        for target in self.nodes(package):
+            if not reachable[target]:
+                continue
+            if target == root:
+                paths.append([root])
+                continue
+
+            path = [target]
+            on_path = {target}
+            stack = [iter(self._predecessors(target))]
+
+            while stack:
+                if limit is not None and len(paths) >= limit:
+                    return paths
+
+                source = next(stack[-1], None)
+                if source is None:
+                    stack.pop()
+                    on_path.discard(path.pop())
+                    continue
+
+                if source in on_path or not reachable[source]:
+                    continue
+                if source == root:
+                    paths.append([root] + path[::-1])
+                    continue
+                if component[source] in cyclic and not self._leads_to_root(source, root, on_path, reachable):
+                    continue
+
+                path.append(source)
+                on_path.add(source)
+                stack.append(iter(self._predecessors(source)))
+
+        return paths
+
+    def _reachable(self, root):
+        # Узлы, достижимые от root (прямой BFS); считается один раз на корень
+        reachable = self._reachable_from.get(root)
+        if reachable is None:
+            reachable = bytearray(len(self.graph))
+            reachable[root] = 1
+            queue = deque([root])
+            while queue:
+                for target in self.graph.successors(queue.popleft()):
+                    if not reachable[target]:
+                        reachable[target] = 1
+                        queue.append(target)
+            self._reachable_from[root] = reachable
+        return reachable
+
+    def _cyclic_components(self):
+        if self._cyclic is None:
+            self._cyclic = {component_id for component_id, members in enumerate(self.graph.analysis().components)
+                            if len(members) > 1}
+        return self._cyclic
+
+    def _leads_to_root(self, node, root, on_path, reachable):
+        # Достижим ли node от root в обход узлов пути. Узлы пути - потомки node,
+        # поэтому перекрыть путь они могут только внутри его компоненты сильной
+        # связности: предок из другой компоненты уже годится, и поиск из нее не выходит
+        component = self.graph.analysis().component
+        home = component[node]
+        seen = {node}
+        queue = deque([node])
+
+        while queue:
+            for source in self._predecessors(queue.popleft()):
+                if source in seen or source in on_path or not reachable[source]:
+                    continue
+                if source == root or component[source] != home:
+                    return True
+                seen.add(source)
+                queue.append(source)
+
+        return False
+
+    def _predecessors(self, node):
+        return self.sources[self.offsets[node]:self.offsets[node + 1]]
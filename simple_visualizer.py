@@ -1,170 +1,207 @@
+import io
 import os
-import math
-from collections import deque
+from layered_layout import LayeredLayout, NODE_HEIGHT
+from profiler import NULL_PROFILER
+from render_pipeline import (CHANGE_NAMES, NODE_ERROR, NODE_EXPANDED, NODE_LEAF, as_render_input,
+                             atomic_open, escape)
+
+# Раскладки SVG (--layout)
+LAYOUTS = ('layered', 'stress')
+
+# Состояние узла (RenderInput.states) -> класс прямоугольника в SVG
+NODE_CLASSES = {NODE_LEAF: 'node-leaf', NODE_EXPANDED: 'node', NODE_ERROR: 'node-error'}
+EDGE_CLASSES = ('edge', 'edge edge-back')
+
+# Разметка графа сравнения версий (CHANGE_*): классы SVG, цвета PlantUML, метки текста
+CHANGE_CLASSES = tuple(f' change-{name}' if index else '' for index, name in enumerate(CHANGE_NAMES))
+PLANTUML_NODE_COLORS = ('', ' #palegreen', ' #pink', ' #khaki')
+PLANTUML_EDGE_ARROWS = ('-->', '-[#green]->', '-[#red,dashed]->', '-[#orange]->')
+CHANGE_MARKS = ('', '+ ', '- ', '~ ')
+
+# Элементов SVG в одной записи в файл
+WRITE_CHUNK = 4096
 
 
 class SimpleGraphVisualizer:
+    def __init__(self, profiler=None, layout='layered'):
+        self.profiler = profiler or NULL_PROFILER
+        self.layout = layout
+
     def generate_svg(self, graph, output_filename, title="Граф зависимостей"):
         try:
-            simplified = self._simplify_graph(graph)
-            layout = self._create_layout(simplified)
-            svg_content = self._generate_svg_content(simplified, layout, title)
-
-            with open(output_filename, 'w', encoding='utf-8') as f:
-                f.write(svg_content)
-
+            with self.profiler.span('svg', 'output', file=output_filename), atomic_open(output_filename) as f:
+                self.write(f, as_render_input(graph), 'svg', title)
             return output_filename
         except Exception as e:
             raise Exception(f"Ошибка создания SVG: {e}")
 
     def save_plantuml_code(self, graph, filename, title="Граф зависимостей"):
         try:
-            code = self._generate_plantuml_code(graph, title)
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(code)
+            with self.profiler.span('plantuml', 'output', file=filename), atomic_open(filename) as f:
+                self.write(f, as_render_input(graph), 'plantuml', title)
             return filename
         except Exception as e:
             raise Exception(f"Ошибка создания PlantUML: {e}")
 
     def save_text_diagram(self, graph, filename, title="Граф зависимостей"):
         try:
-            text = self._generate_text_diagram(graph, title)
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(text)
+            with self.profiler.span('text', 'output', file=filename), atomic_open(filename) as f:
+                self.write(f, as_render_input(graph), 'text', title)
             return filename
         except Exception as e:
             raise Exception(f"Ошибка создания текста: {e}")
 
-    def _simplify_graph(self, graph, max_nodes=15):
-        simplified = {}
-        for i, (node, deps) in enumerate(graph.items()):
-            if i >= max_nodes:
-                break
-            simplified[node] = {k: v for j, (k, v) in enumerate(deps.items()) if j < 5 and "ERROR" not in k}
-        return simplified
-
-    def _create_layout(self, graph):
-        layout = {}
-        if not graph:
-            return layout
-
-        root = next(iter(graph.keys()))
-        levels = {root: 0}
-        queue = deque([root])
-
-        while queue:
-            node = queue.popleft()
-            if node in graph:
-                for child in graph[node]:
-                    if child not in levels:
-                        levels[child] = levels[node] + 1
-                        queue.append(child)
-
-        for level in set(levels.values()):
-            level_nodes = [n for n, l in levels.items() if l == level]
-            for i, node in enumerate(level_nodes):
-                x = 100 + i * 200
-                y = 100 + level * 120
-                layout[node] = (x, y)
-
-        return layout
-
-    def _generate_svg_content(self, graph, layout, title):
-        width, height = 800, 600
-        if layout:
-            max_x = max(x for x, y in layout.values()) + 150
-            max_y = max(y for x, y in layout.values()) + 150
-            width, height = max(800, max_x), max(600, max_y)
-
-        lines = [
-            '<?xml version="1.0" encoding="UTF-8"?>',
-            f'<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">',
-            '<style>',
-            '  .node { fill: #e3f2fd; stroke: #1565c0; stroke-width: 2; rx: 5; }',
-            '  .node-text { font-family: Arial; font-size: 12px; fill: #0d47a1; }',
-            '  .edge { stroke: #666; stroke-width: 2; fill: none; }',
-            '  .title { font-family: Arial; font-size: 16px; fill: #333; }',
-            '</style>',
-            f'<text x="20" y="30" class="title">{title}</text>',
-        ]
-
-        for source, deps in graph.items():
-            if source in layout:
-                for target in deps:
-                    if target in layout:
-                        lines.extend(self._create_arrow(layout[source], layout[target]))
-
-        for node, (x, y) in layout.items():
-            name = node.split('@')[0] if '@' in node else node
-            lines.append(f'<rect x="{x - 40}" y="{y - 15}" width="80" height="30" class="node"/>')
-            lines.append(f'<text x="{x}" y="{y + 5}" class="node-text" text-anchor="middle">{name}</text>')
-
-        lines.append('</svg>')
-        return '\n'.join(lines)
-
-    def _create_arrow(self, start, end):
-        x1, y1 = start
-        x2, y2 = end
-
-        dx, dy = x2 - x1, y2 - y1
-        length = (dx ** 2 + dy ** 2) ** 0.5
-        if length == 0:
-            return []
-
-        dx, dy = dx / length * 30, dy / length * 30
-        x1, y1 = x1 + dx, y1 + dy
-        x2, y2 = x2 - dx, y2 - dy
-
-        return [f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" class="edge"/>']
-
-    def _generate_plantuml_code(self, graph, title):
-        lines = ["@startuml", f"title {title}", "skinparam monochrome true", ""]
-
-        nodes = set()
-        for package, deps in graph.items():
-            nodes.add(package)
-            nodes.update(deps.keys())
-
-        for node in nodes:
-            if "ERROR" not in node:
-                name = node.split('@')[0] if '@' in node else node
-                lines.append(f'rectangle "{name}"')
-
-        lines.append("")
-
-        for package, deps in graph.items():
-            for dep, version in deps.items():
-                if "ERROR" not in dep:
-                    p_name = package.split('@')[0] if '@' in package else package
-                    d_name = dep.split('@')[0] if '@' in dep else dep
-                    lines.append(f'"{p_name}" --> "{d_name}"')
-
-        lines.extend(["", "@enduml"])
-        return "\n".join(lines)
-
-    def _generate_text_diagram(self, graph, title):
+    def render(self, graph, output_format, title="Граф зависимостей"):
+        # Документ в памяти для --serve: 'svg', 'plantuml' или 'text'
+        buffer = io.StringIO()
+        with self.profiler.span(output_format, 'output', nodes=len(graph)):
+            self.write(buffer, as_render_input(graph), output_format, title)
+        return buffer.getvalue()
+
+    def write(self, f, render, output_format, title="Граф зависимостей"):
+        # Документ в открытый файл; render - RenderInput, общий для всех форматов прогона
+        if output_format == 'svg':
+            with self.profiler.span('layout', 'output', nodes=len(render), layout=self.layout):
+                layout = self._layout_class()(render.graph).compute()
+            self._write_svg(f, render, layout, title)
+        elif output_format == 'plantuml':
+            self._write_plantuml(f, render, title)
+        elif output_format == 'text':
+            f.write(self._generate_text_diagram(render, title))
+        else:
+            raise ValueError(f"Неизвестный формат: {output_format}")
+
+    def _layout_class(self):
+        if self.layout == 'stress':
+            from stress_layout import StressLayout
+            return StressLayout
+        if self.layout == 'layered':
+            return LayeredLayout
+        raise ValueError(f"Неизвестная раскладка: {self.layout}")
+
+    def _write_svg(self, f, render, layout, title):
+        # SVG пишется в файл пачками по WRITE_CHUNK элементов, без сборки всего
+        # документа в памяти. Точки ребер (уже обрезанные по рамкам узлов) приходят
+        # от раскладки одним набором и форматируются одним списком
+        width = max(layout.total_width, 40 + len(title) * 9)
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(f'<svg width="{width:.0f}" height="{layout.total_height:.0f}" '
+                f'xmlns="http://www.w3.org/2000/svg">\n')
+        f.write('<style>\n'
+                '  .node { fill: #e3f2fd; stroke: #1565c0; stroke-width: 2; }\n'
+                '  .node-error { fill: #ffebee; stroke: #c62828; stroke-width: 2; }\n'
+                '  .node-leaf { fill: #f5f5f5; stroke: #9e9e9e; stroke-width: 1; }\n'
+                '  .node-text { font-family: Arial; font-size: 12px; fill: #0d47a1; }\n'
+                '  .edge { stroke: #666; stroke-width: 1.5; fill: none; marker-end: url(#arrow); }\n'
+                '  .edge-back { stroke: #c62828; stroke-dasharray: 4 3; }\n'
+                '  .title { font-family: Arial; font-size: 16px; fill: #333; }\n')
+        if render.node_changes is not None:
+            f.write('  .change-added { fill: #e8f5e9; stroke: #2e7d32; }\n'
+                    '  .change-removed { fill: #fafafa; stroke: #c62828; stroke-dasharray: 4 3; }\n'
+                    '  .change-upgraded { fill: #fff8e1; stroke: #f9a825; }\n'
+                    '  .edge.change-added { stroke: #2e7d32; }\n'
+                    '  .edge.change-removed { stroke: #c62828; stroke-dasharray: 6 4; }\n'
+                    '  .edge.change-upgraded { stroke: #f9a825; }\n')
+        f.write('</style>\n')
+        f.write('<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="6" '
+                'markerHeight="6" orient="auto"><path d="M0,0 L10,5 L0,10 z" fill="#666"/></marker></defs>\n')
+        f.write(f'<text x="20" y="30" class="title">{escape(title)}</text>\n')
+
+        starts, px, py = layout.edge_points()
+        points = [f'{point_x:.1f},{point_y:.1f}' for point_x, point_y in zip(px, py)]
+        back = layout.back
+        edge_classes = [EDGE_CLASSES[reversed_edge] for reversed_edge in back]
+        node_classes = [NODE_CLASSES[state] for state in render.states]
+        if render.node_changes is not None:
+            self._mark_changes(render, layout, edge_classes, node_classes)
+        for first in range(0, len(back), WRITE_CHUNK):
+            f.write(''.join([f'<polyline points="{" ".join(points[starts[route]:starts[route + 1]])}" '
+                             f'class="{edge_classes[route]}"/>\n'
+                             for route in range(first, min(first + WRITE_CHUNK, len(back)))]))
+
+        x, y, widths = layout.x, layout.y, layout.width
+        half_height = NODE_HEIGHT / 2
+        names, keys = render.names, render.graph.keys
+        for first in range(0, layout.node_count, WRITE_CHUNK):
+            f.write(''.join([f'<g><title>{escape(keys[node])}</title>'
+                             f'<rect x="{x[node] - widths[node] / 2:.1f}" y="{y[node] - half_height:.1f}" '
+                             f'width="{widths[node]}" height="{NODE_HEIGHT}" rx="5" '
+                             f'class="{node_classes[node]}"/>'
+                             f'<text x="{x[node]:.1f}" y="{y[node] + 4:.1f}" class="node-text" '
+                             f'text-anchor="middle">{escape(names[node])}</text></g>\n'
+                             for node in range(first, min(first + WRITE_CHUNK, layout.node_count))]))
+
+        f.write('</svg>\n')
+
+    @staticmethod
+    def _mark_changes(render, layout, edge_classes, node_classes):
+        # Маршрут раскладки идет от источника ребра к цели (обратные ребра уже
+        # развернуты назад), по концам маршрута находится изменение ребра
+        changes = {(source, target): change
+                   for (source, target, _), change in zip(render.edges(), render.edge_changes)}
+        vertices, starts = layout.route_vertices, layout.route_starts
+        for route in range(len(edge_classes)):
+            change = changes.get((vertices[starts[route]], vertices[starts[route + 1] - 1]), 0)
+            edge_classes[route] += CHANGE_CLASSES[change]
+        for node, change in enumerate(render.node_changes):
+            node_classes[node] += CHANGE_CLASSES[change]
+
+    def _write_plantuml(self, f, render, title):
+        node_changes, edge_changes = render.node_changes, render.edge_changes
+        # У графа сравнения версий изменения выделены цветом, монохромная схема их бы скрыла
+        skin = "skinparam monochrome true\n" if node_changes is None else ""
+        f.write(f"@startuml\ntitle {title}\n{skin}\n")
+
+        names = render.names
+        if node_changes is None:
+            for name in dict.fromkeys(names):
+                f.write(f'rectangle "{name}"\n')
+        else:
+            for node, name in enumerate(names):
+                f.write(f'rectangle "{name}"{PLANTUML_NODE_COLORS[node_changes[node]]}\n')
+
+        f.write("\n")
+
+        if edge_changes is None:
+            for package, dep in zip(render.sources, render.graph.targets):
+                f.write(f'"{names[package]}" --> "{names[dep]}"\n')
+        else:
+            for package, dep, change in zip(render.sources, render.graph.targets, edge_changes):
+                f.write(f'"{names[package]}" {PLANTUML_EDGE_ARROWS[change]} "{names[dep]}"\n')
+
+        f.write("\n@enduml")
+
+    def _generate_text_diagram(self, render, title):
         lines = [f"=== {title} ===", ""]
 
-        for i, (package, deps) in enumerate(graph.items()):
+        graph = render.graph
+        fetched = render.fetched
+        names = render.names
+        # Граф сравнения версий: узлы с версиями и метками +, -, ~
+        node_changes, edge_changes = render.node_changes, render.edge_changes
+        labels = names if node_changes is None else [
+            CHANGE_MARKS[change] + key for change, key in zip(node_changes, graph.keys)]
+
+        for i, package in enumerate(fetched):
             if i >= 10:
-                lines.append(f"... и еще {len(graph) - 10} пакетов")
+                lines.append(f"... и еще {len(fetched) - 10} пакетов")
                 break
 
-            p_name = package.split('@')[0] if '@' in package else package
-            lines.append(f" {p_name}")
+            lines.append(f" {labels[package]}")
 
-            if deps and "ERROR" not in next(iter(deps.keys()), ""):
-                for j, (dep, version) in enumerate(deps.items()):
+            deps_count = graph.offsets[package + 1] - graph.offsets[package]
+            if package in graph.errors:
+                lines.append(f"    └──  {graph.errors[package]}")
+            elif deps_count:
+                for j, (dep, version) in enumerate(graph.edges(package)):
                     if j >= 5:
-                        lines.append(f"    └── ... и еще {len(deps) - 5} зависимостей")
+                        lines.append(f"    └── ... и еще {deps_count - 5} зависимостей")
                         break
-                    d_name = dep.split('@')[0] if '@' in dep else dep
-                    lines.append(f"    └── {d_name}: {version}")
-            elif "ERROR" in deps:
-                lines.append(f"    └──  {deps['ERROR']}")
+                    mark = CHANGE_MARKS[edge_changes[graph.offsets[package] + j]] if edge_changes is not None else ''
+                    lines.append(f"    └── {mark}{names[dep]}: {version}")
             else:
                 lines.append("    └── (нет зависимостей)")
             lines.append("")
 
-        lines.append(f"Всего пакетов: {len(graph)}")
+        lines.append(f"Всего пакетов: {len(fetched)}")
         return "\n".join(lines)
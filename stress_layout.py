@@ -0,0 +1,277 @@
+import math
+import random
+from array import array
+from collections import deque
+from layered_layout import NODE_HEIGHT, node_width, numpy_module
+
+
+# Раскладка без слоев (--layout stress): разреженная мажоризация напряжения.
+# Желаемое расстояние между узлами - длина кратчайшего пути в неориентированном
+# графе, умноженная на edge_length. Учитываются не все пары, а соседи и
+# несколько опорных узлов (pivots), выбранных по максимуму минимального
+# расстояния до уже выбранных: итерация стоит O(ребер + узлов * опорных), а не
+# O(узлов^2). Все узлы сдвигаются одновременно (итерация Якоби), поэтому с NumPy
+# итерация - несколько операций над массивами слагаемых.
+class StressLayout:
+    clip = 'box'
+
+    def __init__(self, graph, edge_length=120, pivots=16, iterations=50, tolerance=0.5, margin=40, seed=42,
+                 vectorized=None):
+        self.graph = graph
+        self.edge_length = edge_length
+        self.pivots = pivots
+        self.iterations = iterations
+        self.tolerance = tolerance
+        self.margin = margin
+        self.seed = seed
+        self.numpy = numpy_module() if vectorized is not False else None
+
+        self.node_count = len(graph)
+        self.width = []
+        self.x = array('d')
+        self.y = array('d')
+        self.routes = []
+        self.route_vertices = array('I')
+        self.route_starts = array('I', [0])
+        self.back = bytearray()
+        self.iterations_done = 0
+        self.total_width = 0
+        self.total_height = 0
+
+    @property
+    def dummy_count(self):
+        return 0
+
+    def compute(self):
+        offsets, neighbours = self._undirected()
+        pivots, distances = self._pivot_distances(offsets, neighbours)
+        terms = self._terms(offsets, neighbours, pivots, distances)
+        x, y = self._initial_positions(pivots, distances)
+
+        if self.numpy:
+            x, y = self._majorize_vectorized(x, y, terms)
+        else:
+            x, y = self._majorize(x, y, terms)
+
+        self.width = [node_width(name) for name in self.graph.names]
+        self._place(x, y)
+
+        graph = self.graph
+        for source in range(self.node_count):
+            for target in graph.successors(source):
+                if target != source:
+                    self.routes.append(([source, target], False))
+                    self.route_vertices.append(source)
+                    self.route_vertices.append(target)
+                    self.route_starts.append(len(self.route_vertices))
+                    self.back.append(False)
+        return self
+
+    def _undirected(self):
+        # Соседи без направления, без петель и повторов, в виде CSR
+        graph = self.graph
+        reverse_offsets, reverse_sources = graph.reverse_adjacency()
+        offsets = array('I', [0])
+        neighbours = array('I')
+        for node in range(self.node_count):
+            adjacent = dict.fromkeys(graph.successors(node))
+            adjacent.update(dict.fromkeys(reverse_sources[reverse_offsets[node]:reverse_offsets[node + 1]]))
+            adjacent.pop(node, None)
+            neighbours.extend(adjacent)
+            offsets.append(len(neighbours))
+        return offsets, neighbours
+
+    def _pivot_distances(self, offsets, neighbours):
+        # Первый опорный узел - корень, следующий - самый далекий от уже выбранных
+        count = self.node_count
+        pivots = []
+        distances = []
+        nearest = [math.inf] * count
+        candidate = 0
+        for _ in range(min(self.pivots, count)):
+            pivots.append(candidate)
+            distance = self._bfs(offsets, neighbours, candidate)
+            distances.append(distance)
+            for node in range(count):
+                if distance[node] < nearest[node]:
+                    nearest[node] = distance[node]
+            candidate = max(range(count), key=nearest.__getitem__)
+            if nearest[candidate] == 0:
+                break
+        return pivots, distances
+
+    def _bfs(self, offsets, neighbours, source):
+        # Длины кратчайших путей в ребрах; недостижимые узлы - на шаг дальше самого далекого
+        distance = [-1] * self.node_count
+        distance[source] = 0
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            next_distance = distance[node] + 1
+            for neighbour in neighbours[offsets[node]:offsets[node + 1]]:
+                if distance[neighbour] < 0:
+                    distance[neighbour] = next_distance
+                    queue.append(neighbour)
+
+        farthest = max(distance) + 1
+        return [value if value >= 0 else farthest for value in distance]
+
+    def _terms(self, offsets, neighbours, pivots, distances):
+        # Слагаемые напряжения (узел, другой узел, желаемое расстояние, вес 1/d^2):
+        # соседи на расстоянии одного ребра и все опорные узлы
+        nodes = array('I')
+        others = array('I')
+        lengths = array('d')
+        weights = array('d')
+        for node in range(self.node_count):
+            for neighbour in neighbours[offsets[node]:offsets[node + 1]]:
+                nodes.append(node)
+                others.append(neighbour)
+                lengths.append(self.edge_length)
+                weights.append(1.0)
+            for pivot, distance in zip(pivots, distances):
+                hops = distance[node]
+                if pivot != node and hops > 1:
+                    nodes.append(node)
+                    others.append(pivot)
+                    lengths.append(hops * self.edge_length)
+                    weights.append(1.0 / (hops * hops))
+        return nodes, others, lengths, weights
+
+    def _initial_positions(self, pivots, distances):
+        # Расстояния до двух первых опорных узлов как координаты плюс небольшой
+        # детерминированный сдвиг, чтобы узлы с одинаковыми расстояниями не совпадали
+        rng = random.Random(self.seed)
+        length = self.edge_length
+        first = distances[0] if distances else [0] * self.node_count
+        second = distances[1] if len(distances) > 1 else [0] * self.node_count
+        x = array('d', (first[node] * length + rng.uniform(-length / 4, length / 4)
+                        for node in range(self.node_count)))
+        y = array('d', (second[node] * length + rng.uniform(-length / 4, length / 4)
+                        for node in range(self.node_count)))
+        return x, y
+
+    def _majorize(self, x, y, terms):
+        nodes, others, lengths, weights = terms
+        total_weight = [0.0] * self.node_count
+        for node, weight in zip(nodes, weights):
+            total_weight[node] += weight
+
+        for iteration in range(self.iterations):
+            sum_x = [0.0] * self.node_count
+            sum_y = [0.0] * self.node_count
+            for node, other, length, weight in zip(nodes, others, lengths, weights):
+                dx = x[node] - x[other]
+                dy = y[node] - y[other]
+                distance = math.hypot(dx, dy) or 1e-9
+                sum_x[node] += weight * (x[other] + length * dx / distance)
+                sum_y[node] += weight * (y[other] + length * dy / distance)
+
+            movement = 0.0
+            new_x = array('d', x)
+            new_y = array('d', y)
+            for node in range(self.node_count):
+                if total_weight[node]:
+                    new_x[node] = sum_x[node] / total_weight[node]
+                    new_y[node] = sum_y[node] / total_weight[node]
+                    movement = max(movement, abs(new_x[node] - x[node]) + abs(new_y[node] - y[node]))
+            x, y = new_x, new_y
+            self.iterations_done = iteration + 1
+            if movement < self.tolerance:
+                break
+        return x, y
+
+    def _majorize_vectorized(self, x, y, terms):
+        np = self.numpy
+        nodes, others, lengths, weights = (np.frombuffer(values, dtype=np.uint32 if values.typecode == 'I'
+                                                         else np.float64) for values in terms)
+        count = self.node_count
+        total_weight = np.bincount(nodes, weights=weights, minlength=count)
+        active = total_weight > 0
+        x = np.array(x)
+        y = np.array(y)
+
+        for iteration in range(self.iterations):
+            dx = x[nodes] - x[others]
+            dy = y[nodes] - y[others]
+            distance = np.hypot(dx, dy)
+            distance[distance == 0] = 1e-9
+            scale = lengths / distance
+            sum_x = np.bincount(nodes, weights=weights * (x[others] + scale * dx), minlength=count)
+            sum_y = np.bincount(nodes, weights=weights * (y[others] + scale * dy), minlength=count)
+
+            new_x = np.where(active, sum_x / np.where(active, total_weight, 1.0), x)
+            new_y = np.where(active, sum_y / np.where(active, total_weight, 1.0), y)
+            movement = float((np.abs(new_x - x) + np.abs(new_y - y)).max(initial=0.0))
+            x, y = new_x, new_y
+            self.iterations_done = iteration + 1
+            if movement < self.tolerance:
+                break
+        return array('d', x.tobytes()), array('d', y.tobytes())
+
+    def _place(self, x, y):
+        # Сдвиг в положительную область с полями и местом под заголовок
+        half_height = NODE_HEIGHT / 2
+        width = self.width
+        if not self.node_count:
+            self.total_width = self.total_height = self.margin * 2
+            return
+        left = min(x[node] - width[node] / 2 for node in range(self.node_count))
+        top = min(y) - half_height
+        shift_x = self.margin - left
+        shift_y = self.margin + 40 - top
+        self.x = array('d', (value + shift_x for value in x))
+        self.y = array('d', (value + shift_y for value in y))
+        self.total_width = max(self.x[node] + width[node] / 2 for node in range(self.node_count)) + self.margin
+        self.total_height = max(self.y) + half_height + self.margin
+
+    def edge_points(self):
+        # Прямые ребра, обрезанные по границам прямоугольников обоих узлов: конец
+        # ребра (и стрелка маркера) - на рамке узла, а не в его центре
+        starts = self.route_starts
+        half_height = NODE_HEIGHT / 2
+        if self.numpy and len(self.route_vertices):
+            np = self.numpy
+            vertices = np.frombuffer(self.route_vertices, dtype=np.uint32)
+            sources, targets = vertices[0::2], vertices[1::2]
+            x = np.frombuffer(self.x, dtype=np.float64)
+            y = np.frombuffer(self.y, dtype=np.float64)
+            half_width = np.array(self.width, dtype=np.float64) / 2
+            sx, sy, tx, ty = x[sources], y[sources], x[targets], y[targets]
+            dx, dy = tx - sx, ty - sy
+            with np.errstate(divide='ignore'):
+                along_x = np.where(dx != 0, 1 / np.abs(dx), np.inf)
+                along_y = np.where(dy != 0, half_height / np.abs(dy), np.inf)
+            same_point = (dx == 0) & (dy == 0)
+            start = np.where(same_point, 0.0, np.minimum(np.minimum(half_width[sources] * along_x, along_y), 0.5))
+            end = np.where(same_point, 0.0, np.minimum(np.minimum(half_width[targets] * along_x, along_y), 0.5))
+            px = np.empty(len(vertices))
+            py = np.empty(len(vertices))
+            px[0::2], py[0::2] = sx + start * dx, sy + start * dy
+            px[1::2], py[1::2] = tx - end * dx, ty - end * dy
+            return starts, px.tolist(), py.tolist()
+
+        x, y, width = self.x, self.y, self.width
+        px = []
+        py = []
+        vertices = self.route_vertices
+        for index in range(0, len(vertices), 2):
+            source, target = vertices[index], vertices[index + 1]
+            dx, dy = x[target] - x[source], y[target] - y[source]
+            start = self._clip(width[source] / 2, half_height, dx, dy)
+            end = self._clip(width[target] / 2, half_height, dx, dy)
+            px.append(x[source] + start * dx)
+            py.append(y[source] + start * dy)
+            px.append(x[target] - end * dx)
+            py.append(y[target] - end * dy)
+        return starts, px, py
+
+    @staticmethod
+    def _clip(half_width, half_height, dx, dy):
+        # Доля отрезка от центра до рамки прямоугольника (не больше половины ребра)
+        limits = []
+        if dx:
+            limits.append(half_width / abs(dx))
+        if dy:
+            limits.append(half_height / abs(dy))
+        return min(min(limits), 0.5) if limits else 0.0
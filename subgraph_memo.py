@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MEMO_NODES = 200000
+
+
+# Запомненное поддерево: транзитивное замыкание пакета в том виде, в каком его
+# построил обход. nodes - (ключ, зависимости, ошибка загрузки или None, запас
+# уровней) в порядке обхода, requirements - (требование (имя, диапазон), ключ, запас уровней).
+class Subgraph:
+    __slots__ = ('budget', 'nodes', 'requirements')
+
+    def __init__(self, budget, nodes, requirements):
+        self.budget = budget
+        self.nodes = nodes
+        self.requirements = requirements
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def shifted(self, budget):
+        # Без переопределений глубины запас узла поддерева равен запасу корня минус
+        # расстояние до него, поэтому меньший запас получается сдвигом: узлы с
+        # запасом меньше 1 обход не загрузил бы
+        shift = self.budget - budget
+        if not shift:
+            return self
+        nodes = [(key, dependencies, error, node_budget - shift)
+                 for key, dependencies, error, node_budget in self.nodes if node_budget > shift]
+        requirements = [(requirement, key, node_budget - shift)
+                        for requirement, key, node_budget in self.requirements if node_budget > shift]
+        return Subgraph(budget, nodes, requirements)
+
+
+# Память раскрытых поддеревьев для обходов нескольких корней (пакетный режим,
+# --serve). Ключ - (разрешенный пакет, параметры обхода: фильтр и отсечение),
+# значение - поддерево с наибольшим запасом уровней. Встретив такой пакет,
+# построитель вставляет поддерево целиком и не обходит его заново. Объем
+# ограничен суммарным числом узлов: вытесняются давно не нужные поддеревья.
+# Поддерево старше ttl секунд (--cache-ttl в --serve) забывается.
+class SubgraphMemo:
+    def __init__(self, max_nodes=DEFAULT_MEMO_NODES, ttl=None):
+        self.max_nodes = max_nodes
+        self.ttl = ttl
+        self.nodes = 0
+        self.hits = 0
+        self.misses = 0
+        self.spliced_nodes = 0
+        self.evictions = 0
+        # (ключ пакета, параметры) -> (поддерево, время записи)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, package_key, params, budget, exact=False):
+        # exact - запас должен совпасть (у правил отсечения есть переопределения
+        # глубины, и сдвиг запаса неверен)
+        with self._lock:
+            subgraph = self._current((package_key, params))
+            if subgraph is None or subgraph.budget < budget or (exact and subgraph.budget != budget):
+                self.misses += 1
+                return None
+            self._entries.move_to_end((package_key, params))
+            self.hits += 1
+
+        subgraph = subgraph.shifted(budget)
+        with self._lock:
+            self.spliced_nodes += len(subgraph)
+        return subgraph
+
+    def contains(self, package_key, params, budget):
+        with self._lock:
+            subgraph = self._current((package_key, params))
+            return subgraph is not None and subgraph.budget >= budget
+
+    def put(self, package_key, params, subgraph):
+        if len(subgraph) > self.max_nodes:
+            return
+
+        key = (package_key, params)
+        with self._lock:
+            stored = time.monotonic()
+            previous = self._current(key)
+            if previous is not None:
+                _, previous_stored = self._entries.pop(key)
+                self.nodes -= len(previous)
+                if previous.budget > subgraph.budget:
+                    # Более глубокое поддерево остается со своим временем записи
+                    subgraph, stored = previous, previous_stored
+            self._entries[key] = (subgraph, stored)
+            self.nodes += len(subgraph)
+
+            while self.nodes > self.max_nodes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.nodes -= len(evicted)
+                self.evictions += 1
+
+    def _current(self, key):
+        # Вызывается под блокировкой; устаревшее по ttl поддерево удаляется
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        subgraph, stored = item
+        if self.ttl is not None and time.monotonic() - stored > self.ttl:
+            del self._entries[key]
+            self.nodes -= len(subgraph)
+            return None
+        return subgraph
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nodes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subgraphs": len(self._entries),
+                "nodes": self.nodes,
+                "max_nodes": self.max_nodes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "spliced_nodes": self.spliced_nodes,
+                "evictions": self.evictions
+            }